@@ -1,5 +1,8 @@
 import os
-from flask import Flask, request, jsonify, render_template, send_from_directory
+import json
+import uuid
+import queue
+from flask import Flask, Response, g, request, jsonify, render_template, send_from_directory, stream_with_context
 from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
 
@@ -8,22 +11,58 @@ load_dotenv()
 
 # Import from our custom modules
 from modules.db_manager import (
-    upsert_documents, 
     clear_vectordb,
-    load_document, 
     get_vectordb, 
     get_embeddings, 
-    get_mmr_retriever
+    get_mmr_retriever,
+    ensure_index
 )
-from modules.qa_generator import generate_qa_from_context
-from modules.mcq_generator import generate_mcqs_from_retrieved_context
+from modules.jobs import submit_job, get_job, ingest_file_job, question_bank_job
+from modules.qa_generator import generate_qa_from_context, stream_qa_from_context
+from modules.mcq_generator import generate_mcqs_from_retrieved_context, stream_mcqs_from_retrieved_context
 from modules.llm_provider import get_qa_llm, get_mcq_llm
+from modules.utils import GATING_STRATEGIES, get_web_search, get_speculative_search
+from modules.fanout import FANOUT_ENABLED
+from modules.generation_cache import get_generation_cache
+from modules.context_packer import packing_stats
+from modules.question_bank import serve_from_bank, question_bank_stats, QUESTION_BANK_ENABLED
+from modules.telemetry import get_logger, trace_request, render_metrics
+
+log = get_logger(__name__)
 
 # --- App Setup ---
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'uploads'
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv("MAX_UPLOAD_MB", "100")) * 1024 * 1024
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-os.makedirs('chroma_persist', exist_ok=True)
+
+# Check (or, with VECTOR_BACKEND=local, open) the vector index once per worker at startup rather than per request.
+# Clients themselves are built lazily and cached in the shared registry.
+try:
+    ensure_index()
+except Exception as e:
+    log.warning(f"[!] Startup index check failed, will retry on first request: {e}")
+
+# --- Telemetry ---
+# Requests to these endpoints are traced (see modules/telemetry.py); /generate/stream traces its own stream
+TRACED_ENDPOINTS = ('upload_file', 'clear_db', 'generate')
+
+@app.before_request
+def start_trace():
+    if request.endpoint in TRACED_ENDPOINTS:
+        g.trace_context = trace_request(request.endpoint, profile=request.headers.get('X-Profile') == '1')
+        g.trace = g.trace_context.__enter__()
+
+@app.after_request
+def record_status(response):
+    if 'trace' in g:
+        g.trace.status = str(response.status_code)
+    return response
+
+@app.teardown_request
+def finish_trace(exc):
+    if 'trace_context' in g:
+        g.trace_context.__exit__(type(exc) if exc else None, exc, exc.__traceback__ if exc else None)
 
 # --- Static Routes ---
 @app.route('/')
@@ -36,41 +75,102 @@ def static_js(filename):
     """Serve the main.js file."""
     return send_from_directory('static/js', filename)
 
+# --- Request Helpers ---
+def retrieval_options(data):
+    """
+    Optional per-request retrieval overrides from the JSON body:
+    mmrK (chunks in the context), fetchK (candidate pool) and mmrLambda (0-1).
+    Raises ValueError on invalid values (TypeError on values of the wrong JSON type).
+    """
+    options = {}
+    for key, name in (('mmrK', 'k'), ('fetchK', 'fetch_k')):
+        if data.get(key) is not None:
+            value = int(data[key])
+            if value < 1:
+                raise ValueError(f"{key} must be a positive integer")
+            options[name] = value
+    if data.get('mmrLambda') is not None:
+        value = float(data['mmrLambda'])
+        if not 0 <= value <= 1:
+            raise ValueError("mmrLambda must be between 0 and 1")
+        options['lambda_mult'] = value
+    return options
+
+def generate_options(data):
+    """
+    Parse and validate the JSON body of /generate and /generate/stream
+    (also used by the async /generate in asgi.py).
+    Raises ValueError or TypeError with a message for the client.
+    """
+    data = data or {}
+    if not data.get('query'):
+        raise ValueError("Query is required")
+    gating_strategy = data.get('gatingStrategy') # Optional, see utils.GATING_STRATEGIES
+    if gating_strategy and gating_strategy not in GATING_STRATEGIES:
+        raise ValueError(f"gatingStrategy must be one of {', '.join(GATING_STRATEGIES)}")
+    return {
+        "query": data['query'],
+        "num_questions": int(data.get('numQuestions', 5)),
+        "gen_type": 'mcq' if data.get('type', 'mcq') == 'mcq' else 'qa',
+        "use_tavily": bool(data.get('useTavily', False)),
+        "gating_strategy": gating_strategy,
+        "fan_out": bool(data.get('fanOut', FANOUT_ENABLED)), # Parallel shards for large counts
+        "use_bank": bool(data.get('useBank', QUESTION_BANK_ENABLED)), # Serve pre-generated questions when they match
+        "retrieval": retrieval_options(data)
+    }
+
 # --- API Endpoints ---
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
-    """Handle file uploads to the vector database."""
+    """Save one or more uploads and queue each for background ingestion."""
     if 'file' not in request.files:
         return jsonify({"error": "No file part"}), 400
     
-    file = request.files['file']
-    if file.filename == '':
+    files = [f for f in request.files.getlist('file') if f.filename]
+    if not files:
         return jsonify({"error": "No selected file"}), 400
 
-    if file:
+    job_ids = []
+    filenames = []
+    for file in files:
         filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        # Unique on-disk name so concurrent uploads of the same file don't collide
+        file_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex}_{filename}")
         
         try:
             file.save(file_path)
-            docs = load_document(file_path)
-            if not docs:
-                 return jsonify({"error": "File type not supported or file is empty"}), 400
-                 
-            upsert_documents(docs)
-            
-            # --- MODIFIED: Friendlier message for toast ---
-            return jsonify({"message": f"File processed: {filename}"}), 200
-            # --- END MODIFIED ---
+            # Parsing, OCR, embedding and upserting happen on the job pool;
+            # the job removes the file when it is done.
+            job_ids.append(submit_job(ingest_file_job, file_path, filename))
+            filenames.append(filename)
+
+        except queue.Full:
+            os.remove(file_path)
+            return jsonify({
+                "error": "Ingestion queue is full. Please retry shortly.",
+                "job_ids": job_ids
+            }), 503
         
         except Exception as e:
-            print(f"[!] Upload Error: {e}")
-            return jsonify({"error": str(e)}), 500
-        
-        finally:
+            log.warning(f"[!] Upload Error: {e}")
             if os.path.exists(file_path):
                 os.remove(file_path)
+            return jsonify({"error": str(e), "job_ids": job_ids}), 500
+
+    return jsonify({
+        "message": f"File queued: {', '.join(filenames)}",
+        "job_id": job_ids[0],
+        "job_ids": job_ids
+    }), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Report the stage, progress and errors of an ingestion job."""
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job), 200
 
 # --- MODIFIED: Handle new return signature from clear_vectordb ---
 @app.route('/clear-db', methods=['POST'])
@@ -84,28 +184,66 @@ def clear_db():
             # msg_type is 'error' here
             return jsonify({"error": message, "type": msg_type}), 500
     except Exception as e:
-        print(f"[!] Clear DB Error: {e}")
+        log.warning(f"[!] Clear DB Error: {e}")
         return jsonify({"error": str(e), "type": "error"}), 500
 # --- END MODIFIED ---
 
 
+@app.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    """Report hit rates of the embedding, generation and web search caches (and LLM tokens saved)."""
+    generation_cache = get_generation_cache()
+    return jsonify({
+        "embeddings": get_embeddings().stats(),
+        "generation": generation_cache.stats() if generation_cache else None,
+        "web_search": get_web_search().stats() if os.getenv("TAVILY_API_KEY") else None,
+        "speculative_search": get_speculative_search().stats(),
+        "context_packing": packing_stats(),
+        "question_bank": question_bank_stats()
+    }), 200
+
+
+@app.route('/question-bank/build', methods=['POST'])
+def build_bank():
+    """Queue a question bank build for every ingested chunk not in the bank yet."""
+    try:
+        job_id = submit_job(question_bank_job)
+    except queue.Full:
+        return jsonify({"error": "Job queue is full. Please retry shortly."}), 503
+    return jsonify({"message": "Question bank build queued", "job_id": job_id}), 202
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics of this worker: request and stage latencies, tokens, cache hits, fallbacks."""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/generate', methods=['POST'])
 def generate():
     """Generate MCQs or Q&A based on user query."""
-    data = request.get_json()
-    query = data.get('query')
-    num_questions = int(data.get('numQuestions', 5))
-    gen_type = data.get('type', 'mcq') # 'mcq' or 'qa'
-    use_tavily = bool(data.get('useTavily', False))
-    
-    if not query:
-        return jsonify({"error": "Query is required"}), 400
+    try:
+        options = generate_options(request.get_json())
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    query = options['query']
+    num_questions = options['num_questions']
+    gen_type = options['gen_type']
+    use_tavily = options['use_tavily']
+    gating_strategy = options['gating_strategy']
+    fan_out = options['fan_out']
+    retrieval = options['retrieval']
 
     try:
         vectordb = get_vectordb()
-        retriever = get_mmr_retriever(vectordb)
+        retriever = get_mmr_retriever(vectordb, num_questions, **retrieval)
         # --- MODIFIED: Get embeddings for both types ---
         embeddings = get_embeddings()
+
+        # Pre-generated questions matching the query are served without an LLM call
+        banked = options['use_bank'] and serve_from_bank(query, gen_type, num_questions, embeddings)
+        if banked:
+            return jsonify({"data": banked, "source": "question_bank"}), 200
         
         if gen_type == 'mcq':
             llm = get_mcq_llm()
@@ -117,7 +255,9 @@ def generate():
                 embeddings, 
                 num_questions,
                 similarity_threshold=0.5, # default
-                use_tavily=use_tavily
+                use_tavily=use_tavily,
+                gating_strategy=gating_strategy,
+                fan_out=fan_out
             )
         # --- END MODIFIED ---
         else: # 'qa'
@@ -129,7 +269,9 @@ def generate():
                 embeddings, 
                 num_questions, 
                 similarity_threshold=0.5,
-                use_tavily=use_tavily
+                use_tavily=use_tavily,
+                gating_strategy=gating_strategy,
+                fan_out=fan_out
             )
         
         if not result:
@@ -138,9 +280,72 @@ def generate():
         return jsonify({"data": result}), 200
         
     except Exception as e:
-        print(f"[!] Generation Error: {e}")
+        log.warning(f"[!] Generation Error: {e}")
         return jsonify({"error": f"An error occurred: {str(e)}"}), 500
 
+@app.route('/generate/stream', methods=['POST'])
+def generate_stream():
+    """
+    Stream MCQs or Q&A as newline-delimited JSON while the LLM writes them.
+    Each line is {"type": "item", "data": {...}}; the stream ends with a
+    {"type": "done", "count": N} or {"type": "error", "error": "..."} line.
+    """
+    try:
+        options = generate_options(request.get_json())
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    query = options['query']
+    num_questions = options['num_questions']
+    gen_type = options['gen_type']
+    use_tavily = options['use_tavily']
+    gating_strategy = options['gating_strategy']
+    retrieval = options['retrieval']
+
+    def events():
+        count = 0
+        try:
+            retriever = get_mmr_retriever(get_vectordb(), num_questions, **retrieval)
+            embeddings = get_embeddings()
+            banked = options['use_bank'] and serve_from_bank(query, gen_type, num_questions, embeddings)
+            if banked:
+                for item in banked:
+                    yield json.dumps({"type": "item", "data": item}) + "\n"
+                yield json.dumps({"type": "done", "count": len(banked)}) + "\n"
+                return
+
+            if gen_type == 'mcq':
+                stream_fn, llm = stream_mcqs_from_retrieved_context, get_mcq_llm()
+            else: # 'qa'
+                stream_fn, llm = stream_qa_from_context, get_qa_llm()
+
+            for item in stream_fn(
+                retriever, llm, query, embeddings, num_questions,
+                similarity_threshold=0.5,
+                use_tavily=use_tavily,
+                gating_strategy=gating_strategy
+            ):
+                count += 1
+                yield json.dumps({"type": "item", "data": item}) + "\n"
+
+            if count == 0:
+                yield json.dumps({"type": "error", "error": "No results generated. The context might be empty or irrelevant."}) + "\n"
+            else:
+                yield json.dumps({"type": "done", "count": count}) + "\n"
+
+        except Exception as e:
+            log.warning(f"[!] Streaming Generation Error: {e}")
+            yield json.dumps({"type": "error", "error": f"An error occurred: {str(e)}"}) + "\n"
+
+    profile = request.headers.get('X-Profile') == '1'
+
+    def traced_events():
+        # The request hooks finish before the stream is consumed, so the stream is traced here
+        with trace_request('generate_stream', profile=profile) as trace:
+            trace.status = '200'
+            yield from events()
+
+    return Response(stream_with_context(traced_events()), mimetype='application/x-ndjson')
+
 # --- Run Application ---
 if __name__ == '__main__':
     app.run(debug=True, port=5001)
\ No newline at end of file
@@ -0,0 +1,103 @@
+import os
+import json
+import asyncio
+from a2wsgi import WSGIMiddleware
+
+# Importing the Flask app also loads .env and checks the vector index
+from app import app as flask_app, generate_options
+from modules.db_manager import get_vectordb, get_embeddings, get_mmr_retriever
+from modules.llm_provider import get_qa_llm, get_mcq_llm
+from modules.async_pipeline import generate_async
+from modules.question_bank import serve_from_bank
+from modules.telemetry import get_logger, trace_request
+
+log = get_logger(__name__)
+
+# --- ASGI Setup ---
+# Run with: uvicorn asgi:app --host 0.0.0.0 --port 5001
+# POST /generate is served natively on the event loop, so a worker holds many
+# requests that are waiting on retrieval or the LLM. Every other route is the
+# Flask app, run on a pool of ASGI_WSGI_WORKERS threads.
+ASGI_WSGI_WORKERS = int(os.getenv("ASGI_WSGI_WORKERS", "10"))
+
+flask_asgi = WSGIMiddleware(flask_app, workers=ASGI_WSGI_WORKERS)
+
+# --- Helpers ---
+async def read_body(receive) -> bytes:
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+async def send_json(send, payload, status: int):
+    body = json.dumps(payload).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    })
+    await send({"type": "http.response.body", "body": body})
+
+def build_clients(options):
+    """Retriever, embeddings and LLM for a request (first use may do network I/O)."""
+    retriever = get_mmr_retriever(get_vectordb(), options['num_questions'], **options['retrieval'])
+    llm = get_mcq_llm() if options['gen_type'] == 'mcq' else get_qa_llm()
+    return retriever, get_embeddings(), llm
+
+# --- API Endpoints ---
+async def generate(scope, receive, send):
+    """Async /generate; same request and response bodies as the Flask route."""
+    profile = (b"x-profile", b"1") in scope.get("headers", [])
+    with trace_request("generate", profile=profile) as trace:
+        payload, status = await run_generate(receive)
+        trace.status = str(status)
+    await send_json(send, payload, status)
+
+async def run_generate(receive):
+    """Returns (response body, status)."""
+    try:
+        options = generate_options(json.loads(await read_body(receive) or b"{}"))
+    except json.JSONDecodeError:
+        return {"error": "Request body must be JSON"}, 400
+    except (TypeError, ValueError) as e:
+        return {"error": str(e)}, 400
+
+    try:
+        retriever, embeddings, llm = await asyncio.to_thread(build_clients, options)
+        if options['use_bank']:
+            banked = await asyncio.to_thread(
+                serve_from_bank, options['query'], options['gen_type'], options['num_questions'], embeddings
+            )
+            if banked:
+                return {"data": banked, "source": "question_bank"}, 200
+
+        result = await generate_async(
+            options['gen_type'],
+            retriever,
+            llm,
+            options['query'],
+            embeddings,
+            options['num_questions'],
+            similarity_threshold=0.5,
+            use_tavily=options['use_tavily'],
+            gating_strategy=options['gating_strategy'],
+            fan_out=options['fan_out']
+        )
+
+        if not result:
+            return {"error": "No results generated. The context might be empty or irrelevant."}, 404
+
+        return {"data": result}, 200
+
+    except Exception as e:
+        log.warning(f"[!] Generation Error: {e}")
+        return {"error": f"An error occurred: {str(e)}"}, 500
+
+async def app(scope, receive, send):
+    """ASGI entry point: native /generate, everything else through Flask."""
+    if scope["type"] == "http" and scope["path"] == "/generate" and scope["method"] == "POST":
+        await generate(scope, receive, send)
+    else:
+        await flask_asgi(scope, receive, send)
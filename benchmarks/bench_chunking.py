@@ -0,0 +1,125 @@
+import os
+import re
+import random
+import shutil
+import argparse
+import tempfile
+
+from .common import REPO_ROOT, setup_environment, quiet_app_logs, Timer, write_results
+from .corpus import build_corpus
+from .stubs import StubEmbeddings, build_upstreams
+
+# --- Chunking Configurations ---
+# Ingests the synthetic corpus once per chunking configuration (splitter
+# type, size, overlap) into its own local index and reports how many chunks
+# and embedding tokens it costs, and the retrieval hit rate: the share of
+# sampled corpus sentences found whole in one of the top-k chunks retrieved
+# for them, next to the context tokens those k chunks cost. Embeddings are
+# the hashed bag-of-words stand-in, so hit rates compare configurations
+# rather than predict real embedding quality.
+#   python -m benchmarks.bench_chunking --configs token:200:20 token:400:50 character:1600:200
+DEFAULT_CONFIGS = ["token:200:0", "token:200:50", "token:400:50", "token:400:100", "token:800:100",
+                   "character:1000:100", "character:2000:200"]
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+
+class CountingEmbeddings(StubEmbeddings):
+    """Stub embeddings that also count the tokens of the texts embedded."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tokens = 0
+        self.texts = 0
+
+    def embed_documents(self, texts):
+        from modules.utils import count_tokens
+        self.tokens += sum(count_tokens(t) for t in texts)
+        self.texts += len(texts)
+        return super().embed_documents(texts)
+
+def parse_config(spec: str) -> tuple:
+    strategy, size, overlap = spec.split(":")
+    return strategy, int(size), int(overlap)
+
+def sample_needles(paths: list, count: int, seed: int) -> list:
+    """Sentences of the plain-text documents, to be found again by retrieval."""
+    sentences = []
+    for path in paths:
+        if path.endswith(".txt"):
+            with open(path, "r", encoding="utf-8") as f:
+                sentences += [s.strip() for s in SENTENCE_PATTERN.split(f.read()) if s.strip()]
+    return random.Random(seed).sample(sentences, min(count, len(sentences)))
+
+def run_config(workdir: str, paths: list, needles: list, spec: str, k: int, upstreams: dict) -> dict:
+    from modules.chunking import get_text_splitter
+    from modules.db_manager import upsert_file, EMBEDDING_DIMENSION
+    from modules.local_index import LocalVectorIndex, TEXT_KEY
+
+    strategy, size, overlap = parse_config(spec)
+    name = spec.replace(":", "-")
+    index = LocalVectorIndex(os.path.join(workdir, f"index-{name}"), EMBEDDING_DIMENSION)
+    embeddings = CountingEmbeddings(upstreams["openai"])
+    splitter = get_text_splitter(strategy, size, overlap)
+    manifest = os.path.join(workdir, f"manifest-{name}.json")
+
+    with Timer() as ingest:
+        chunks = sum(
+            upsert_file(path, embeddings=embeddings, index=index, manifest_path=manifest, splitter=splitter)["added"]
+            for path in paths
+        )
+
+    from modules.utils import count_tokens
+    hits, retrieved_tokens = 0, 0
+    for sentence in needles:
+        matches = index.query(vector=embeddings.embed_query(sentence), top_k=k, include_metadata=True)["matches"]
+        # Extracted text may re-wrap lines, so compare with whitespace normalized
+        target = " ".join(sentence.split())
+        texts = [" ".join(m["metadata"].get(TEXT_KEY, "").split()) for m in matches]
+        hits += any(target in text for text in texts)
+        retrieved_tokens += sum(count_tokens(text) for text in texts)
+    return {
+        "strategy": strategy,
+        "chunk_size": size,
+        "chunk_overlap": overlap,
+        "chunks": chunks,
+        "embedding_tokens": embeddings.tokens,
+        "tokens_per_chunk": round(embeddings.tokens / chunks, 1) if chunks else None,
+        f"hit_rate_at_{k}": round(hits / len(needles), 4) if needles else None,
+        "retrieved_tokens_per_lookup": round(retrieved_tokens / len(needles), 1) if needles else None,
+        "ingest_seconds": round(ingest.seconds, 3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare chunking configurations on the synthetic corpus.")
+    parser.add_argument("--configs", nargs="+", default=DEFAULT_CONFIGS, metavar="STRATEGY:SIZE:OVERLAP")
+    parser.add_argument("--formats", nargs="+", choices=["txt", "docx", "pdf"], default=["txt", "docx", "pdf"])
+    parser.add_argument("--scale", type=int, default=1, help="Corpus size multiplier")
+    parser.add_argument("--needles", type=int, default=200, help="Sentences looked up per configuration")
+    parser.add_argument("--k", type=int, default=4, help="Chunks retrieved per lookup")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out")
+    args = parser.parse_args()
+    args.out = args.out and os.path.abspath(args.out)
+
+    workdir = tempfile.mkdtemp(prefix="qgen-chunking-")
+    # No simulated latency: this compares configurations, not providers
+    setup_environment(workdir, {"HYBRID_RETRIEVAL": "false", "LOG_LEVEL": "WARNING"})
+    quiet_app_logs()
+    upstreams = build_upstreams({"openai": 0.0, "pinecone": 0.0}, seed=args.seed)
+    results = []
+    try:
+        paths = build_corpus(os.path.join(workdir, "corpus"), args.formats, args.scale, args.seed)
+        needles = sample_needles(paths, args.needles, args.seed)
+        for spec in args.configs:
+            result = run_config(workdir, paths, needles, spec, args.k, upstreams)
+            results.append(result)
+            print(f"[+] {spec}: {result['chunks']} chunks, {result['embedding_tokens']} embedding tokens, "
+                  f"hit rate {result[f'hit_rate_at_{args.k}']:.1%} "
+                  f"over {result['retrieved_tokens_per_lookup']} retrieved tokens")
+    finally:
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+    write_results("chunking", {"files": len(paths), "needles": len(needles), "k": args.k, "configs": results},
+                  args.out, args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import os
+import shutil
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from .common import REPO_ROOT, setup_environment, parse_env, quiet_app_logs, percentiles, memory, Timer, write_results
+from .stubs import StubPineconeClient, build_upstreams, upstream_stats, upstream_delta
+
+# --- Client Setup Per Request ---
+# Overhead the shared client registry (modules/utils.get_or_create_client)
+# removes from every request. "per_request" does what each request did
+# before: build the OpenAI embeddings, the Groq chat model and the Pinecone
+# client, then check the index exists (list_indexes) and look up its host.
+# "registry" fetches the same clients through the app's getters, which only
+# build them on the first call. The SDK clients are real (building them
+# makes no network calls); Pinecone round trips go to the stand-in at its
+# simulated latency. Connection reuse is not measured: the stand-ins do no I/O.
+#   python -m benchmarks.bench_clients --requests 500 --concurrency 1 8 --latency pinecone=0.05
+
+def per_request_clients(upstream, index):
+    """The clients a request used to build for itself."""
+    from langchain_community.embeddings import OpenAIEmbeddings
+    from langchain_groq import ChatGroq
+    from pinecone import Pinecone
+    from modules.db_manager import EMBEDDING_MODEL_NAME, PINECONE_INDEX_NAME
+    from modules.llm_provider import LLM_LARGE_MODEL
+
+    embeddings = OpenAIEmbeddings(model=EMBEDDING_MODEL_NAME)
+    llm = ChatGroq(model=LLM_LARGE_MODEL, temperature=0.0)
+    Pinecone(api_key=os.environ["PINECONE_API_KEY"])
+    pc = StubPineconeClient(index, upstream, [PINECONE_INDEX_NAME]) # Network calls of the client above
+    if PINECONE_INDEX_NAME not in [i.name for i in pc.list_indexes()]:
+        raise RuntimeError("index missing")
+    return embeddings, llm, pc.Index(PINECONE_INDEX_NAME)
+
+def registry_clients(upstream, index):
+    from modules.db_manager import get_embeddings, get_pinecone_index
+    from modules.llm_provider import get_tier_llm
+
+    return get_embeddings(), get_tier_llm("large"), get_pinecone_index()
+
+def run_mode(build, upstream, index, requests: int, concurrency: int) -> dict:
+    def one(_):
+        with Timer() as t:
+            build(upstream, index)
+        return t.seconds
+
+    with Timer() as wall, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one, range(requests)))
+    return {
+        "latency": percentiles(latencies),
+        "requests_per_second": round(requests / wall.seconds, 1),
+        "memory": memory(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Time per-request client construction against the client registry.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--latency", nargs="*", default=[], metavar="UPSTREAM=SECONDS")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out")
+    args = parser.parse_args()
+    args.out = args.out and os.path.abspath(args.out)
+
+    workdir = tempfile.mkdtemp(prefix="qgen-clients-")
+    setup_environment(workdir, {"VECTOR_BACKEND": "pinecone", "LOG_LEVEL": "WARNING"})
+    from modules.utils import get_or_create_client, invalidate_clients
+    from modules.local_index import LocalVectorIndex
+    from modules import db_manager
+    from modules.db_manager import EMBEDDING_DIMENSION, PINECONE_INDEX_NAME
+    quiet_app_logs()
+
+    upstreams = build_upstreams(parse_env(args.latency), seed=args.seed)
+    upstream = upstreams["pinecone"]
+    index = LocalVectorIndex(os.path.join(workdir, "index"), EMBEDDING_DIMENSION)
+    results = {}
+    try:
+        for concurrency in args.concurrency:
+            level = {}
+            for mode, build in (("per_request", per_request_clients), ("registry", registry_clients)):
+                # The registry starts empty, as in a fresh worker, with the Pinecone client stubbed
+                invalidate_clients()
+                get_or_create_client("pinecone", lambda: StubPineconeClient(index, upstream, [PINECONE_INDEX_NAME]))
+                db_manager._index_checked = False
+                before = upstream_stats(upstreams)
+                level[mode] = run_mode(build, upstream, index, args.requests, concurrency)
+                level[mode]["pinecone_calls"] = upstream_delta(before, upstream_stats(upstreams))["pinecone"]["calls"]
+            results[f"c={concurrency}"] = level
+            print(f"[+] c={concurrency}: per request p50 {level['per_request']['latency']['p50'] * 1e3:.2f}ms, "
+                  f"registry p50 {level['registry']['latency']['p50'] * 1e3:.3f}ms "
+                  f"({level['per_request']['pinecone_calls']} vs {level['registry']['pinecone_calls']} Pinecone calls)")
+    finally:
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+    write_results("clients", {"requests": args.requests, "levels": results}, args.out, args)
+
+if __name__ == "__main__":
+    main()
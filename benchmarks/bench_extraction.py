@@ -0,0 +1,105 @@
+import os
+import shutil
+import random
+import argparse
+import tempfile
+
+from .common import REPO_ROOT, setup_environment, quiet_app_logs, Timer, write_results
+from .corpus import TOPICS, paragraphs, write_pdf, write_png
+
+# --- Extraction Worker Scaling ---
+# PDF text extraction and OCR throughput of modules/extraction.py at each
+# pool size, on generated PDFs and scanned-page images, next to extracting
+# the same PDFs in-process one page after another. Pool start-up (spawning
+# the workers) is timed separately from the extraction itself. Images are
+# only OCR'd where tesseract is installed.
+#   python -m benchmarks.bench_extraction --workers 1 2 4 8 --pdfs 8 --pages 50
+
+def build_inputs(workdir: str, pdfs: int, pages: int, images: int, seed: int) -> tuple:
+    rng = random.Random(seed)
+    topics = list(TOPICS)
+    pdf_paths, image_paths = [], []
+    for i in range(pdfs):
+        path = os.path.join(workdir, f"doc-{i}.pdf")
+        # About 50 lines a page, 6 to 7 lines a paragraph
+        write_pdf(path, paragraphs(rng, topics[i % len(topics)], pages * 7))
+        pdf_paths.append(path)
+    for i in range(images):
+        path = os.path.join(workdir, f"scan-{i}.png")
+        write_png(path, paragraphs(rng, topics[i % len(topics)], 3))
+        image_paths.append(path)
+    return pdf_paths, image_paths
+
+def extract_sequential(pdf_paths: list) -> int:
+    from pypdf import PdfReader
+
+    pages = 0
+    for path in pdf_paths:
+        for page in PdfReader(path).pages:
+            page.extract_text()
+            pages += 1
+    return pages
+
+def run_pool(workers: int, pdf_paths: list, image_paths: list) -> dict:
+    from modules import extraction
+
+    extraction.EXTRACTION_MAX_WORKERS = workers
+    with Timer() as startup:
+        # Spawn every worker up front, so start-up is not billed to the first file
+        pool = extraction.get_extraction_pool()
+        list(pool.map(abs, range(workers * 4)))
+    try:
+        with Timer() as pdf:
+            pages = sum(1 for path in pdf_paths for _ in extraction.extract_pdf(path))
+        result = {
+            "startup_seconds": round(startup.seconds, 3),
+            "pdf_pages": pages,
+            "pdf_pages_per_second": round(pages / pdf.seconds, 1),
+        }
+        if image_paths:
+            with Timer() as ocr:
+                for path in image_paths:
+                    list(extraction.extract_image(path))
+            result["images_per_second"] = round(len(image_paths) / ocr.seconds, 2)
+    finally:
+        extraction.reset_extraction_pool(pool)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure PDF/OCR extraction throughput per pool size.")
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--pdfs", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=40, help="Pages per PDF")
+    parser.add_argument("--images", type=int, default=8 if shutil.which("tesseract") else 0,
+                        help="Images to OCR (none by default where tesseract is missing)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out")
+    args = parser.parse_args()
+    args.out = args.out and os.path.abspath(args.out)
+
+    workdir = tempfile.mkdtemp(prefix="qgen-extraction-")
+    setup_environment(workdir, {"LOG_LEVEL": "WARNING"})
+    quiet_app_logs()
+    try:
+        pdf_paths, image_paths = build_inputs(workdir, args.pdfs, args.pages, args.images, args.seed)
+        with Timer() as sequential:
+            pages = extract_sequential(pdf_paths)
+        baseline = {"pdf_pages": pages, "pdf_pages_per_second": round(pages / sequential.seconds, 1)}
+        print(f"[+] In-process: {baseline['pdf_pages_per_second']} pages/s over {pages} pages")
+
+        levels = {}
+        for workers in args.workers:
+            level = run_pool(workers, pdf_paths, image_paths)
+            level["speedup_vs_in_process"] = round(level["pdf_pages_per_second"] / baseline["pdf_pages_per_second"], 2)
+            levels[f"workers={workers}"] = level
+            print(f"[+] {workers} workers: {level['pdf_pages_per_second']} pages/s "
+                  f"({level['speedup_vs_in_process']}x in-process)"
+                  + (f", {level['images_per_second']} images/s" if "images_per_second" in level else "")
+                  + f", start-up {level['startup_seconds']}s")
+    finally:
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+    write_results("extraction", {"cpus": os.cpu_count(), "in_process": baseline, "pools": levels}, args.out, args)
+
+if __name__ == "__main__":
+    main()
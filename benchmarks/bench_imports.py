@@ -0,0 +1,97 @@
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+from collections import Counter
+
+from .common import REPO_ROOT, BENCHMARK_ENV, write_results
+
+# --- Import Time ---
+# Cold-start cost per process role: each module is imported in a fresh
+# interpreter (median of --repeat runs) and its import time, resident memory,
+# loaded module count and which heavy SDKs or parsers got pulled in are
+# reported. With --importtime, the packages costing the most import time
+# (from `python -X importtime`) are listed too.
+#   python -m benchmarks.bench_imports --repeat 5 --importtime
+ROLES = {
+    "web": "app",                           # Flask app (gunicorn workers)
+    "async": "asgi",                        # ASGI app (uvicorn workers)
+    "worker": "modules.jobs",               # Ingestion job runner
+    "batch": "modules.question_bank",       # Offline question bank builds
+}
+# Should only load on first use (see modules/loaders.py and the client factories)
+HEAVY_MODULES = ["openai", "pinecone", "groq", "tavily", "pypdf", "docx2txt", "pptx", "pytesseract", "PIL", "tiktoken"]
+
+CHILD = """
+import sys, json, time, importlib, resource
+started = time.perf_counter()
+importlib.import_module(sys.argv[1])
+seconds = time.perf_counter() - started
+rss = 0.0
+with open("/proc/self/status") as f:
+    for line in f:
+        if line.startswith("VmRSS:"):
+            rss = int(line.split()[1]) / 1024
+print(json.dumps({
+    "seconds": seconds,
+    "rss_mb": rss,
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "modules": len(sys.modules),
+    "heavy": [m for m in json.loads(sys.argv[2]) if m in sys.modules],
+}))
+"""
+
+def import_once(module: str, workdir: str, importtime: bool = False) -> tuple:
+    """Import `module` in a new interpreter; (measurements, -X importtime lines)."""
+    env = {**os.environ, **BENCHMARK_ENV, "LOG_LEVEL": "WARNING", "PYTHONPATH": REPO_ROOT}
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", CHILD, module, json.dumps(HEAVY_MODULES)]
+    done = subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True, timeout=300)
+    if done.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{done.stderr[-2000:]}")
+    return json.loads(done.stdout.strip().splitlines()[-1]), done.stderr
+
+def top_packages(importtime_log: str, limit: int) -> dict:
+    """Self import time per top-level package, in seconds, from `python -X importtime` output."""
+    totals = Counter()
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|", 2)
+        totals[name.strip().split(".")[0]] += int(self_us)
+    return {name: round(us / 1e6, 4) for name, us in totals.most_common(limit)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold import time and memory per process role.")
+    parser.add_argument("--roles", nargs="+", choices=list(ROLES), default=list(ROLES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--importtime", action="store_true", help="Also list the slowest packages to import")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="qgen-imports-") as workdir:
+        for role in args.roles:
+            module = ROLES[role]
+            runs = [import_once(module, workdir)[0] for _ in range(args.repeat)]
+            results[role] = {
+                "module": module,
+                "seconds": round(statistics.median(r["seconds"] for r in runs), 4),
+                "seconds_min": round(min(r["seconds"] for r in runs), 4),
+                "rss_mb": round(statistics.median(r["rss_mb"] for r in runs), 1),
+                "peak_rss_mb": round(statistics.median(r["peak_rss_mb"] for r in runs), 1),
+                "modules": runs[-1]["modules"],
+                "heavy_modules": runs[-1]["heavy"],
+            }
+            if args.importtime:
+                results[role]["top_packages"] = top_packages(import_once(module, workdir, importtime=True)[1], args.top)
+            r = results[role]
+            print(f"[+] {role} ({module}): {r['seconds']:.3f}s, {r['rss_mb']} MB, {r['modules']} modules"
+                  + (f", loaded {', '.join(r['heavy_modules'])}" if r["heavy_modules"] else ""))
+    write_results("imports", results, args.out, args)
+
+if __name__ == "__main__":
+    main()
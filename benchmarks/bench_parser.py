@@ -0,0 +1,177 @@
+import json
+import random
+import argparse
+
+from .common import percentiles, Timer, write_results
+
+# --- LLM Output Parser ---
+# Seeded fuzz corpus of LLM outputs with the defects seen in practice, run
+# through schemas.salvage_json_items (complete outputs) and
+# schemas.iter_json_items (the same outputs streamed in small chunks).
+# Every output records which of its items should survive; the salvage rate
+# is the share of those that were recovered, and any invalid item that
+# comes through is counted as a false positive. The rate by defect covers
+# every recoverable item of the outputs with that defect, so it also shows
+# how far a defect damages its neighbours.
+#   python -m benchmarks.bench_parser --outputs 5000 --write-corpus /tmp/llm-outputs.jsonl
+STREAM_CHUNK_CHARS = 24 # About what a token stream delivers per chunk
+
+WRAPPERS = {"mcq": "mcq_list", "qa": "qa_list"}
+
+def make_item(rng: random.Random, gen_type: str, i: int) -> dict:
+    subject = f"{rng.choice(['radar', 'convoy', 'firewall', 'treaty', 'orbit', 'turret'])} {i}-{rng.randrange(10**6)}"
+    if gen_type == "mcq":
+        return {
+            "question": f"What limits the {subject} in joint operations?",
+            "options": [f"Option {c} for {subject}" for c in "ABCD"],
+            "correct_index": rng.randint(1, 4),
+        }
+    return {"question": f"How is the {subject} maintained?", "answer": f"It is maintained by the crew of the {subject}."}
+
+# --- Item Defects ---
+# (defect, item text) -> (new text, whether the item is still recoverable)
+def _trailing_comma(rng, text, item):
+    return text[:-1] + ", }", True
+
+def _raw_newline(rng, text, item):
+    return text.replace(" in ", " in\n", 1).replace(" is ", " is\n", 1), True
+
+def _missing_field(rng, text, item):
+    key = "options" if "options" in item else "answer"
+    return json.dumps({k: v for k, v in item.items() if k != key}), False
+
+def _bad_index(rng, text, item):
+    if "correct_index" not in item:
+        return json.dumps({**item, "answer": ""}), False
+    return json.dumps({**item, "correct_index": 5}), False
+
+def _unescaped_quote(rng, text, item):
+    return text.replace("What", 'What "exactly', 1).replace("How", 'How "exactly', 1), False
+
+def _single_quotes(rng, text, item):
+    return text.replace('"', "'"), False
+
+ITEM_DEFECTS = {
+    "trailing_comma": _trailing_comma,
+    "raw_newline": _raw_newline,
+    "missing_field": _missing_field,
+    "bad_index": _bad_index,
+    "unescaped_quote": _unescaped_quote,
+    "single_quotes": _single_quotes,
+}
+
+# --- Output Defects ---
+def _wrap_output(rng: random.Random, gen_type: str, items: list) -> str:
+    body = ",\n  ".join(items)
+    style = rng.choice(["wrapper", "wrapper", "questions_key", "bare_list", "one_per_line"])
+    if style == "wrapper":
+        return f'{{"{WRAPPERS[gen_type]}": [\n  {body}\n]}}'
+    if style == "questions_key":
+        return f'{{"questions": [\n  {body}\n]}}'
+    if style == "bare_list":
+        return f"[\n  {body}\n]"
+    return "\n".join(items)
+
+def make_output(rng: random.Random, gen_type: str, defect_rate: float) -> dict:
+    """One raw LLM output with its defects and the questions a perfect parser would recover."""
+    items = [make_item(rng, gen_type, i) for i in range(rng.randint(3, 12))]
+    texts, recoverable, defects = [], [], []
+    for item in items:
+        text, ok = json.dumps(item), True
+        if rng.random() < defect_rate:
+            defect = rng.choice(list(ITEM_DEFECTS))
+            text, ok = ITEM_DEFECTS[defect](rng, text, item)
+            defects.append(defect)
+        texts.append(text)
+        recoverable.append(ok)
+
+    raw = _wrap_output(rng, gen_type, texts)
+    if rng.random() < 0.3:
+        raw = f"```json\n{raw}\n```"
+        defects.append("code_fence")
+    if rng.random() < 0.2:
+        raw = f"Here are the questions based on the context:\n\n{raw}\n\nLet me know if you need more."
+        defects.append("prose")
+    if rng.random() < defect_rate:
+        # Cut inside a random item, as when max_tokens ends the generation
+        cut = rng.randrange(len(texts))
+        raw = raw[:raw.find(texts[cut]) + rng.randrange(1, len(texts[cut]))]
+        recoverable[cut:] = [False] * (len(texts) - cut)
+        defects.append("truncated")
+    expected = [item["question"] for item, ok in zip(items, recoverable) if ok]
+    return {"type": gen_type, "raw": raw, "expected": expected, "defects": defects}
+
+def build_corpus(size: int, defect_rate: float, seed: int) -> list:
+    rng = random.Random(seed)
+    return [make_output(rng, rng.choice(["mcq", "mcq", "qa"]), defect_rate) for _ in range(size)]
+
+# --- Measurement ---
+def _chunks(text: str, size: int = STREAM_CHUNK_CHARS):
+    return (text[i:i + size] for i in range(0, len(text), size))
+
+def run_parser(corpus: list, parse) -> dict:
+    from modules.schemas import is_valid_mcq, is_valid_qa
+
+    validators = {"mcq": is_valid_mcq, "qa": is_valid_qa}
+    latencies, expected_total, recovered, false_positives = [], 0, 0, 0
+    by_defect = {}
+    for output in corpus:
+        with Timer() as t:
+            items = parse(output["raw"], validators[output["type"]])
+        latencies.append(t.seconds)
+        # Whitespace is compared normalized: raw newlines in strings are kept by the parser
+        questions = [" ".join(item["question"].split()) for item in items]
+        expected = set(output["expected"])
+        hits = len(expected & set(questions))
+        expected_total += len(expected)
+        recovered += hits
+        false_positives += sum(1 for q in questions if q not in expected)
+        for defect in set(output["defects"]) or {"clean"}:
+            entry = by_defect.setdefault(defect, [0, 0])
+            entry[0] += hits
+            entry[1] += len(expected)
+
+    total_bytes = sum(len(output["raw"]) for output in corpus)
+    return {
+        "outputs_per_second": round(len(corpus) / sum(latencies), 1),
+        "mb_per_second": round(total_bytes / sum(latencies) / 2**20, 2),
+        "latency": percentiles(latencies),
+        "expected_items": expected_total,
+        "recovered_items": recovered,
+        "salvage_rate": round(recovered / expected_total, 4) if expected_total else None,
+        "false_positives": false_positives,
+        "salvage_rate_by_defect": {d: round(h / n, 4) if n else None for d, (h, n) in sorted(by_defect.items())},
+    }
+
+# --- CLI ---
+def main():
+    from modules.schemas import salvage_json_items, iter_json_items
+
+    parser = argparse.ArgumentParser(description="Fuzz the LLM output parser and measure salvage rate and speed.")
+    parser.add_argument("--outputs", type=int, default=2000)
+    parser.add_argument("--defect-rate", type=float, default=0.3, help="Share of items (and outputs) given a defect")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--write-corpus", help="Also write the corpus as JSONL to this path")
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.outputs, args.defect_rate, args.seed)
+    if args.write_corpus:
+        with open(args.write_corpus, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(output) + "\n" for output in corpus)
+        print(f"[+] Wrote {len(corpus)} outputs to {args.write_corpus}")
+
+    results = {
+        "outputs": len(corpus),
+        "defect_rate": args.defect_rate,
+        "salvage": run_parser(corpus, salvage_json_items),
+        "streaming": run_parser(corpus, lambda raw, validator: list(iter_json_items(_chunks(raw), validator))),
+    }
+    for mode in ("salvage", "streaming"):
+        r = results[mode]
+        print(f"[+] {mode}: {r['salvage_rate']:.1%} of {r['expected_items']} recoverable items, "
+              f"{r['false_positives']} false positives, {r['outputs_per_second']} outputs/s")
+    write_results("parser", results, args.out, args)
+
+if __name__ == "__main__":
+    main()
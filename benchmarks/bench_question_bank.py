@@ -0,0 +1,86 @@
+import os
+import shutil
+import argparse
+import tempfile
+
+from .common import REPO_ROOT, setup_environment, parse_env, quiet_app_logs, percentiles, memory, Timer, write_results
+from .corpus import build_corpus, load_workload
+from .replay import DEFAULT_WORKLOAD
+from .stubs import build_upstreams, install_stubs, upstream_stats, upstream_delta
+
+# --- Question Bank ---
+# Ingests the synthetic corpus, builds the question bank offline with the
+# stub LLMs (chunks and questions per second, LLM calls), then serves every
+# workload query from it: hit rate at QUESTION_BANK_MIN_SIMILARITY and
+# serving latency for hits and misses. End-to-end numbers with the bank on
+# come from the replay:  python -m benchmarks.replay --env QUESTION_BANK_ENABLED=true
+#   python -m benchmarks.bench_question_bank --scale 4 --env QUESTION_BANK_WORKERS=8
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark building and serving the question bank.")
+    parser.add_argument("--types", nargs="+", choices=["mcq", "qa"], default=["mcq", "qa"])
+    parser.add_argument("--scale", type=int, default=1, help="Corpus size multiplier")
+    parser.add_argument("--workload", default=DEFAULT_WORKLOAD)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", nargs="*", default=[], metavar="UPSTREAM=SECONDS")
+    parser.add_argument("--env", nargs="*", default=[], metavar="KEY=VALUE", help="App settings for this run")
+    parser.add_argument("--out")
+    args = parser.parse_args()
+    args.workload = os.path.abspath(args.workload)
+    args.out = args.out and os.path.abspath(args.out)
+
+    workdir = tempfile.mkdtemp(prefix="qgen-bank-")
+    setup_environment(workdir, {"QUESTION_BANK_ENABLED": "false", **parse_env(args.env)})
+    from modules.db_manager import upsert_file
+    from modules.question_bank import build_question_bank, serve_from_bank, QUESTION_BANK_MIN_SIMILARITY
+    quiet_app_logs()
+
+    upstreams = build_upstreams(parse_env(args.latency), seed=args.seed)
+    install_stubs(upstreams)
+    try:
+        paths = build_corpus(os.path.join(workdir, "corpus"), ["txt", "docx", "pdf"], args.scale, args.seed)
+        chunks = sum(upsert_file(path)["added"] for path in paths)
+        print(f"[+] Ingested {chunks} chunks from {len(paths)} files.")
+
+        before = upstream_stats(upstreams)
+        with Timer() as build:
+            summary = build_question_bank(gen_types=tuple(args.types))
+        built = {
+            **summary,
+            "chunks_per_second": round(summary["built"] / build.seconds, 3),
+            "questions_per_second": round(summary["questions"] / build.seconds, 3),
+            "upstream_calls": upstream_delta(before, upstream_stats(upstreams)),
+            "memory": memory(),
+        }
+        print(f"[+] Built {summary['questions']} questions from {summary['built']} chunks "
+              f"in {build.seconds:.2f}s ({built['chunks_per_second']} chunks/s).")
+
+        serving = {}
+        for gen_type in args.types:
+            bodies = [b for b in load_workload(args.workload) if b.get("type", "mcq") == gen_type]
+            hits, misses = [], []
+            for body in bodies:
+                with Timer() as t:
+                    items = serve_from_bank(body["query"], gen_type, int(body.get("numQuestions", 5)))
+                (hits if items else misses).append(t.seconds)
+            serving[gen_type] = {
+                "queries": len(bodies),
+                "hit_rate": round(len(hits) / len(bodies), 4) if bodies else None,
+                "latency_hit": percentiles(hits),
+                "latency_miss": percentiles(misses),
+            }
+            print(f"[+] {gen_type}: {len(hits)}/{len(bodies)} served from the bank, "
+                  f"p50 {serving[gen_type]['latency_hit'].get('p50', 0) * 1e3:.1f}ms")
+    finally:
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    write_results("question_bank", {
+        "chunks": chunks,
+        "min_similarity": QUESTION_BANK_MIN_SIMILARITY,
+        "build": built,
+        "serve": serving,
+    }, args.out, args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+import os
+import random
+import shutil
+import argparse
+import tempfile
+import numpy as np
+
+from .common import REPO_ROOT, setup_environment, percentiles, memory, Timer, write_results
+from .corpus import TOPICS, sentence
+
+# --- Retrieval Components ---
+# Local vector index (recall@k against exact search, QPS, upsert rate and
+# size per dtype and IVF nprobe), MMR re-ranking (latency, and the diversity
+# it buys over plain top-k) and the BM25 index at scale (build rate, size,
+# query latency). Vectors are clustered like real embeddings of a corpus.
+#   python -m benchmarks.bench_retrieval --vectors 100000 --lexical-chunks 1000000
+UPSERT_BATCH = 5000
+LEXICAL_BATCH = 50000
+
+def _unit(matrix: np.ndarray) -> np.ndarray:
+    return matrix / np.linalg.norm(matrix, axis=-1, keepdims=True)
+
+def clustered_vectors(rng: np.random.Generator, n: int, dim: int, clusters: int, spread: float = 0.6) -> np.ndarray:
+    """`n` unit vectors around `clusters` random centers."""
+    centers = _unit(rng.standard_normal((clusters, dim)).astype(np.float32))
+    noise = rng.standard_normal((n, dim)).astype(np.float32) * (spread / np.sqrt(dim))
+    return _unit(centers[rng.integers(clusters, size=n)] + noise)
+
+def _disk_mb(path: str) -> float:
+    return round(sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files) / 2**20, 2)
+
+# --- Local Vector Index ---
+def bench_local_index(workdir: str, n: int, dim: int, num_queries: int, k: int, dtypes, nprobes, seed: int) -> dict:
+    from modules import local_index
+    from modules.local_index import LocalVectorIndex
+
+    rng = np.random.default_rng(seed)
+    clusters = max(8, int(np.sqrt(n)) // 4)
+    data = clustered_vectors(rng, n, dim, clusters)
+    queries = clustered_vectors(rng, num_queries, dim, clusters)
+    truth = np.argsort(-(queries @ data.T), axis=1)[:, :k]
+    ids = [f"v{i}" for i in range(n)]
+
+    results = {}
+    for dtype in dtypes:
+        path = os.path.join(workdir, f"index-{dtype}")
+        index = LocalVectorIndex(path, dim, dtype)
+        with Timer() as upsert:
+            for start in range(0, n, UPSERT_BATCH):
+                index.upsert(vectors=[
+                    {"id": ids[i], "values": data[i].tolist(), "metadata": {}} for i in range(start, min(start + UPSERT_BATCH, n))
+                ])
+        modes = {"exact": (n + 1, None)}
+        modes.update({f"ivf_nprobe_{p}": (0, p) for p in nprobes})
+
+        entry = {"upsert_vectors_per_second": round(n / upsert.seconds, 1), "disk_mb": _disk_mb(path), "modes": {}}
+        default_threshold = local_index.LOCAL_INDEX_IVF_MIN_VECTORS
+        try:
+            for mode, (threshold, nprobe) in modes.items():
+                local_index.LOCAL_INDEX_IVF_MIN_VECTORS = threshold
+                with Timer() as first: # Builds the IVF on the first IVF query
+                    index.query(vector=queries[0].tolist(), top_k=k, nprobe=nprobe)
+                latencies, recalls = [], []
+                for q, expected in zip(queries, truth):
+                    with Timer() as t:
+                        matches = index.query(vector=q.tolist(), top_k=k, nprobe=nprobe)["matches"]
+                    latencies.append(t.seconds)
+                    found = {int(m["id"][1:]) for m in matches}
+                    recalls.append(len(found & set(expected.tolist())) / k)
+                entry["modes"][mode] = {
+                    f"recall_at_{k}": round(float(np.mean(recalls)), 4),
+                    "qps": round(len(latencies) / sum(latencies), 1),
+                    "latency": percentiles(latencies),
+                    "first_query_seconds": round(first.seconds, 4),
+                }
+        finally:
+            local_index.LOCAL_INDEX_IVF_MIN_VECTORS = default_threshold
+        results[dtype] = entry
+        print(f"[+] Local index ({dtype}): " + ", ".join(
+            f"{mode} recall {m[f'recall_at_{k}']:.3f} / {m['qps']} qps" for mode, m in entry["modes"].items()
+        ))
+    return {"vectors": n, "dimension": dim, "queries": num_queries, "k": k, "dtypes": results}
+
+# --- MMR ---
+def _mean_pairwise_similarity(vectors: np.ndarray) -> float:
+    sims = vectors @ vectors.T
+    n = len(vectors)
+    return float((sims.sum() - n) / (n * (n - 1))) if n > 1 else 1.0
+
+def bench_mmr(fetch_ks, ks, lambda_mult: float, dim: int, repeats: int, seed: int) -> dict:
+    from modules.utils import mmr_select
+
+    rng = np.random.default_rng(seed)
+    results = {}
+    for fetch_k in fetch_ks:
+        for k in ks:
+            latencies, top_div, mmr_div, top_rel, mmr_rel = [], [], [], [], []
+            for _ in range(repeats):
+                query = _unit(rng.standard_normal(dim).astype(np.float32))
+                # Candidates as retrieval returns them: near the query, in near-duplicate groups
+                candidates = _unit(query + clustered_vectors(rng, fetch_k, dim, max(2, fetch_k // 5), spread=0.5) * 0.8)
+                scores = candidates @ query
+                with Timer() as t:
+                    selected = mmr_select(query, candidates, k=k, lambda_mult=lambda_mult)
+                latencies.append(t.seconds)
+                top = np.argsort(-scores)[:k]
+                top_div.append(1 - _mean_pairwise_similarity(candidates[top]))
+                mmr_div.append(1 - _mean_pairwise_similarity(candidates[list(selected)]))
+                top_rel.append(float(scores[top].mean()))
+                mmr_rel.append(float(scores[list(selected)].mean()))
+            results[f"fetch_{fetch_k}_k_{k}"] = {
+                "latency": percentiles(latencies),
+                "diversity_top_k": round(float(np.mean(top_div)), 4),
+                "diversity_mmr": round(float(np.mean(mmr_div)), 4),
+                "relevance_top_k": round(float(np.mean(top_rel)), 4),
+                "relevance_mmr": round(float(np.mean(mmr_rel)), 4),
+            }
+    print(f"[+] MMR: {len(results)} settings, p50 up to {max(r['latency']['p50'] for r in results.values()) * 1e3:.2f}ms")
+    return {"lambda": lambda_mult, "dimension": dim, "settings": results}
+
+# --- BM25 ---
+def synthetic_chunk(rng: random.Random, topics: list) -> str:
+    topic = rng.choice(topics)
+    return " ".join(sentence(rng, topic) for _ in range(6)) + f" Reference {rng.randrange(10**6)}."
+
+def bench_lexical(workdir: str, chunks: int, num_queries: int, k: int, seed: int) -> dict:
+    from modules.lexical_index import BM25Index
+
+    rng = random.Random(seed)
+    topics = list(TOPICS)
+    path = os.path.join(workdir, "lexical")
+    index = BM25Index(path)
+    with Timer() as build:
+        for start in range(0, chunks, LEXICAL_BATCH):
+            count = min(LEXICAL_BATCH, chunks - start)
+            index.add([f"c{i}" for i in range(start, start + count)], (synthetic_chunk(rng, topics) for _ in range(count)))
+            index.flush()
+
+    latencies = []
+    for _ in range(num_queries):
+        topic = rng.choice(topics)
+        query = " ".join(rng.sample(TOPICS[topic], 2) + [topic])
+        with Timer() as t:
+            index.search(query, top_k=k)
+        latencies.append(t.seconds)
+    result = {
+        "chunks": len(index),
+        "build_seconds": round(build.seconds, 2),
+        "chunks_per_second": round(chunks / build.seconds, 1),
+        "disk_mb": _disk_mb(path),
+        "query_latency": percentiles(latencies),
+        "memory": memory(),
+    }
+    print(f"[+] BM25 over {chunks} chunks: p50 {result['query_latency']['p50'] * 1e3:.1f}ms, {result['disk_mb']} MB")
+    return result
+
+# --- CLI ---
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the local vector index, MMR and BM25.")
+    parser.add_argument("--only", nargs="+", choices=["index", "mmr", "lexical"], default=["index", "mmr", "lexical"])
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=256, help="Vector size (the app's embeddings have 1536)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dtypes", nargs="+", choices=["float32", "int8"], default=["float32", "int8"])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--mmr-fetch-k", type=int, nargs="+", default=[20, 50, 100, 200])
+    parser.add_argument("--mmr-k", type=int, nargs="+", default=[5, 8])
+    parser.add_argument("--mmr-lambda", type=float, default=0.5)
+    parser.add_argument("--lexical-chunks", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out")
+    args = parser.parse_args()
+    args.out = args.out and os.path.abspath(args.out)
+
+    workdir = tempfile.mkdtemp(prefix="qgen-retrieval-")
+    setup_environment(workdir, {"LOG_LEVEL": "WARNING"})
+    results = {}
+    try:
+        if "index" in args.only:
+            results["local_index"] = bench_local_index(
+                workdir, args.vectors, args.dim, args.queries, args.k, args.dtypes, args.nprobe, args.seed
+            )
+        if "mmr" in args.only:
+            results["mmr"] = bench_mmr(args.mmr_fetch_k, args.mmr_k, args.mmr_lambda, 1536, args.queries, args.seed)
+        if "lexical" in args.only:
+            results["lexical"] = bench_lexical(workdir, args.lexical_chunks, args.queries, args.k, args.seed)
+    finally:
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+    write_results("retrieval", results, args.out, args)
+
+if __name__ == "__main__":
+    main()
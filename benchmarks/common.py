@@ -0,0 +1,114 @@
+import os
+import sys
+import json
+import time
+import logging
+import platform
+import resource
+import subprocess
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+
+# The benchmarks change into a scratch directory, so the repo must be importable by path
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+# --- Environment ---
+# Every benchmark runs the app against the in-process stand-ins of
+# benchmarks/stubs.py, with all on-disk state (indexes, manifests, caches,
+# uploads) in a scratch directory. Settings are read when the app's modules
+# are imported, so this must run first.
+BENCHMARK_ENV = {
+    "VECTOR_BACKEND": "local",
+    "OPENAI_API_KEY": "stub",
+    "GROQ_API_KEY": "stub",
+    "TAVILY_API_KEY": "stub",
+    "PINECONE_API_KEY": "stub",
+    "LOG_LEVEL": "INFO",        # Trace summaries are info lines
+    "LOG_SAMPLE_RATE": "1.0",
+}
+
+def setup_environment(workdir: str, overrides: dict = None):
+    """Point the app at `workdir` with benchmark settings, before any app module is imported."""
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    for name, value in BENCHMARK_ENV.items():
+        os.environ.setdefault(name, value)
+    os.environ.update(overrides or {})
+
+def parse_env(pairs) -> dict:
+    """KEY=VALUE command line pairs as a dict."""
+    env = {}
+    for pair in pairs or []:
+        name, _, value = pair.partition("=")
+        env[name] = value
+    return env
+
+def quiet_app_logs():
+    """Only warnings from the app on stdout; records still reach handlers added by the benchmark."""
+    for handler in logging.getLogger("qgen").handlers:
+        handler.setLevel(logging.WARNING)
+
+# --- Measurements ---
+def percentiles(values) -> dict:
+    """count, mean, p50, p95, p99 and max of a list of numbers (seconds unless noted)."""
+    if not len(values):
+        return {"count": 0}
+    data = np.asarray(values, dtype=np.float64)
+    return {
+        "count": int(len(data)),
+        "mean": round(float(data.mean()), 6),
+        "p50": round(float(np.percentile(data, 50)), 6),
+        "p95": round(float(np.percentile(data, 95)), 6),
+        "p99": round(float(np.percentile(data, 99)), 6),
+        "max": round(float(data.max()), 6),
+    }
+
+def memory() -> dict:
+    """Current and peak resident memory of this process, in MB."""
+    usage = {"peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    usage["rss_mb"] = round(int(line.split()[1]) / 1024, 1)
+    except OSError: # Not Linux: the peak is all there is
+        pass
+    return usage
+
+class Timer:
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.started
+
+# --- Results ---
+def run_metadata(args=None) -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "args": vars(args) if args is not None else {},
+    }
+
+def write_results(name: str, results: dict, path: str = None, args=None) -> str:
+    """Write `results` with run metadata as JSON (benchmarks/results/<name>-<time>.json by default)."""
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"benchmark": name, "meta": run_metadata(args), "results": results}, f, indent=2)
+    print(f"[+] Results written to {path}")
+    return path
@@ -0,0 +1,84 @@
+import re
+import sys
+import json
+import argparse
+
+# --- Result Diffs ---
+# Compare two result files of the same benchmark, metric by metric. A metric
+# counts as a regression when it moved the wrong way by more than
+# --threshold: up for latencies, durations and sizes, down for throughput,
+# recall and hit or salvage rates. Lists of per-level results (the replay's
+# concurrency levels) are matched by their "concurrency" value.
+#   python -m benchmarks.compare benchmarks/results/replay-A.json benchmarks/results/replay-B.json --only p95 throughput
+HIGHER_IS_BETTER = re.compile(r"per_second|throughput|qps|recall|hit_rate|salvage_rate|served_from_bank|diversity")
+LOWER_IS_BETTER = re.compile(r"latency|seconds|p50|p95|p99|mean|max|_mb|failures|false_positives|rejections")
+
+def flatten(value, prefix: str = "") -> dict:
+    """Numeric leaves of a result tree as {"a.b.c": number}."""
+    if isinstance(value, bool):
+        return {}
+    if isinstance(value, (int, float)):
+        return {prefix: value}
+    if isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, list):
+        items = ((f"c={v['concurrency']}" if isinstance(v, dict) and "concurrency" in v else str(i), v)
+                 for i, v in enumerate(value))
+    else:
+        return {}
+    leaves = {}
+    for key, child in items:
+        leaves.update(flatten(child, f"{prefix}.{key}" if prefix else str(key)))
+    return leaves
+
+def direction(path: str) -> int:
+    """+1 if higher is better, -1 if lower is better, 0 if neither (counts, settings)."""
+    if HIGHER_IS_BETTER.search(path):
+        return 1
+    if LOWER_IS_BETTER.search(path) and not path.endswith(".count"):
+        return -1
+    return 0
+
+def compare(base: dict, new: dict, threshold: float, only=None) -> list:
+    """(path, base, new, relative change, regressed) for every metric in both results."""
+    base_leaves, new_leaves = flatten(base.get("results", base)), flatten(new.get("results", new))
+    rows = []
+    for path in sorted(base_leaves.keys() & new_leaves.keys()):
+        if only and not any(pattern in path for pattern in only):
+            continue
+        b, n = base_leaves[path], new_leaves[path]
+        change = (n - b) / abs(b) if b else (0.0 if n == b else float("inf"))
+        rows.append((path, b, n, change, direction(path) * change < -threshold))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Diff two benchmark result files.")
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative change counted as a regression")
+    parser.add_argument("--only", nargs="+", help="Only metrics whose path contains one of these")
+    parser.add_argument("--changed", action="store_true", help="Hide metrics that moved less than the threshold")
+    args = parser.parse_args()
+
+    with open(args.base, "r", encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, "r", encoding="utf-8") as f:
+        new = json.load(f)
+    if base.get("benchmark") != new.get("benchmark"):
+        print(f"[!] Comparing different benchmarks: {base.get('benchmark')} vs {new.get('benchmark')}")
+
+    rows = compare(base, new, args.threshold, args.only)
+    width = max((len(path) for path, *_ in rows), default=10)
+    print(f"{'metric':<{width}}  {'base':>12}  {'new':>12}  {'change':>8}")
+    for path, b, n, change, regressed in rows:
+        if args.changed and abs(change) < args.threshold:
+            continue
+        print(f"{path:<{width}}  {b:>12.6g}  {n:>12.6g}  {change:>+8.1%}{'  <- regression' if regressed else ''}")
+
+    regressions = sum(1 for *_, regressed in rows if regressed)
+    print(f"[{'!' if regressions else '+'}] {regressions} regressions over {args.threshold:.0%} "
+          f"({base.get('meta', {}).get('commit')} -> {new.get('meta', {}).get('commit')}).")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import os
+import json
+import random
+import zipfile
+import argparse
+from xml.sax.saxutils import escape
+
+WORKLOADS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "workloads")
+FORMATS = ("txt", "docx", "pdf", "png")
+
+# --- Vocabulary ---
+# Topics of the synthetic corpus, each with its own terms, so documents are
+# distinguishable by retrieval and queries about one topic match its files.
+TOPICS = {
+    "radar systems": ["radar", "antenna", "pulse", "doppler", "clutter", "waveform", "transmitter", "phased array"],
+    "naval logistics": ["convoy", "replenishment", "tanker", "port", "fuel", "sealift", "escort", "dry dock"],
+    "air defense": ["interceptor", "missile", "battery", "airspace", "early warning", "launcher", "engagement", "sensor"],
+    "cyber operations": ["network", "malware", "intrusion", "firewall", "encryption", "exploit", "incident", "patch"],
+    "military history": ["campaign", "treaty", "siege", "cavalry", "fortress", "armistice", "dynasty", "frontier"],
+    "satellite reconnaissance": ["orbit", "imagery", "ground station", "resolution", "payload", "launch", "telemetry", "revisit"],
+    "armored warfare": ["tank", "armor", "turret", "tracks", "infantry", "reconnaissance", "breakthrough", "mobility"],
+    "defense procurement": ["contract", "budget", "tender", "supplier", "lifecycle", "audit", "requirement", "offset"],
+}
+VERBS = ["supports", "limits", "improves", "depends on", "replaced", "coordinates", "protects", "detects", "shapes"]
+QUALIFIERS = ["In most doctrines", "During the Cold War", "In modern practice", "According to field manuals",
+              "In joint operations", "Historically", "Under peacetime conditions", "In training exercises"]
+
+def sentence(rng: random.Random, topic: str) -> str:
+    terms = TOPICS[topic]
+    a, b = rng.sample(terms, 2)
+    return f"{rng.choice(QUALIFIERS)}, the {a} {rng.choice(VERBS)} the {b} within {topic}."
+
+def paragraphs(rng: random.Random, topic: str, count: int, sentences: int = 6) -> list:
+    return [" ".join(sentence(rng, topic) for _ in range(sentences)) for _ in range(count)]
+
+# --- Writers ---
+def write_txt(path: str, paras: list):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n\n".join(paras))
+
+def write_docx(path: str, paras: list):
+    """Minimal WordprocessingML package (what docx2txt reads)."""
+    content_types = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/word/document.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+        '</Types>'
+    )
+    rels = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="word/document.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    )
+    body = "".join(f"<w:p><w:r><w:t>{escape(p)}</w:t></w:r></w:p>" for p in paras)
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f'<w:body>{body}</w:body></w:document>'
+    )
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", content_types)
+        archive.writestr("_rels/.rels", rels)
+        archive.writestr("word/document.xml", document)
+
+def _wrap(text: str, width: int) -> list:
+    lines, line = [], ""
+    for word in text.split():
+        if line and len(line) + len(word) + 1 > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}".strip()
+    return lines + [line] if line else lines
+
+def write_pdf(path: str, paras: list, lines_per_page: int = 50):
+    """Text-only PDF with the standard Helvetica font (what pypdf extracts)."""
+    lines = []
+    for p in paras:
+        lines += _wrap(p, 95) + [""]
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+
+    def pdf_string(text: str) -> str:
+        return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    objects = {
+        1: "<< /Type /Catalog /Pages 2 0 R >>",
+        2: f"<< /Type /Pages /Kids [{' '.join(f'{4 + 2 * i} 0 R' for i in range(len(pages)))}] /Count {len(pages)} >>",
+        3: "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    for i, page in enumerate(pages):
+        stream = "BT /F1 10 Tf 13 TL 50 800 Td " + " ".join(f"({pdf_string(l)}) Tj T*" for l in page) + " ET"
+        objects[4 + 2 * i] = (
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>"
+        )
+        objects[5 + 2 * i] = f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream"
+
+    out, offsets = bytearray(b"%PDF-1.4\n"), {}
+    for number in sorted(objects):
+        offsets[number] = len(out)
+        out += f"{number} 0 obj\n{objects[number]}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offsets[n]:010d} 00000 n \n" for n in sorted(objects)).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(out)
+
+def write_png(path: str, paras: list):
+    """Scanned-page style image of the text (ingested through OCR)."""
+    from PIL import Image, ImageDraw
+
+    lines = []
+    for p in paras:
+        lines += _wrap(p, 90) + [""]
+    image = Image.new("L", (1000, 40 + 18 * len(lines)), 255)
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(lines):
+        draw.text((30, 20 + 18 * i), line, fill=0)
+    image.save(path)
+
+WRITERS = {"txt": write_txt, "docx": write_docx, "pdf": write_pdf, "png": write_png}
+
+# --- Corpus ---
+def build_corpus(out_dir: str, formats=FORMATS, scale: int = 1, seed: int = 0) -> list:
+    """
+    Write one document per topic and format into `out_dir` (about 10*scale
+    paragraphs each; images are kept short) and return their paths.
+    The same seed and scale always produce the same files.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for t, topic in enumerate(TOPICS):
+        for fmt in formats:
+            rng = random.Random(f"{seed}:{topic}:{fmt}")
+            count = 3 if fmt == "png" else 10 * scale
+            path = os.path.join(out_dir, f"{topic.replace(' ', '_')}.{fmt}")
+            WRITERS[fmt](path, paragraphs(rng, topic, count))
+            paths.append(path)
+    return paths
+
+# --- Workloads ---
+def build_workload(size: int = 60, seed: int = 0) -> list:
+    """
+    /generate request bodies resembling real traffic: MCQ and Q&A over the
+    corpus topics at several sizes (some large enough to fan out), repeated
+    queries (generation cache hits) and off-corpus queries with the web
+    fallback enabled.
+    """
+    rng = random.Random(seed)
+    requests, topics = [], list(TOPICS)
+    templates = ["Explain {term} in {topic}", "Generate questions about the {term}",
+                 "How does the {term} relate to {topic}?", "{topic}: the role of the {term}"]
+    off_corpus = ["space weather forecasting", "medieval trade routes", "coral reef ecology", "quantum key distribution"]
+    for _ in range(size):
+        roll = rng.random()
+        if requests and roll < 0.15:
+            requests.append(dict(rng.choice(requests)))
+            continue
+        if roll < 0.25:
+            query, use_tavily = f"Key facts about {rng.choice(off_corpus)}", True
+        else:
+            topic = rng.choice(topics)
+            query = rng.choice(templates).format(term=rng.choice(TOPICS[topic]), topic=topic)
+            use_tavily = rng.random() < 0.2
+        requests.append({
+            "query": query,
+            "type": rng.choice(["mcq", "mcq", "qa"]),
+            "numQuestions": rng.choice([3, 5, 5, 8, 12]),
+            "useTavily": use_tavily,
+        })
+    return requests
+
+def load_workload(path: str) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def save_workload(path: str, requests: list):
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(r) + "\n" for r in requests)
+
+# --- CLI ---
+# Write the corpus for manual runs, or re-record the default workload:
+#   python -m benchmarks.corpus --out /tmp/corpus --scale 2
+#   python -m benchmarks.corpus --workload benchmarks/workloads/default.jsonl
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write the synthetic corpus or a recorded workload.")
+    parser.add_argument("--out", help="Directory to write the corpus to")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=list(FORMATS))
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--workload", help="Path of a workload file to (re)write")
+    parser.add_argument("--size", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if args.out:
+        print(f"[+] Wrote {len(build_corpus(args.out, args.formats, args.scale, args.seed))} documents to {args.out}")
+    if args.workload:
+        save_workload(args.workload, build_workload(args.size, args.seed))
+        print(f"[+] Wrote {args.size} requests to {args.workload}")
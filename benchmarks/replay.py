@@ -0,0 +1,277 @@
+import os
+import json
+import time
+import shutil
+import asyncio
+import logging
+import argparse
+import tempfile
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from .common import REPO_ROOT, setup_environment, parse_env, quiet_app_logs, percentiles, memory, Timer, write_results
+from .corpus import FORMATS, WORKLOADS_DIR, build_corpus, load_workload
+from .stubs import DEFAULT_UPSTREAMS, build_upstreams, install_stubs, upstream_stats, upstream_delta
+
+# --- End-to-End Replay ---
+# Uploads the synthetic corpus through /upload, waits for ingestion, then
+# replays a recorded /generate workload at each concurrency level against the
+# Flask app (or the ASGI app with --target asgi), with every upstream replaced
+# by the stand-ins of benchmarks/stubs.py. Per level it reports throughput,
+# latency percentiles overall and per pipeline stage (from the app's request
+# traces), upstream calls and memory, as JSON that benchmarks/compare.py
+# diffs across runs:
+#   python -m benchmarks.replay --concurrency 1 4 16 --requests 60
+DEFAULT_WORKLOAD = os.path.join(WORKLOADS_DIR, "default.jsonl")
+JOB_POLL_SECONDS = 0.05
+INGEST_TIMEOUT_SECONDS = 600
+
+# --- Trace Capture ---
+class TraceCollector(logging.Handler):
+    """Collects the JSON summary the app logs at the end of each traced request (see modules/telemetry.py)."""
+
+    def __init__(self):
+        super().__init__(logging.INFO)
+        self._traces = []
+        self._lock = threading.Lock()
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            trace = json.loads(record.getMessage())
+        except ValueError:
+            return
+        with self._lock:
+            self._traces.append(trace)
+
+    def drain(self) -> list:
+        with self._lock:
+            traces, self._traces = self._traces, []
+        return traces
+
+def summarize_traces(traces: list) -> dict:
+    """Per-stage latency percentiles (summed per request) and request-level counters."""
+    stages, counts = {}, Counter()
+    attributes = {"context_source": Counter(), "llm_tier": Counter()}
+    for trace in traces:
+        for name, seconds in trace.get("stages", {}).items():
+            stages.setdefault(name, []).append(seconds)
+        counts.update(trace.get("counts", {}))
+        for name, values in attributes.items():
+            if name in trace:
+                values[trace[name]] += 1
+    return {
+        "stages": {name: percentiles(values) for name, values in sorted(stages.items())},
+        "counts": dict(sorted(counts.items())),
+        **{name: dict(values) for name, values in attributes.items()},
+    }
+
+def stage_totals_delta(before: dict, after: dict) -> dict:
+    """Mean seconds and count per stage between two STAGE_SECONDS.totals() snapshots."""
+    stages = {}
+    for key, (total, count) in after.items():
+        prev_total, prev_count = before.get(key, (0.0, 0))
+        if count > prev_count:
+            stages[key[0]] = {"count": count - prev_count, "mean": round((total - prev_total) / (count - prev_count), 6)}
+    return dict(sorted(stages.items()))
+
+# --- Ingestion Phase ---
+def run_ingest(client, paths: list) -> dict:
+    """Upload every file (retrying while the job queue pushes back) and wait for the ingestion jobs."""
+    from modules.telemetry import STAGE_SECONDS
+
+    stage_before = STAGE_SECONDS.totals()
+    upload_latency, jobs, rejected = [], {}, 0
+    with Timer() as wall:
+        for path in paths:
+            while True:
+                with open(path, "rb") as f, Timer() as t:
+                    response = client.post("/upload", data={"file": (f, os.path.basename(path))},
+                                           content_type="multipart/form-data")
+                upload_latency.append(t.seconds)
+                if response.status_code != 503:
+                    break
+                rejected += 1
+                time.sleep(0.2)
+            if response.status_code == 202:
+                jobs[response.get_json()["job_id"]] = path
+
+        finished, deadline = {}, time.monotonic() + INGEST_TIMEOUT_SECONDS
+        while len(finished) < len(jobs) and time.monotonic() < deadline:
+            for job_id in jobs.keys() - finished.keys():
+                job = client.get(f"/jobs/{job_id}").get_json()
+                if job["status"] in ("done", "failed"):
+                    finished[job_id] = job
+            time.sleep(JOB_POLL_SECONDS)
+
+    by_format = {}
+    for job_id, path in jobs.items():
+        job = finished.get(job_id, {"status": "timeout"})
+        entry = by_format.setdefault(os.path.splitext(path)[1].lstrip("."), {"status": Counter(), "seconds": [], "chunks": 0})
+        entry["status"][job["status"]] += 1
+        if "updated_at" in job:
+            entry["seconds"].append(job["updated_at"] - job["created_at"])
+        entry["chunks"] += (job.get("result") or {}).get("added", 0)
+        if job.get("error"):
+            entry.setdefault("errors", sorted({job["error"]}))
+
+    chunks = sum(entry["chunks"] for entry in by_format.values())
+    return {
+        "files": len(paths),
+        "seconds": round(wall.seconds, 4),
+        "files_per_second": round(len(paths) / wall.seconds, 3),
+        "chunks": chunks,
+        "chunks_per_second": round(chunks / wall.seconds, 3),
+        "upload_latency": percentiles(upload_latency),
+        "upload_rejections": rejected,
+        "formats": {
+            fmt: {"jobs": dict(e["status"]), "job_latency": percentiles(e["seconds"]), "chunks": e["chunks"],
+                  **({"errors": e["errors"]} if "errors" in e else {})}
+            for fmt, e in sorted(by_format.items())
+        },
+        "stages": stage_totals_delta(stage_before, STAGE_SECONDS.totals()),
+    }
+
+# --- Generation Phase ---
+def send_flask(app, bodies: list, concurrency: int) -> list:
+    """POST each body to /generate from `concurrency` threads; (status, seconds, response) per request."""
+    local = threading.local()
+
+    def send(body):
+        if not hasattr(local, "client"):
+            local.client = app.test_client()
+        with Timer() as t:
+            response = local.client.post("/generate", json=body)
+        return response.status_code, t.seconds, response.get_json(silent=True) or {}
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(send, bodies))
+
+def send_asgi(app, bodies: list, concurrency: int) -> list:
+    """Same as `send_flask` against the ASGI app, with at most `concurrency` requests in flight."""
+    import httpx
+
+    async def run():
+        limit = asyncio.Semaphore(concurrency)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://replay", timeout=None) as client:
+            async def send(body):
+                async with limit:
+                    with Timer() as t:
+                        response = await client.post("/generate", json=body)
+                try:
+                    payload = response.json()
+                except ValueError:
+                    payload = {}
+                return response.status_code, t.seconds, payload
+
+            return await asyncio.gather(*(send(body) for body in bodies))
+
+    return asyncio.run(run())
+
+def run_level(send, app, bodies: list, concurrency: int, upstreams: dict, collector: TraceCollector) -> dict:
+    before = upstream_stats(upstreams)
+    collector.drain()
+    with Timer() as wall:
+        responses = send(app, bodies, concurrency)
+    traces = [t for t in collector.drain() if t.get("route") == "generate"]
+
+    statuses = Counter(str(status) for status, _, _ in responses)
+    ok = [(seconds, payload) for status, seconds, payload in responses if status == 200]
+    return {
+        "concurrency": concurrency,
+        "requests": len(bodies),
+        "seconds": round(wall.seconds, 4),
+        "throughput_rps": round(len(bodies) / wall.seconds, 3),
+        "status": dict(statuses),
+        "latency": percentiles([seconds for _, seconds, _ in responses]),
+        "latency_ok": percentiles([seconds for seconds, _ in ok]),
+        "questions_per_response": percentiles([len(payload.get("data") or []) for _, payload in ok]),
+        "served_from_bank": sum(1 for _, payload in ok if payload.get("source") == "question_bank"),
+        **summarize_traces(traces),
+        "upstream_calls": upstream_delta(before, upstream_stats(upstreams)),
+        "memory": memory(),
+    }
+
+# --- CLI ---
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded workload against the app with stub providers.")
+    parser.add_argument("--target", choices=["flask", "asgi"], default="flask")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=60, help="Requests per concurrency level")
+    parser.add_argument("--warmup", type=int, default=2, help="Unmeasured requests before the first level")
+    parser.add_argument("--workload", default=DEFAULT_WORKLOAD)
+    parser.add_argument("--formats", nargs="+", choices=FORMATS,
+                        default=list(FORMATS) if shutil.which("tesseract") else [f for f in FORMATS if f != "png"],
+                        help="Corpus formats to ingest (png, OCR'd, by default only where tesseract is installed)")
+    parser.add_argument("--scale", type=int, default=1, help="Corpus size multiplier")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", nargs="*", default=[], metavar="UPSTREAM=SECONDS",
+                        help=f"Per-call latency of {', '.join(DEFAULT_UPSTREAMS)}")
+    parser.add_argument("--failure-rate", nargs="*", default=[], metavar="UPSTREAM=RATE")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Share of LLM items returned truncated")
+    parser.add_argument("--env", nargs="*", default=[], metavar="KEY=VALUE", help="App settings for this run")
+    parser.add_argument("--workdir", help="Scratch directory (a temporary one by default)")
+    parser.add_argument("--keep-workdir", action="store_true")
+    parser.add_argument("--out", help="Results file (benchmarks/results/replay-<time>.json by default)")
+    args = parser.parse_args()
+
+    # Paths given on the command line are relative to where the benchmark was started
+    args.workload = os.path.abspath(args.workload)
+    args.out = args.out and os.path.abspath(args.out)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="qgen-replay-")
+    setup_environment(workdir, parse_env(args.env))
+
+    # Imported only now: the app reads its settings at import time
+    import app as flask_module
+    target = flask_module.app
+    if args.target == "asgi":
+        import asgi
+        target = asgi.app
+    quiet_app_logs()
+    collector = TraceCollector()
+    logging.getLogger("qgen.trace").addHandler(collector)
+
+    upstreams = build_upstreams(parse_env(args.latency), parse_env(args.failure_rate), args.seed)
+    install_stubs(upstreams, args.malformed_rate)
+    workload = load_workload(args.workload)
+    send = send_asgi if args.target == "asgi" else send_flask
+
+    try:
+        print(f"[*] Ingesting the synthetic corpus ({', '.join(args.formats)}, scale {args.scale})...")
+        before = upstream_stats(upstreams)
+        paths = build_corpus(os.path.join(workdir, "corpus"), args.formats, args.scale, args.seed)
+        ingest = run_ingest(flask_module.app.test_client(), paths)
+        ingest["upstream_calls"] = upstream_delta(before, upstream_stats(upstreams))
+        ingest["memory"] = memory()
+        print(f"[+] Ingested {ingest['chunks']} chunks from {ingest['files']} files in {ingest['seconds']:.2f}s.")
+
+        if args.warmup:
+            send(target, workload[:args.warmup], 1)
+        levels = []
+        for concurrency in args.concurrency:
+            # Each level starts with cold in-process caches; indexes on disk are kept
+            install_stubs(upstreams, args.malformed_rate)
+            bodies = [workload[i % len(workload)] for i in range(args.requests)]
+            level = run_level(send, target, bodies, concurrency, upstreams, collector)
+            levels.append(level)
+            print(
+                f"[+] c={concurrency}: {level['throughput_rps']} req/s, p50 {level['latency']['p50']:.3f}s, "
+                f"p95 {level['latency']['p95']:.3f}s, p99 {level['latency']['p99']:.3f}s, status {level['status']}"
+            )
+    finally:
+        os.chdir(REPO_ROOT)
+        if not args.keep_workdir and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    write_results("replay", {
+        "target": args.target,
+        "upstreams": {name: {k: getattr(u, k) for k in ("latency", "jitter", "failure_rate", "token_latency")}
+                      for name, u in upstreams.items()},
+        "workload": {"path": os.path.relpath(args.workload, REPO_ROOT), "size": len(workload)},
+        "ingest": ingest,
+        "generate": levels,
+    }, args.out, args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+import re
+import json
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from collections import Counter
+from types import SimpleNamespace
+from typing import Any, Iterator, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# --- Upstream Simulation ---
+# Defaults per stand-in: seconds per call, +/- jitter share, share of calls
+# that fail, and (LLMs) seconds per completion token. Override with
+# `--latency groq_large=0.8 --failure-rate openai=0.05` on the benchmark CLIs.
+DEFAULT_UPSTREAMS = {
+    "openai": {"latency": 0.02, "jitter": 0.2, "failure_rate": 0.0},
+    "pinecone": {"latency": 0.01, "jitter": 0.2, "failure_rate": 0.0},
+    "groq_small": {"latency": 0.05, "jitter": 0.2, "failure_rate": 0.0, "token_latency": 0.0002},
+    "groq_large": {"latency": 0.15, "jitter": 0.2, "failure_rate": 0.0, "token_latency": 0.0005},
+    "tavily": {"latency": 0.1, "jitter": 0.2, "failure_rate": 0.0},
+}
+STUB_EMBEDDING_DIMENSION = 1536
+STREAM_CHUNK_CHARS = 24
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+class StubFailure(RuntimeError):
+    """Injected upstream error."""
+
+class Upstream:
+    """Latency, failure injection and call counting of one stand-in provider (seeded, thread-safe)."""
+
+    def __init__(self, name: str, latency: float = 0.0, jitter: float = 0.0, failure_rate: float = 0.0,
+                 token_latency: float = 0.0, seed: int = 0):
+        self.name = name
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.token_latency = token_latency
+        self._rng = random.Random(f"{seed}:{name}")
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.items = 0
+        self.failures = 0
+        self.seconds = 0.0
+        self._repeats = Counter()
+
+    def _plan(self, items: int, tokens: int) -> float:
+        """Count the call and return its delay; raises StubFailure for injected errors."""
+        with self._lock:
+            self.calls += 1
+            self.items += items
+            failed = self._rng.random() < self.failure_rate
+            delay = self.latency * (1 + self.jitter * (2 * self._rng.random() - 1)) + self.token_latency * tokens
+            self.seconds += delay
+            if failed:
+                self.failures += 1
+        if failed:
+            raise StubFailure(f"{self.name}: injected failure")
+        return max(0.0, delay)
+
+    def call(self, items: int = 1, tokens: int = 0):
+        time.sleep(self._plan(items, tokens))
+
+    async def acall(self, items: int = 1, tokens: int = 0):
+        await asyncio.sleep(self._plan(items, tokens))
+
+    def repeat(self, key) -> int:
+        """How many times `key` was seen before (0 the first time)."""
+        with self._lock:
+            self._repeats[key] += 1
+            return self._repeats[key] - 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"calls": self.calls, "items": self.items, "failures": self.failures,
+                    "simulated_seconds": round(self.seconds, 4)}
+
+def build_upstreams(latency: dict = None, failure_rate: dict = None, seed: int = 0) -> dict:
+    """Upstreams with DEFAULT_UPSTREAMS settings, overridden per name."""
+    upstreams = {}
+    for name, settings in DEFAULT_UPSTREAMS.items():
+        settings = dict(settings)
+        if latency and name in latency:
+            settings["latency"] = float(latency[name])
+        if failure_rate and name in failure_rate:
+            settings["failure_rate"] = float(failure_rate[name])
+        upstreams[name] = Upstream(name, seed=seed, **settings)
+    return upstreams
+
+def _seed(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+# --- OpenAI Embeddings ---
+class StubEmbeddings(Embeddings):
+    """
+    Deterministic hashed bag-of-words embeddings: texts sharing words get
+    similar vectors, so retrieval, MMR and the relevance gate behave like
+    they do on real embeddings. One upstream call per embed request.
+    """
+
+    def __init__(self, upstream: Upstream, dimension: int = STUB_EMBEDDING_DIMENSION):
+        self.upstream = upstream
+        self.dimension = dimension
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for word in WORD_PATTERN.findall(text.lower()):
+            h = _seed(word)
+            vector[h % self.dimension] += 1.0 if (h >> 32) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        if not norm:
+            vector[_seed(text) % self.dimension] = 1.0
+            norm = 1.0
+        return (vector / norm).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.upstream.call(items=len(texts))
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self.upstream.call()
+        return self._embed(text)
+
+# --- Groq Chat Models ---
+GENERATE_LINE = re.compile(r"Generate (\d+) (multiple-choice questions|question-answer pairs)")
+
+def _prompt_text(messages) -> str:
+    return "\n".join(str(getattr(m, "content", m)) for m in messages)
+
+def _words(text: str) -> set:
+    return set(WORD_PATTERN.findall(text.lower()))
+
+def stub_completion(prompt: str, malformed_rate: float = 0.0, sample: int = 0) -> str:
+    """
+    The JSON a model would answer the app's prompt with (see schemas.py):
+    the requested number of MCQs or Q&A pairs built from context sentences.
+    Deterministic per prompt and `sample` (the n-th answer to a prompt, as
+    sampling at a nonzero temperature varies); `malformed_rate` breaks that
+    share of items.
+    """
+    match = GENERATE_LINE.search(prompt)
+    num_questions = int(match.group(1)) if match else 3
+    mcq = not match or match.group(2).startswith("multiple")
+    context = prompt.split("Context:", 1)[-1].rsplit("Generate", 1)[0]
+    sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+", context) if len(s.split()) >= 4] or ["The context is empty."]
+    rng = random.Random(_seed(f"{sample}:{prompt}"))
+
+    # Distinct sentences per call, near-duplicates last, so questions differ like a real model's would
+    order, seen = [], []
+    for s in rng.sample(sentences, len(sentences)):
+        words = _words(s)
+        distinct = all(len(words & other) / len(words | other) < 0.6 for other in seen)
+        order.insert(len(seen) if distinct else len(order), s)
+        if distinct:
+            seen.append(words)
+    items = []
+    for i in range(1, num_questions + 1):
+        sentence = order[(i - 1) % len(order)]
+        question = f"Which statement does the text support: {sentence.rstrip('.!?')}?"
+        if mcq:
+            distractors = [rng.choice(sentences) for _ in range(3)]
+            options = distractors[:]
+            correct = rng.randrange(4)
+            options.insert(correct, sentence)
+            item = {"id": f"Q{i}", "question": question, "options": options,
+                    "correct_index": correct + 1, "explanation": sentence}
+        else:
+            item = {"id": f"QA{i}", "question": question, "answer": sentence}
+        text = json.dumps(item)
+        if rng.random() < malformed_rate:
+            text = text[:-len(text) // 3] # Cut off mid-object, as a truncated model output would be
+        items.append(text)
+    list_key = "mcq_list" if mcq else "qa_list"
+    return '{"' + list_key + '": [' + ", ".join(items) + "]}"
+
+class StubChatModel(BaseChatModel):
+    """
+    Groq stand-in answering the app's generation prompts (see `stub_completion`).
+    Latency grows with the completion length; a bound `max_tokens` truncates
+    the answer like a real model would. Sync, streaming and async calls.
+    """
+
+    upstream: Any
+    model_name: str = "stub"
+    malformed_rate: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub-chat"
+
+    def _answer(self, messages, max_tokens: Optional[int]) -> str:
+        prompt = _prompt_text(messages)
+        text = stub_completion(prompt, self.malformed_rate, self.upstream.repeat(_seed(prompt)))
+        if max_tokens:
+            text = text[:max_tokens * 4]
+        return text
+
+    def _generate(self, messages, stop=None, run_manager=None, max_tokens: int = None, **kwargs) -> ChatResult:
+        text = self._answer(messages, max_tokens)
+        self.upstream.call(tokens=len(text) // 4)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, max_tokens: int = None, **kwargs) -> ChatResult:
+        text = self._answer(messages, max_tokens)
+        await self.upstream.acall(tokens=len(text) // 4)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(self, messages, stop=None, run_manager=None, max_tokens: int = None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        text = self._answer(messages, max_tokens)
+        # The call's latency is paid up front (time to first token), the decode time per chunk
+        self.upstream.call(tokens=0)
+        for start in range(0, len(text), STREAM_CHUNK_CHARS):
+            time.sleep(self.upstream.token_latency * STREAM_CHUNK_CHARS / 4)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text[start:start + STREAM_CHUNK_CHARS]))
+
+# --- Tavily ---
+WEB_FACETS = ["history", "definitions", "standards", "costs", "risks", "training", "equipment", "doctrine",
+              "case studies", "outlook", "regulation", "research"]
+WEB_TEMPLATES = [
+    "Early work on {a} shaped the {facet} that later guided {b}.",
+    "Critics argue the {facet} around {a} underestimates {b}.",
+    "Recent {facet} reports link {a} with measurable changes in {b}.",
+    "Practitioners compare {b} against {a} when reviewing {facet}.",
+    "A {n}-page survey of {facet} lists {a} among the main factors for {b}.",
+    "Most introductions to {a} start from {facet} before turning to {b}.",
+]
+
+class StubTavilyClient:
+    """TavilyClient stand-in: a few deterministic results built around the query's words."""
+
+    def __init__(self, upstream: Upstream):
+        self.upstream = upstream
+
+    def search(self, query: str, max_results: int = 3, **kwargs) -> dict:
+        self.upstream.call()
+        rng = random.Random(_seed(query))
+        words = WORD_PATTERN.findall(query.lower()) or ["topic"]
+        slug = "-".join(words[:6])
+        results = []
+        facets = rng.sample(WEB_FACETS, len(WEB_FACETS))
+        for i in range(max_results):
+            focus = " ".join(rng.sample(words, min(3, len(words))))
+            content = " ".join(
+                rng.choice(WEB_TEMPLATES).format(a=rng.choice(words), b=rng.choice(words), n=rng.randint(20, 400),
+                                                 facet=facets[(4 * i + j) % len(facets)])
+                for j in range(4)
+            )
+            results.append({"url": f"https://stub.invalid/{slug}/{i + 1}", "title": f"{focus} ({i + 1})",
+                            "content": content, "score": round(0.9 - 0.1 * i, 2)})
+        return {"query": query, "results": results}
+
+# --- Pinecone ---
+class StubPineconeIndex:
+    """Pinecone `Index` stand-in: a LocalVectorIndex behind simulated network latency and errors."""
+
+    def __init__(self, index, upstream: Upstream):
+        self.index = index
+        self.upstream = upstream
+
+    def upsert(self, vectors, **kwargs):
+        vectors = list(vectors)
+        self.upstream.call(items=len(vectors))
+        return self.index.upsert(vectors=vectors, **kwargs)
+
+    def query(self, *args, **kwargs):
+        self.upstream.call()
+        return self.index.query(*args, **kwargs)
+
+    def fetch(self, ids, **kwargs):
+        self.upstream.call(items=len(ids))
+        return self.index.fetch(ids=ids, **kwargs)
+
+    def delete(self, ids=None, delete_all: bool = False, **kwargs):
+        self.upstream.call(items=len(ids or []))
+        return self.index.delete(ids=ids, delete_all=delete_all, **kwargs)
+
+    def describe_index_stats(self, **kwargs):
+        self.upstream.call()
+        return self.index.describe_index_stats(**kwargs)
+
+class StubPineconeClient:
+    """`Pinecone` client stand-in: index listing and `Index()` (a host lookup) cost one round trip each."""
+
+    def __init__(self, index, upstream: Upstream, index_names=()):
+        self.index = index
+        self.upstream = upstream
+        self.index_names = list(index_names)
+
+    def list_indexes(self):
+        self.upstream.call()
+        return [SimpleNamespace(name=name) for name in self.index_names]
+
+    def Index(self, name: str):
+        self.upstream.call()
+        return StubPineconeIndex(self.index, self.upstream)
+
+# --- Installation ---
+def install_stubs(upstreams: dict, malformed_rate: float = 0.0):
+    """
+    Replace the app's provider clients with the stand-ins, through the shared
+    client registry (see modules/utils.get_or_create_client). All other
+    registered clients are dropped too, so in-process caches start cold.
+    Requires VECTOR_BACKEND=local (see benchmarks/common.py).
+    """
+    from modules.utils import get_or_create_client, invalidate_clients, WebSearch
+    from modules.embedding_cache import CachedEmbeddings
+    from modules.local_index import LocalVectorIndex
+    from modules.llm_provider import LLM_TIERS
+    from modules import db_manager
+
+    invalidate_clients()
+    get_or_create_client("embeddings", lambda: CachedEmbeddings(StubEmbeddings(upstreams["openai"]), "stub-embedding"))
+    get_or_create_client("local_index", lambda: StubPineconeIndex(
+        LocalVectorIndex(db_manager.LOCAL_INDEX_DIR, db_manager.EMBEDDING_DIMENSION), upstreams["pinecone"]
+    ))
+    get_or_create_client("web_search", lambda: WebSearch(StubTavilyClient(upstreams["tavily"])))
+    for tier in LLM_TIERS:
+        get_or_create_client(f"llm_{tier}", lambda tier=tier: StubChatModel(
+            upstream=upstreams[f"groq_{tier}"], model_name=LLM_TIERS[tier][0], malformed_rate=malformed_rate
+        ))
+
+def upstream_stats(upstreams: dict) -> dict:
+    return {name: upstream.stats() for name, upstream in upstreams.items()}
+
+def upstream_delta(before: dict, after: dict) -> dict:
+    """Calls, items and failures per upstream between two `upstream_stats` snapshots."""
+    return {
+        name: {key: round(after[name][key] - before[name][key], 4) for key in after[name]}
+        for name in after
+    }
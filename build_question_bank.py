@@ -0,0 +1,20 @@
+import json
+import argparse
+from dotenv import load_dotenv
+
+# Load environment variables before the modules read their settings
+load_dotenv()
+
+from modules.question_bank import build_question_bank, QUESTION_BANK_PER_CHUNK
+
+# --- Batch Mode ---
+# Build the question bank for everything ingested so far (chunks already in
+# the bank are skipped), e.g. after a bulk import or with QUESTION_BANK_ENABLED
+# off for uploads:  python build_question_bank.py --types mcq qa
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Pre-generate questions for every ingested chunk.")
+    parser.add_argument('--types', nargs='+', choices=['mcq', 'qa'], default=['mcq', 'qa'])
+    parser.add_argument('--per-chunk', type=int, default=QUESTION_BANK_PER_CHUNK)
+    args = parser.parse_args()
+    summary = build_question_bank(gen_types=tuple(args.types), per_chunk=args.per_chunk)
+    print(json.dumps(summary, indent=2))
@@ -0,0 +1,131 @@
+import os
+import json
+import time
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+
+from .schemas import mcq_prompt_template, mcq_schema, qa_prompt_template, qa_schema, is_valid_mcq, is_valid_qa
+from .utils import resolve_context, record_llm_usage
+from .fanout import generate_sharded_async, fill_missing_async, renumber, FANOUT_ENABLED, FANOUT_SHARD_SIZE
+from .generation_cache import get_generation_cache, generation_cache_key
+from .context_packer import pack_context
+from .llm_provider import route_llm
+from .mcq_generator import parse_mcq_output
+from .qa_generator import parse_qa_output
+from .telemetry import get_logger, stage
+
+log = get_logger(__name__)
+
+# --- Constants ---
+# In-flight calls per upstream, per event loop. "llm" covers Groq; "retrieval"
+# covers the blocking retrieval step (OpenAI embeddings, Pinecone or the local
+# index, and the Tavily fallback), which runs on asyncio's default thread pool.
+PROVIDER_CONCURRENCY = {
+    "llm": int(os.getenv("ASYNC_LLM_CONCURRENCY", "8")),
+    "retrieval": int(os.getenv("ASYNC_RETRIEVAL_CONCURRENCY", "16")),
+}
+
+# Per type: prompt, schema, output parser, item validator, ID prefix, list key
+GENERATORS = {
+    "mcq": (mcq_prompt_template, mcq_schema, parse_mcq_output, is_valid_mcq, "Q", "mcq_list"),
+    "qa": (qa_prompt_template, qa_schema, parse_qa_output, is_valid_qa, "QA", "qa_list"),
+}
+
+# --- Concurrency Limits ---
+_semaphores = weakref.WeakKeyDictionary()  # event loop -> {provider: Semaphore}
+
+@asynccontextmanager
+async def provider_limit(provider: str):
+    """Hold one of the provider's PROVIDER_CONCURRENCY slots on the running loop."""
+    loop = asyncio.get_running_loop()
+    semaphores = _semaphores.setdefault(loop, {})
+    if provider not in semaphores:
+        semaphores[provider] = asyncio.Semaphore(PROVIDER_CONCURRENCY[provider])
+    async with semaphores[provider]:
+        yield
+
+# --- Pipeline Steps ---
+def _prepare(gen_type: str, retriever, query: str, embeddings, num_questions, similarity_threshold: float,
+             use_tavily: bool, gating_strategy: str):
+    """
+    Blocking part of a request: retrieval (with the Tavily fallback), context
+    packing and the generation cache lookup. Returns None when an MCQ request
+    has no context or packing leaves none, else (context, num_questions,
+    cache_key, cached_result).
+    """
+    docs, context, _ = resolve_context(
+        retriever, query, embeddings, similarity_threshold, use_tavily, gating_strategy
+    )
+    if not context and gen_type == "mcq":
+        return None
+    if context:
+        context, _ = pack_context(query, docs, context)
+        if not context:
+            return None
+    if num_questions is None:
+        num_questions = min(12, max(3, len(context) // 300))
+
+    cache = get_generation_cache()
+    cache_key = cache and context and generation_cache_key(gen_type, num_questions, query, embeddings, docs, context)
+    cached = cache_key and cache.get(cache_key)
+    return context, num_questions, cache_key, cached
+
+async def _generate_batch_async(llm, gen_type: str, context: str, num_questions: int):
+    """Run one generation call without blocking the event loop and parse its output."""
+    prompt_template, schema, parse = GENERATORS[gen_type][:3]
+    prompt = prompt_template.format(
+        context=context,
+        num_questions=num_questions,
+        schema=json.dumps(schema)
+    )
+
+    log.info(f"[*] Generating {num_questions} {'MCQs' if gen_type == 'mcq' else 'Q&A pairs'} (async)...")
+    model, tier = route_llm(llm, gen_type, context, num_questions)
+    async with provider_limit("llm"):
+        started = time.perf_counter()
+        with stage("llm"):
+            message = await model.ainvoke(prompt)
+    raw = getattr(message, "content", message)
+    record_llm_usage(prompt, raw, tier, time.perf_counter() - started)
+    return parse(raw)
+
+# --- Pipeline ---
+async def generate_async(gen_type: str, retriever, llm, query: str, embeddings, num_questions=None,
+                         similarity_threshold: float = 0.5, use_tavily: bool = False,
+                         gating_strategy: str = None, fan_out: bool = FANOUT_ENABLED):
+    """
+    Async counterpart of `generate_mcqs_from_retrieved_context` and
+    `generate_qa_from_context` for the ASGI app (asgi.py). Retrieval runs on
+    a worker thread, LLM calls are awaited natively and fan-out shards are
+    gathered concurrently, each step within its provider's concurrency limit.
+    Returns the parsed result (empty when there is nothing to generate from).
+    """
+    async with provider_limit("retrieval"):
+        prepared = await asyncio.to_thread(
+            _prepare, gen_type, retriever, query, embeddings, num_questions,
+            similarity_threshold, use_tavily, gating_strategy
+        )
+    if prepared is None:
+        log.warning(f"[!] No usable context. Cannot generate {'MCQs' if gen_type == 'mcq' else 'Q&A pairs'}.")
+        return []
+
+    context, num_questions, cache_key, cached = prepared
+    if cached:
+        return cached
+
+    validator, id_prefix, list_key = GENERATORS[gen_type][3:]
+    if fan_out and num_questions > FANOUT_SHARD_SIZE:
+        result = await generate_sharded_async(
+            lambda ctx, n: _generate_batch_async(llm, gen_type, ctx, n),
+            context, num_questions, validator, id_prefix=id_prefix, list_key=list_key
+        )
+    else:
+        result = renumber(await fill_missing_async(
+            lambda ctx, n: _generate_batch_async(llm, gen_type, ctx, n),
+            context, num_questions, validator, list_key=list_key
+        ), id_prefix)
+
+    if cache_key:
+        await asyncio.to_thread(get_generation_cache().set, cache_key, result, context)
+    return result
@@ -0,0 +1,60 @@
+import os
+from typing import Iterable, Iterator
+from langchain.schema import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from .utils import count_tokens
+
+# --- Constants ---
+# "token" sizes chunks with the embedding tokenizer, "character" by raw length.
+CHUNK_STRATEGY = os.getenv("CHUNK_STRATEGY", "token")
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "400"))       # tokens or characters
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "50"))  # tokens or characters
+CHUNK_SEPARATORS = ["\n\n", "\n", ". ", " ", ""]
+
+# --- Splitters ---
+def get_text_splitter(strategy: str = None, chunk_size: int = None,
+                      chunk_overlap: int = None) -> RecursiveCharacterTextSplitter:
+    """
+    Build a splitter for the given strategy.
+    Both strategies split on paragraph/sentence boundaries first; they only
+    differ in how chunk length is measured.
+    """
+    strategy = strategy or CHUNK_STRATEGY
+    chunk_size = chunk_size or CHUNK_SIZE
+    chunk_overlap = CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap
+
+    if chunk_overlap >= chunk_size:
+        raise ValueError(f"Chunk overlap ({chunk_overlap}) must be smaller than chunk size ({chunk_size})")
+
+    if strategy == "token":
+        length_function = count_tokens
+    elif strategy == "character":
+        length_function = len
+    else:
+        raise ValueError(f"Unknown chunking strategy: {strategy}")
+
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=length_function,
+        separators=CHUNK_SEPARATORS
+    )
+
+# --- Chunking Stage ---
+def chunk_documents(docs: Iterable[Document], splitter: RecursiveCharacterTextSplitter = None) -> Iterator[Document]:
+    """
+    Split loaded documents into chunks, one input document at a time.
+    Each chunk keeps the source metadata (`source`, `page`, ...) and gets a
+    `chunk` ordinal that is sequential across the whole input stream.
+    """
+    splitter = splitter or get_text_splitter()
+    ordinal = 0
+    for doc in docs:
+        for text in splitter.split_text(doc.page_content):
+            if not text.strip():
+                continue
+            metadata = dict(doc.metadata)
+            metadata["chunk"] = ordinal
+            ordinal += 1
+            yield Document(page_content=text, metadata=metadata)
@@ -0,0 +1,188 @@
+import os
+import re
+import time
+import hashlib
+import threading
+from typing import List, Tuple
+import numpy as np
+
+from .utils import count_tokens
+from .telemetry import get_logger, observe_stage, record_context_tokens
+
+log = get_logger(__name__)
+
+# --- Constants ---
+# Context is packed into CONTEXT_TOKEN_BUDGET prompt tokens before every LLM call.
+# Passages are taken in ranking order (MMR selection order, or Tavily result order).
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.8"))  # Estimated Jaccard above which passages are duplicates
+# Extractive compression keeps the sentences sharing most words with the query.
+# Off by default: question generation benefits from the surrounding material.
+CONTEXT_COMPRESSION = os.getenv("CONTEXT_COMPRESSION", "false").lower() in ("1", "true", "yes")
+CONTEXT_COMPRESSION_RATIO = float(os.getenv("CONTEXT_COMPRESSION_RATIO", "0.6"))  # Share of each passage's tokens kept
+SHINGLE_SIZE = 5            # Words per shingle
+MINHASH_PERMUTATIONS = 64
+MINHASH_SEED = 4321
+MIN_COMPRESSED_TOKENS = 50  # A passage truncated below this is dropped instead
+
+_rng = np.random.default_rng(MINHASH_SEED)
+_HASH_A = _rng.integers(1, 2**63, MINHASH_PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+_HASH_B = _rng.integers(0, 2**63, MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+# --- Near-Duplicate Detection ---
+def _shingles(text: str, size: int = SHINGLE_SIZE) -> set:
+    words = re.findall(r"\w+", text.lower())
+    return {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))} if words else set()
+
+def minhash_signature(text: str) -> np.ndarray:
+    """MinHash signature of the passage's word shingles (None for empty text)."""
+    shingles = _shingles(text)
+    if not shingles:
+        return None
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") for s in shingles),
+        dtype=np.uint64, count=len(shingles)
+    )
+    # (a * h + b) mod 2^64 per permutation, min over shingles
+    return (hashes[:, None] * _HASH_A + _HASH_B).min(axis=0)
+
+def estimated_jaccard(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+    return float(np.mean(sig_a == sig_b))
+
+# --- Extractive Compression ---
+def _query_terms(query: str) -> set:
+    return {w for w in re.findall(r"\w+", query.lower()) if len(w) > 2}
+
+def compress_passage(passage: str, query: str, max_tokens: int) -> str:
+    """
+    Keep the sentences with the most query-term overlap (in original order)
+    until `max_tokens` is reached. Returns "" if no sentence fits.
+    """
+    sentences = [s for s in re.split(r"(?<=[.!?])\s+", passage) if s.strip()]
+    terms = _query_terms(query)
+    ranked = sorted(
+        range(len(sentences)),
+        key=lambda i: (-len(terms & set(re.findall(r"\w+", sentences[i].lower()))), i)
+    )
+
+    kept, used = set(), 0
+    for i in ranked:
+        tokens = count_tokens(sentences[i])
+        if used + tokens <= max_tokens:
+            kept.add(i)
+            used += tokens
+    return " ".join(sentences[i] for i in sorted(kept))
+
+def truncate_passage(passage: str, max_tokens: int) -> str:
+    """Keep the passage's leading sentences that fit in `max_tokens`."""
+    kept, used = [], 0
+    for sentence in re.split(r"(?<=[.!?])\s+", passage):
+        tokens = count_tokens(sentence)
+        if used + tokens > max_tokens:
+            break
+        kept.append(sentence)
+        used += tokens
+    if kept:
+        return " ".join(kept)
+    # A single over-long sentence: cut it to the longest prefix that fits
+    low, high = 0, len(passage)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(passage[:middle]) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return passage[:low]
+
+# --- Packing ---
+def split_passages(docs, context: str) -> List[str]:
+    """Passages of the context: the retrieved chunks, or blank-line separated blocks (web results)."""
+    if docs and "\n\n".join([d.page_content for d in docs]) == context:
+        return [d.page_content for d in docs]
+    return [p for p in context.split("\n\n") if p.strip()]
+
+def pack_context(query: str, docs, context: str, token_budget: int = None,
+                 compression: bool = None) -> Tuple[str, dict]:
+    """
+    Build the prompt context from ranked passages: drop near-duplicates
+    (MinHash), optionally compress each passage extractively, and keep adding
+    passages until `token_budget` tokens. The passage that overflows the
+    budget is compressed to fit when compression is enabled.
+    Returns (packed_context, report).
+    """
+    started = time.perf_counter()
+    token_budget = token_budget or CONTEXT_TOKEN_BUDGET
+    compression = CONTEXT_COMPRESSION if compression is None else compression
+    passages = split_passages(docs, context)
+
+    report = {
+        "passages_in": len(passages), "passages_out": 0,
+        "duplicates_dropped": 0, "over_budget_dropped": 0, "compressed": 0,
+        "tokens_in": count_tokens(context), "tokens_out": 0, "tokens_saved": 0,
+    }
+
+    packed, signatures, used = [], [], 0
+    for passage in passages:
+        signature = minhash_signature(passage)
+        if signature is not None and any(
+            estimated_jaccard(signature, other) >= CONTEXT_DEDUP_THRESHOLD for other in signatures
+        ):
+            report["duplicates_dropped"] += 1
+            continue
+
+        tokens = count_tokens(passage)
+        if compression and tokens > MIN_COMPRESSED_TOKENS:
+            target = max(MIN_COMPRESSED_TOKENS, int(tokens * CONTEXT_COMPRESSION_RATIO))
+            passage = compress_passage(passage, query, target) or passage
+            tokens = count_tokens(passage)
+            report["compressed"] += 1
+
+        remaining = token_budget - used
+        if tokens > remaining:
+            compressed = ""
+            if compression and remaining >= MIN_COMPRESSED_TOKENS:
+                # "" when no whole sentence fits
+                compressed = compress_passage(passage, query, remaining)
+            if compressed or packed:
+                passage = compressed
+            else:
+                # Never leave the prompt empty: keep the top passage's leading sentences
+                passage = truncate_passage(passage, remaining)
+            tokens = count_tokens(passage)
+            if not passage or tokens > remaining:
+                report["over_budget_dropped"] += 1
+                continue
+
+        packed.append(passage)
+        if signature is not None:
+            signatures.append(signature)
+        used += tokens
+
+    packed_context = "\n\n".join(packed)
+    report["passages_out"] = len(packed)
+    report["tokens_out"] = count_tokens(packed_context)
+    report["tokens_saved"] = max(0, report["tokens_in"] - report["tokens_out"])
+    _record(report)
+    observe_stage("pack_context", time.perf_counter() - started)
+    record_context_tokens(report["tokens_out"])
+    log.info(
+        f"[*] Packed context: {report['tokens_out']}/{report['tokens_in']} tokens "
+        f"({report['passages_out']}/{report['passages_in']} passages, {report['duplicates_dropped']} duplicates, "
+        f"{report['over_budget_dropped']} over budget), saved {report['tokens_saved']} tokens."
+    )
+    return packed_context, report
+
+# --- Stats ---
+_totals = {"requests": 0, "tokens_in": 0, "tokens_out": 0, "tokens_saved": 0, "duplicates_dropped": 0}
+_totals_lock = threading.Lock()
+
+def _record(report: dict):
+    with _totals_lock:
+        _totals["requests"] += 1
+        for key in ("tokens_in", "tokens_out", "tokens_saved", "duplicates_dropped"):
+            _totals[key] += report[key]
+
+def packing_stats() -> dict:
+    """Cumulative packing totals for this worker."""
+    with _totals_lock:
+        return dict(_totals)
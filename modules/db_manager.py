@@ -1,125 +1,643 @@
 import os
-import mimetypes
-from typing import List
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import chain, islice
+from typing import Any, Iterable, Iterator, List, Optional
+import numpy as np
 from langchain.schema import Document
-from langchain_community.embeddings import OpenAIEmbeddings
-from langchain_community.document_loaders import (
-    PyPDFLoader, Docx2txtLoader, UnstructuredPowerPointLoader, TextLoader
-)
-from PIL import Image
-import pytesseract
-from pinecone import Pinecone, ServerlessSpec
-from langchain_pinecone import PineconeVectorStore
+from langchain_core.retrievers import BaseRetriever
+
+from .utils import get_or_create_client, get_http_client, invalidate_clients, mmr_select, count_tokens
+from .chunking import chunk_documents
+from .loaders import iter_loaded
+from .embedding_cache import CachedEmbeddings, DiskCache, EMBEDDING_CACHE_PATH
+from .generation_cache import get_generation_cache
+from .manifest import file_sha256, compute_chunk_id, get_file_record, save_file_record, clear_manifest
+from .local_index import LocalVectorIndex, LocalVectorStore
+from .context_packer import CONTEXT_TOKEN_BUDGET
+from .lexical_index import BM25Index, tokenize
+from .telemetry import get_logger, stage
+
+log = get_logger(__name__)
 
 # --- Constants ---
 EMBEDDING_MODEL_NAME = "text-embedding-3-small"
 EMBEDDING_DIMENSION = 1536 # Dimension for text-embedding-3-small
-MMR_K = 1
-MMR_LAMBDA = 1
+# --- Retrieval Constants ---
+# k (chunks in the context) is sized per request from the question count unless
+# MMR_K is set, and capped by the context token budget.
+MMR_K = int(os.getenv("MMR_K", "0"))                # 0 = size from num_questions
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.5"))  # 1 = pure relevance, 0 = pure diversity
+MMR_FETCH_K = int(os.getenv("MMR_FETCH_K", "50"))   # Candidates fetched before MMR selection
+MMR_MAX_K = int(os.getenv("MMR_MAX_K", "8"))
+MMR_MAX_FETCH_K = 500
+QUESTIONS_PER_CHUNK = 2
+
+# --- Hybrid Retrieval Constants ---
+# A local BM25 index is kept next to the vector index and fused with the dense
+# results by reciprocal rank fusion, so exact terms, acronyms and section
+# numbers are not lost to embedding similarity.
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "true").lower() in ("1", "true", "yes")
+LEXICAL_INDEX_DIR = os.getenv("LEXICAL_INDEX_DIR", "lexical_index")
+RRF_K = 60  # Reciprocal rank fusion constant
+# With the shortcut on, a query whose top BM25 hit contains every query term and
+# clearly beats the runner-up is answered from the lexical index alone, without
+# embedding the query.
+LEXICAL_SHORTCUT = os.getenv("LEXICAL_SHORTCUT", "false").lower() in ("1", "true", "yes")
+LEXICAL_SHORTCUT_MIN_TERMS = 2
+LEXICAL_SHORTCUT_MARGIN = 1.5  # Top BM25 score over the second best
+
+# --- Ingestion Constants ---
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))    # Texts per embedding request
+EMBED_MAX_WORKERS = int(os.getenv("EMBED_MAX_WORKERS", "4"))   # Concurrent embedding requests
+INGEST_MAX_RETRIES = int(os.getenv("INGEST_MAX_RETRIES", "3"))
+INGEST_RETRY_BACKOFF = 1.0 # Seconds, doubled after each failed attempt
 
 # --- Pinecone Constants ---
 PINECONE_INDEX_NAME = "nlp-project" 
+PINECONE_POOL_THREADS = int(os.getenv("PINECONE_POOL_THREADS", "4"))
+PINECONE_TEXT_KEY = "text" # Metadata field PineconeVectorStore reads page_content from
+PINECONE_DELETE_BATCH_SIZE = 1000 # Max IDs per delete request
+
+# --- Vector Backend Constants ---
+# "pinecone" (hosted) or "local" (embedded, memory-mapped index on disk; see local_index.py)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone").lower()
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "vector_index")
+
+_index_lock = threading.Lock()
 
 
 # --- Initialization ---
-def get_embeddings() -> OpenAIEmbeddings:
-    """Initialize and return the OpenAI embeddings."""
-    return OpenAIEmbeddings(model=EMBEDDING_MODEL_NAME)
+# All clients live in the shared registry (see utils.get_or_create_client), so
+# they are built once per worker instead of once per request. Provider SDKs
+# (openai, pinecone) are imported by the factories, so importing this module
+# stays cheap and a worker only loads the backend it uses.
+_index_checked = False
 
-def get_pinecone_client():
-    """Initializes and returns a Pinecone client."""
+def _build_embeddings() -> CachedEmbeddings:
+    import openai
+    from langchain_community.embeddings import OpenAIEmbeddings
+    openai_embeddings = OpenAIEmbeddings(
+        model=EMBEDDING_MODEL_NAME,
+        # The sync SDK client goes through the shared, pooled HTTP client.
+        client=openai.OpenAI(http_client=get_http_client()).embeddings
+    )
+    disk = DiskCache(EMBEDDING_CACHE_PATH) if EMBEDDING_CACHE_PATH else None
+    return CachedEmbeddings(openai_embeddings, EMBEDDING_MODEL_NAME, disk=disk)
+
+def get_embeddings() -> CachedEmbeddings:
+    """
+    Return the process-wide OpenAI embeddings client.
+    It is wrapped in an embedding cache, so identical texts are only embedded once.
+    """
+    return get_or_create_client("embeddings", _build_embeddings)
+
+def _build_pinecone_client():
     api_key = os.getenv("PINECONE_API_KEY")
     if not api_key:
         raise ValueError("PINECONE_API_KEY not found in environment variables")
-    return Pinecone(api_key=api_key)
+    from pinecone import Pinecone
+    return Pinecone(api_key=api_key, pool_threads=PINECONE_POOL_THREADS)
 
-def get_vectordb() -> PineconeVectorStore:
-    """Initialize and return the Pinecone vector store."""
-    pc = get_pinecone_client()
-    embeddings = get_embeddings()
+def get_pinecone_client():
+    """Return the process-wide Pinecone client."""
+    return get_or_create_client("pinecone", _build_pinecone_client)
 
-    if PINECONE_INDEX_NAME not in [index.name for index in pc.list_indexes()]:
-        print(f"[!] Index '{PINECONE_INDEX_NAME}' not found. Creating it...")
-        try:
-            pc.create_index(
-                name=PINECONE_INDEX_NAME,
-                dimension=EMBEDDING_DIMENSION,
-                metric="cosine",
-                spec=ServerlessSpec(
-                    cloud="aws",
-                    region="us-east-1"
+def ensure_index(refresh: bool = False):
+    """
+    Make sure the Pinecone index exists, creating it if needed.
+    The `list_indexes()` round trip only happens on the first call
+    (or after `refresh_index()`), not on every request.
+    With the local backend this only opens the on-disk index.
+    """
+    global _index_checked
+    if VECTOR_BACKEND == "local":
+        get_vector_index()
+        return
+    if _index_checked and not refresh:
+        return
+
+    with _index_lock:
+        if _index_checked and not refresh:
+            return
+
+        pc = get_pinecone_client()
+        if PINECONE_INDEX_NAME not in [index.name for index in pc.list_indexes()]:
+            log.warning(f"[!] Index '{PINECONE_INDEX_NAME}' not found. Creating it...")
+            from pinecone import ServerlessSpec
+            try:
+                pc.create_index(
+                    name=PINECONE_INDEX_NAME,
+                    dimension=EMBEDDING_DIMENSION,
+                    metric="cosine",
+                    spec=ServerlessSpec(
+                        cloud="aws",
+                        region="us-east-1"
+                    )
                 )
+                log.info(f"[+] Index '{PINECONE_INDEX_NAME}' created successfully.")
+            except Exception as e:
+                log.warning(f"[!] Failed to create Pinecone index: {e}")
+                raise
+        else:
+            log.info(f"[*] Found existing index '{PINECONE_INDEX_NAME}'.")
+
+        _index_checked = True
+
+def refresh_index():
+    """Forget the cached index check and index handles; the next access re-checks."""
+    global _index_checked
+    with _index_lock:
+        _index_checked = False
+        invalidate_clients("pinecone_index", "vectordb")
+
+def get_pinecone_index():
+    """Return the process-wide handle to the Pinecone index."""
+    ensure_index()
+    return get_or_create_client(
+        "pinecone_index", lambda: get_pinecone_client().Index(PINECONE_INDEX_NAME)
+    )
+
+def get_local_index() -> LocalVectorIndex:
+    """Return the process-wide embedded index stored under LOCAL_INDEX_DIR."""
+    return get_or_create_client(
+        "local_index", lambda: LocalVectorIndex(LOCAL_INDEX_DIR, EMBEDDING_DIMENSION)
+    )
+
+def get_lexical_index():
+    """Return the process-wide BM25 index, or None when hybrid retrieval is off."""
+    if not HYBRID_RETRIEVAL:
+        return None
+    return get_or_create_client("lexical_index", lambda: BM25Index(LEXICAL_INDEX_DIR))
+
+def get_vector_index():
+    """Return the index handle of the configured backend (Pinecone `Index` or LocalVectorIndex)."""
+    if VECTOR_BACKEND == "local":
+        return get_local_index()
+    return get_pinecone_index()
+
+def fetch_vectors(index, ids: List[str]) -> dict:
+    """
+    Fetch `ids` from a vector index; returns {id: record} for the IDs found.
+    Pinecone returns a FetchResponse dataclass, the local index a dict.
+    """
+    response = index.fetch(ids=ids)
+    return response.vectors if hasattr(response, "vectors") else response["vectors"]
+
+def get_vectordb():
+    """Return the process-wide vector store of the configured backend."""
+    if VECTOR_BACKEND == "local":
+        return get_or_create_client("vectordb", lambda: LocalVectorStore(
+            index=get_local_index(),
+            embedding=get_embeddings()
+        ))
+    from langchain_pinecone import PineconeVectorStore
+    return get_or_create_client("vectordb", lambda: PineconeVectorStore(
+        index=get_pinecone_index(),
+        embedding=get_embeddings()
+    ))
+
+class VectorMMRRetriever(BaseRetriever):
+    """
+    MMR retriever over the vector index (Pinecone or local) that also hands back the vectors
+    and similarity scores of what it retrieved, so callers can score the
+    context without embedding it again.
+    Fetches `fetch_k` candidates with their vectors and re-ranks them locally
+    (utils.mmr_select); `k` defaults to one chunk per QUESTIONS_PER_CHUNK
+    requested questions, within `token_budget` context tokens.
+    With a `lexical` BM25 index, its hits join the candidate pool and the
+    relevance used by MMR is the reciprocal rank fusion of both rankings.
+    """
+    vectordb: Any
+    lexical: Any = None
+    k: Optional[int] = None
+    fetch_k: int = MMR_FETCH_K
+    lambda_mult: float = MMR_LAMBDA
+    num_questions: int = 5
+    token_budget: int = CONTEXT_TOKEN_BUDGET
+
+    def effective_k(self) -> int:
+        if self.k:
+            return self.k
+        return max(1, min(MMR_MAX_K, -(-self.num_questions // QUESTIONS_PER_CHUNK)))
+
+    def retrieve(self, query: str) -> dict:
+        """
+        Run MMR retrieval and return a dict with `docs`, `query_vector` (d,),
+        `doc_vectors` (n, d) and `scores` (n,) for the selected chunks.
+        When the lexical shortcut answers the query, `query_vector` is None
+        and `similarity` holds the share of query terms the chunks matched.
+        """
+        top_k = max(self.fetch_k, self.effective_k())
+        lexical_hits = []
+        if self.lexical is not None:
+            with stage("lexical_search"):
+                lexical_hits = self.lexical.search(query, top_k)
+        if LEXICAL_SHORTCUT and self._is_strong_lexical_match(query, lexical_hits):
+            result = self._retrieve_lexical(lexical_hits)
+            if result is not None:
+                return result
+            # None of the hits are in the vector index any more: use the dense path alone
+            lexical_hits = []
+
+        query_vector = np.asarray(self.vectordb.embeddings.embed_query(query), dtype=np.float32)
+        with stage("vector_query"):
+            results = self.vectordb.index.query(
+                vector=query_vector.tolist(),
+                top_k=top_k,
+                include_values=True,
+                include_metadata=True
+            )
+        matches, relevance = self._fuse(list(results["matches"]), lexical_hits)
+        if not matches:
+            return {
+                "docs": [],
+                "query_vector": query_vector,
+                "doc_vectors": np.empty((0, query_vector.shape[0]), dtype=np.float32),
+                "scores": np.empty(0, dtype=np.float32),
+            }
+
+        candidates = np.asarray([m["values"] for m in matches], dtype=np.float32)
+        selected = self._select(query_vector, candidates, matches, relevance)
+        doc_vectors = candidates[selected]
+        # Cosine scores (lexical-only hits come without an index score)
+        norms = np.linalg.norm(doc_vectors, axis=1)
+        scores = doc_vectors @ (query_vector / (np.linalg.norm(query_vector) or 1.0)) / np.where(norms == 0, 1.0, norms)
+        return {
+            "docs": self._to_docs(matches, selected),
+            "query_vector": query_vector,
+            "doc_vectors": doc_vectors,
+            "scores": scores,
+        }
+
+    # --- Hybrid Helpers ---
+    def _select(self, query_vector, candidates, matches, relevance=None) -> List[int]:
+        token_counts = None
+        if self.token_budget:
+            token_counts = [count_tokens(m["metadata"].get(PINECONE_TEXT_KEY, "")) for m in matches]
+        with stage("mmr"):
+            return mmr_select(
+                query_vector, candidates, k=self.effective_k(), lambda_mult=self.lambda_mult,
+                token_counts=token_counts, token_budget=self.token_budget, relevance=relevance
             )
-            print(f"[+] Index '{PINECONE_INDEX_NAME}' created successfully.")
+
+    @staticmethod
+    def _to_docs(matches, selected) -> List[Document]:
+        docs = []
+        for i in selected:
+            metadata = dict(matches[i]["metadata"])
+            docs.append(Document(page_content=metadata.pop(PINECONE_TEXT_KEY, ""), metadata=metadata))
+        return docs
+
+    def _fetch(self, ids: List[str]) -> List[dict]:
+        """Fetch vectors and metadata of chunks found only by the lexical index."""
+        with stage("vector_fetch"):
+            vectors = fetch_vectors(self.vectordb.index, ids)
+        return [
+            {"id": i, "values": list(vectors[i]["values"]), "metadata": dict(vectors[i]["metadata"] or {})}
+            for i in ids if i in vectors
+        ]
+
+    def _fuse(self, matches: List[dict], lexical_hits) -> tuple:
+        """Reciprocal rank fusion of dense matches and BM25 hits. Returns (matches, relevance or None)."""
+        if not lexical_hits:
+            return matches, None
+
+        fused = {}
+        for rank, m in enumerate(matches):
+            fused[m["id"]] = 1.0 / (RRF_K + rank + 1)
+        for rank, (chunk_id, _, _) in enumerate(lexical_hits):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+
+        known = {m["id"] for m in matches}
+        missing = [chunk_id for chunk_id, _, _ in lexical_hits if chunk_id not in known]
+        if missing:
+            matches = matches + self._fetch(missing)
+        if not matches:
+            return matches, None
+        relevance = np.asarray([fused[m["id"]] for m in matches], dtype=np.float32)
+        return matches, relevance / relevance.max()
+
+    @staticmethod
+    def _is_strong_lexical_match(query: str, lexical_hits) -> bool:
+        if not lexical_hits or len(set(tokenize(query))) < LEXICAL_SHORTCUT_MIN_TERMS:
+            return False
+        _, top_score, coverage = lexical_hits[0]
+        runner_up = lexical_hits[1][1] if len(lexical_hits) > 1 else 0.0
+        return coverage == 1.0 and top_score >= LEXICAL_SHORTCUT_MARGIN * runner_up
+
+    def _retrieve_lexical(self, lexical_hits) -> Optional[dict]:
+        """
+        Build the context from BM25 hits alone (no query embedding, no vector
+        search). Returns None when none of the hits could be fetched.
+        """
+        log.info("[*] Strong lexical match; skipping the query embedding.")
+        matches = self._fetch([chunk_id for chunk_id, _, _ in lexical_hits])
+        if not matches:
+            log.warning("[!] Lexical hits are missing from the vector index; falling back to vector search.")
+            return None
+        bm25 = {chunk_id: score for chunk_id, score, _ in lexical_hits}
+        candidates = np.asarray([m["values"] for m in matches], dtype=np.float32)
+        relevance = np.asarray([bm25[m["id"]] for m in matches], dtype=np.float32)
+        relevance = relevance / relevance.max()
+        selected = self._select(None, candidates, matches, relevance)
+
+        for i in selected:
+            matches[i]["metadata"]["retrieval"] = "lexical"
+        coverage = {chunk_id: c for chunk_id, _, c in lexical_hits}
+        return {
+            "docs": self._to_docs(matches, selected),
+            "query_vector": None,
+            "doc_vectors": candidates[selected],
+            "scores": relevance[selected],
+            "similarity": max(coverage[matches[i]["id"]] for i in selected),
+        }
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        return self.retrieve(query)["docs"]
+
+def get_mmr_retriever(vectordb, num_questions: int = 5, k: int = None, fetch_k: int = None,
+                      lambda_mult: float = None) -> VectorMMRRetriever:
+    """
+    Create MMR retriever from vector database.
+    `k`, `fetch_k` and `lambda_mult` override the module defaults per request.
+    """
+    return VectorMMRRetriever(
+        vectordb=vectordb,
+        lexical=get_lexical_index(),
+        k=k or MMR_K or None,
+        fetch_k=min(fetch_k or MMR_FETCH_K, MMR_MAX_FETCH_K),
+        lambda_mult=MMR_LAMBDA if lambda_mult is None else lambda_mult,
+        num_questions=num_questions
+    )
+
+# --- Document Loading ---
+def iter_document(file_path: str) -> Iterator[Document]:
+    """
+    Yield the raw pages/sections of a file one at a time.
+    Loaders are consumed lazily so large files are never held in memory whole;
+    PDF pages and images are extracted on the process pool (see modules/extraction.py).
+    The loader is picked by content, then extension (see modules/loaders.py).
+    """
+    yield from iter_loaded(file_path)
+
+def load_document(file_path: str, splitter=None) -> Iterator[Document]:
+    """
+    Stream the chunks of a file, ready for `upsert_documents`.
+    Pages are split as they are loaded (see modules/chunking.py).
+    """
+    return chunk_documents(iter_document(file_path), splitter)
+
+# --- Ingestion Engine ---
+def _with_retries(fn, what: str, max_retries: int, backoff: float):
+    """Call `fn`, retrying with exponential backoff. Returns (result, attempts)."""
+    for attempt in range(max_retries + 1):
+        try:
+            return fn(), attempt + 1
         except Exception as e:
-            print(f"[!] Failed to create Pinecone index: {e}")
-            raise
-    else:
-        print(f"[*] Found existing index '{PINECONE_INDEX_NAME}'.")
-
-    return PineconeVectorStore(
-        index_name=PINECONE_INDEX_NAME,
-        embedding=embeddings
+            if attempt == max_retries:
+                raise
+            delay = backoff * (2 ** attempt)
+            log.warning(f"[!] {what} failed ({e}). Retrying in {delay:.1f}s ({attempt + 1}/{max_retries})...")
+            time.sleep(delay)
+
+def _embed_and_upsert_batch(batch: List[Document], embeddings, index, max_retries: int, backoff: float,
+                            lexical=None) -> dict:
+    """Embed one batch and upsert it; each step is retried on its own. Stored chunks are also queued for BM25."""
+    texts = [d.page_content for d in batch]
+    vectors, embed_attempts = _with_retries(
+        lambda: embeddings.embed_documents(texts), "Embedding batch", max_retries, backoff
     )
 
-def get_mmr_retriever(vectordb: PineconeVectorStore):
-    """Create MMR retriever from vector database."""
-    return vectordb.as_retriever(
-        search_type="mmr",
-        search_kwargs={"k": MMR_K, "lambda_mult": MMR_LAMBDA}
+    records = []
+    for doc, text, values in zip(batch, texts, vectors):
+        metadata = dict(doc.metadata)
+        metadata[PINECONE_TEXT_KEY] = text
+        vector_id = metadata.get("chunk_id") or str(uuid.uuid4())
+        records.append({"id": vector_id, "values": values, "metadata": metadata})
+
+    _, upsert_attempts = _with_retries(
+        lambda: index.upsert(vectors=records), "Upserting batch", max_retries, backoff
     )
+    if lexical is not None:
+        lexical.add([r["id"] for r in records], texts)
+    return {"embedding_calls": embed_attempts, "upsert_calls": upsert_attempts}
+
+def ingest_documents(docs: Iterable[Document], embeddings=None, index=None,
+                     batch_size: int = None, max_workers: int = None,
+                     max_retries: int = None, backoff: float = None,
+                     progress_callback=None, lexical=None) -> dict:
+    """
+    Embed and upsert documents in batches across a bounded thread pool.
+
+    Batches are embedded concurrently, and each worker upserts its batch as
+    soon as it is embedded, so embedding and upserting overlap. At most
+    `2 * max_workers` batches are in flight, which keeps streaming input
+    bounded in memory. A batch that still fails after its retries is
+    recorded in the report instead of aborting the whole upload.
 
-# --- Document Loading (UNCHANGED) ---
-def load_document(file_path: str) -> List[Document]:
-    # This function is unchanged
-    mime_type, _ = mimetypes.guess_type(file_path)
-    print(f"[*] Loading document: {file_path} (MIME type: {mime_type})")
-    
-    if mime_type == "application/pdf":
-        loader = PyPDFLoader(file_path)
-        docs = loader.load()
-    elif mime_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-        loader = Docx2txtLoader(file_path)
-        docs = loader.load()
-    elif mime_type == "application/vnd.openxmlformats-officedocument.presentationml.presentation":
-        loader = UnstructuredPowerPointLoader(file_path)
-        docs = loader.load()
-    elif mime_type == "text/plain":
-        loader = TextLoader(file_path, encoding="utf-8")
-        docs = loader.load()
-    elif mime_type in ["image/jpeg", "image/png"]:
+    `embeddings` needs `embed_documents(texts)` and `index` needs
+    `upsert(vectors=[...])`; they default to the shared OpenAI and Pinecone
+    clients. Stored chunks are also added to the `lexical` BM25 index
+    (default: the shared one, if hybrid retrieval is on), which is flushed
+    once at the end. Returns a progress report dict, which is also passed to
+    `progress_callback` after every finished batch.
+    """
+    embeddings = embeddings or get_embeddings()
+    index = index or get_vector_index()
+    lexical = get_lexical_index() if lexical is None else lexical
+    batch_size = batch_size or EMBED_BATCH_SIZE
+    max_workers = max_workers or EMBED_MAX_WORKERS
+    max_retries = INGEST_MAX_RETRIES if max_retries is None else max_retries
+    backoff = INGEST_RETRY_BACKOFF if backoff is None else backoff
+
+    report = {
+        "docs_upserted": 0,
+        "docs_failed": 0,
+        "batches_done": 0,
+        "batches_failed": 0,
+        "embedding_calls": 0,
+        "upsert_calls": 0,
+        "errors": [],
+        "elapsed_seconds": 0.0,
+        "docs_per_sec": 0.0,
+        "embedding_calls_per_sec": 0.0,
+    }
+    start = time.perf_counter()
+    docs = iter(docs)
+
+    def finish(future, batch):
         try:
-            text = pytesseract.image_to_string(Image.open(file_path))
-            docs = [Document(page_content=text, metadata={"source": file_path})]
-        except pytesseract.TesseractNotFoundError:
-            print("[!] Tesseract Error: Tesseract OCR is not installed or not in PATH.")
-            raise
+            calls = future.result()
+            report["docs_upserted"] += len(batch)
+            report["batches_done"] += 1
+            report["embedding_calls"] += calls["embedding_calls"]
+            report["upsert_calls"] += calls["upsert_calls"]
         except Exception as e:
-            print(f"[!] Image loading error: {e}")
-            docs = []
-    else:
-        print(f"[!] Unsupported file type: {mime_type}. Skipping.")
-        docs = []
-    
-    print(f"[+] Loaded {len(docs)} document chunks.")
-    return docs
-
-# --- Database Operations (UNCHANGED) ---
-def upsert_documents(docs: List[Document]):
-    """Upsert documents into the Pinecone database."""
-    if not docs:
-        print("[!] No documents to upsert.")
-        return
-        
-    embeddings = get_embeddings()
-    print(f"[*] Upserting {len(docs)} docs into Pinecone index '{PINECONE_INDEX_NAME}'...")
-    
-    PineconeVectorStore.from_documents(
-        docs,
-        embedding=embeddings,
-        index_name=PINECONE_INDEX_NAME
+            log.warning(f"[!] Batch of {len(batch)} docs failed: {e}")
+            report["docs_failed"] += len(batch)
+            report["batches_failed"] += 1
+            report["errors"].append(str(e))
+
+        elapsed = time.perf_counter() - start
+        report["elapsed_seconds"] = elapsed
+        if elapsed > 0:
+            report["docs_per_sec"] = report["docs_upserted"] / elapsed
+            report["embedding_calls_per_sec"] = report["embedding_calls"] / elapsed
+        if progress_callback:
+            progress_callback(dict(report))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        in_flight = {}
+        while True:
+            batch = list(islice(docs, batch_size))
+            if batch:
+                future = pool.submit(_embed_and_upsert_batch, batch, embeddings, index, max_retries, backoff, lexical)
+                in_flight[future] = batch
+
+            # Drain when the pipeline is full or the input is exhausted
+            if in_flight and (not batch or len(in_flight) >= 2 * max_workers):
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finish(future, in_flight.pop(future))
+
+            if not batch and not in_flight:
+                break
+
+    if lexical is not None:
+        lexical.flush()
+    return report
+
+# --- Database Operations ---
+def upsert_documents(docs: Iterable[Document]) -> int:
+    """
+    Upsert documents into the vector database with the ingestion engine.
+    Accepts any iterable (including the `load_document` stream).
+    Returns the number of documents upserted.
+    """
+    docs = iter(docs)
+    first = next(docs, None)
+    if first is None:
+        log.warning("[!] No documents to upsert.")
+        return 0
+
+    target = f"local index '{LOCAL_INDEX_DIR}'" if VECTOR_BACKEND == "local" else f"Pinecone index '{PINECONE_INDEX_NAME}'"
+    log.info(f"[*] Upserting docs into {target}...")
+    report = ingest_documents(chain([first], docs))
+    log.info(
+        f"[+] Upsert complete. {report['docs_upserted']} document chunks stored "
+        f"({report['docs_per_sec']:.1f} docs/sec, {report['embedding_calls_per_sec']:.1f} embedding calls/sec)."
+    )
+
+    if report["batches_failed"]:
+        raise RuntimeError(
+            f"{report['batches_failed']} batch(es) failed after retries; "
+            f"{report['docs_upserted']} chunks were stored. Last error: {report['errors'][-1]}"
+        )
+    return report["docs_upserted"]
+
+def _invalidate_generation_cache():
+    # Cached questions may come from chunks that just changed
+    cache = get_generation_cache()
+    if cache is not None:
+        cache.invalidate()
+
+def _clear_ingest_state():
+    # The manifest, the BM25 index and the question bank describe the vectors that were just removed
+    from .question_bank import clear_question_bank # question_bank imports this module
+    clear_manifest()
+    lexical = get_lexical_index()
+    if lexical is not None:
+        lexical.clear()
+    clear_question_bank()
+
+def _delete_vectors(index, ids: List[str]):
+    ids = list(ids)
+    for start in range(0, len(ids), PINECONE_DELETE_BATCH_SIZE):
+        index.delete(ids=ids[start:start + PINECONE_DELETE_BATCH_SIZE])
+
+def upsert_file(file_path: str, source_name: str = None, embeddings=None, index=None,
+                manifest_path: str = None, splitter=None, progress_callback=None) -> dict:
+    """
+    Incrementally ingest a file using content-hash chunk IDs and the local manifest.
+
+    - An unchanged file (same name, same bytes) is a no-op.
+    - A changed file only embeds chunks whose IDs are new, and deletes the
+      vectors of chunks that disappeared (all of them, if it has none left).
+    Returns a summary dict: status ("unchanged", "ingested" or "empty") and
+    the number of chunks added, kept and deleted.
+    `progress_callback(stage, progress=None)` is told about each stage.
+    """
+    report_stage = progress_callback or (lambda stage, progress=None: None)
+    source_name = source_name or os.path.basename(file_path)
+    report_stage("hashing")
+    file_hash = file_sha256(file_path)
+    record = get_file_record(source_name, manifest_path)
+    summary = {"status": "unchanged", "added": 0, "kept": 0, "deleted": 0}
+
+    if record and record["file_hash"] == file_hash:
+        summary["kept"] = len(record["chunk_ids"])
+        log.info(f"[*] '{source_name}' is unchanged since the last upload. Skipping.")
+        return summary
+
+    known_ids = record["chunk_ids"] if record else set()
+    current_ids = set()
+
+    def new_chunks():
+        # Tag every chunk with its ID, but only pass on the ones not already stored
+        for doc in load_document(file_path, splitter):
+            chunk_id = compute_chunk_id(source_name, doc.page_content)
+            if chunk_id in current_ids:
+                continue
+            current_ids.add(chunk_id)
+            if chunk_id in known_ids:
+                continue
+            doc.metadata["chunk_id"] = chunk_id
+            yield doc
+
+    report_stage("parsing")
+    report = ingest_documents(
+        new_chunks(), embeddings=embeddings, index=index,
+        progress_callback=lambda progress: report_stage("embedding", progress)
     )
-    print(f"[+] Upsert complete.")
+    if report["batches_failed"]:
+        # Leave the manifest alone so the next upload retries the missing chunks
+        raise RuntimeError(
+            f"{report['batches_failed']} batch(es) failed after retries; "
+            f"{report['docs_upserted']} chunks were stored. Last error: {report['errors'][-1]}"
+        )
+
+    # A file edited down to no chunks still has its old chunks removed
+    stale_ids = known_ids - current_ids
+    if stale_ids:
+        log.info(f"[*] Deleting {len(stale_ids)} stale chunks of '{source_name}'...")
+        report_stage("deleting")
+        _delete_vectors(index or get_vector_index(), stale_ids)
+        lexical = get_lexical_index()
+        if lexical is not None:
+            lexical.delete(stale_ids)
+        from .question_bank import delete_banked_chunks # question_bank imports this module
+        delete_banked_chunks(stale_ids)
+
+    if record or current_ids:
+        save_file_record(source_name, file_hash, current_ids, manifest_path)
+    if not current_ids:
+        summary.update({"status": "empty", "deleted": len(stale_ids)})
+        if stale_ids:
+            _invalidate_generation_cache()
+        return summary
+
+    _invalidate_generation_cache()
+    summary.update({
+        "status": "ingested",
+        "added": report["docs_upserted"],
+        "kept": len(current_ids) - report["docs_upserted"],
+        "deleted": len(stale_ids),
+    })
+    log.info(f"[+] '{source_name}': {summary['added']} chunks added, {summary['kept']} kept, {summary['deleted']} deleted.")
+    return summary
 
 # --- MODIFIED: clear_vectordb() ---
 def clear_vectordb():
@@ -127,28 +645,60 @@ def clear_vectordb():
     Clear the Pinecone vector database by deleting all vectors.
     Returns a tuple: (success, message, message_type)
     """
+    if VECTOR_BACKEND == "local":
+        return _clear_local_index()
+
     try:
         pc = get_pinecone_client()
         
         if PINECONE_INDEX_NAME not in [index.name for index in pc.list_indexes()]:
-            print(f"[!] Index '{PINECONE_INDEX_NAME}' does not exist. Nothing to clear.")
+            log.warning(f"[!] Index '{PINECONE_INDEX_NAME}' does not exist. Nothing to clear.")
+            _clear_ingest_state()
             return True, "Database index not found. Already clear.", "info"
             
         # --- MODIFICATION HERE ---
         # We no longer pass the host. The client finds it.
-        index = pc.Index(PINECONE_INDEX_NAME)
+        index = get_pinecone_index()
         # --- END MODIFICATION ---
 
         stats = index.describe_index_stats()
         if stats.get('total_vector_count', 0) == 0:
-            print("[!] No vectors found. Database is already empty.")
+            log.warning("[!] No vectors found. Database is already empty.")
+            _clear_ingest_state()
             return True, "Database is already empty.", "info"
         
-        print(f"[*] Deleting all vectors from index '{PINECONE_INDEX_NAME}'...")
+        log.info(f"[*] Deleting all vectors from index '{PINECONE_INDEX_NAME}'...")
         index.delete(delete_all=True)
-        print(f"[+] All vectors deleted.")
+        _clear_ingest_state()
+        _invalidate_generation_cache()
+        log.info(f"[+] All vectors deleted.")
         return True, "Vector database cleared successfully.", "success"
             
     except Exception as e:
-        print(f"[!] Error clearing Pinecone DB: {e}")
-        return False, str(e), "error"
\ No newline at end of file
+        log.warning(f"[!] Error clearing Pinecone DB: {e}")
+        return False, str(e), "error"
+
+    finally:
+        # The index may have been recreated or removed out of band; re-check it
+        # on the next access instead of trusting the cached handles.
+        refresh_index()
+
+def _clear_local_index():
+    """clear_vectordb() for the local backend; same return tuple."""
+    try:
+        index = get_local_index()
+        if index.describe_index_stats().get('total_vector_count', 0) == 0:
+            log.warning("[!] No vectors found. Database is already empty.")
+            _clear_ingest_state()
+            return True, "Database is already empty.", "info"
+
+        log.info(f"[*] Deleting all vectors from local index '{LOCAL_INDEX_DIR}'...")
+        index.delete(delete_all=True)
+        _clear_ingest_state()
+        _invalidate_generation_cache()
+        log.info(f"[+] All vectors deleted.")
+        return True, "Vector database cleared successfully.", "success"
+
+    except Exception as e:
+        log.warning(f"[!] Error clearing local index: {e}")
+        return False, str(e), "error"
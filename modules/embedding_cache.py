@@ -0,0 +1,199 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from .telemetry import stage, record_cache, record_tokens
+
+# --- Constants ---
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))          # Vectors kept in memory
+EMBEDDING_CACHE_TTL = float(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", "86400"))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "")                    # SQLite file; empty disables the disk tier
+
+def _record_embedding_tokens(texts):
+    from .utils import count_tokens # utils imports this module
+    record_tokens("embedding", sum(count_tokens(t) for t in texts))
+
+# --- Cache Tiers ---
+class MemoryCache:
+    """Thread-safe LRU cache with a size limit and per-entry TTL."""
+
+    def __init__(self, max_size: int = EMBEDDING_CACHE_SIZE, ttl: float = EMBEDDING_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value):
+        with self._lock:
+            self._entries[key] = (value, time.time() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+class DiskCache:
+    """SQLite-backed vector cache that survives restarts and is shared by workers."""
+
+    def __init__(self, path: str, ttl: float = EMBEDDING_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key TEXT PRIMARY KEY, vector BLOB NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, key: str):
+        with self._lock:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT vector FROM embeddings WHERE key = ? AND expires_at >= ?", (key, time.time())
+                ).fetchone()
+            finally:
+                conn.close()
+        if row is None:
+            return None
+        return np.frombuffer(row[0], dtype=np.float32).tolist()
+
+    def set(self, key: str, value):
+        blob = np.asarray(value, dtype=np.float32).tobytes()
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO embeddings (key, vector, expires_at) VALUES (?, ?, ?)",
+                        (key, blob, time.time() + self.ttl)
+                    )
+            finally:
+                conn.close()
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute("DELETE FROM embeddings")
+            finally:
+                conn.close()
+
+# --- Cached Embeddings ---
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps a LangChain embeddings object so identical texts are embedded once.
+    Lookups go memory tier -> disk tier (if any) -> the wrapped model, keyed
+    by model name and text hash. Misses within one call are deduplicated
+    and sent to the model in a single request.
+    """
+
+    def __init__(self, underlying: Embeddings, model_name: str,
+                 memory: MemoryCache = None, disk: Optional[DiskCache] = None):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.memory = memory or MemoryCache()
+        self.disk = disk
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def _key(self, text: str) -> str:
+        return f"{self.model_name}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+    def _lookup(self, key: str):
+        vector = self.memory.get(key)
+        if vector is None and self.disk is not None:
+            vector = self.disk.get(key)
+            if vector is not None:
+                self.memory.set(key, vector)
+        return vector
+
+    def _store(self, key: str, vector):
+        self.memory.set(key, vector)
+        if self.disk is not None:
+            self.disk.set(key, vector)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(t) for t in texts]
+        vectors = [self._lookup(k) for k in keys]
+
+        missing = {}
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None:
+                missing.setdefault(key, text)
+
+        with self._stats_lock:
+            self.misses += len(missing)
+            self.hits += len(texts) - len(missing)
+        record_cache("embedding", True, len(texts) - len(missing))
+        record_cache("embedding", False, len(missing))
+
+        if missing:
+            with stage("embed_documents"):
+                fresh = self.underlying.embed_documents(list(missing.values()))
+            _record_embedding_tokens(missing.values())
+            for key, vector in zip(missing, fresh):
+                self._store(key, vector)
+            found = dict(zip(missing, fresh))
+            vectors = [v if v is not None else found[k] for k, v in zip(keys, vectors)]
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        vector = self._lookup(key)
+        record_cache("embedding", vector is not None)
+        if vector is not None:
+            with self._stats_lock:
+                self.hits += 1
+            return vector
+
+        with self._stats_lock:
+            self.misses += 1
+        with stage("embed_query"):
+            vector = self.underlying.embed_query(text)
+        _record_embedding_tokens([text])
+        self._store(key, vector)
+        return vector
+
+    def stats(self) -> dict:
+        """Hit/miss counters for the cache."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "memory_entries": len(self.memory),
+        }
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
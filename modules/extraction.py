@@ -0,0 +1,196 @@
+import os
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import CancelledError, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterator
+from langchain.schema import Document
+
+from .utils import get_or_create_client, invalidate_clients
+from .telemetry import get_logger
+
+log = get_logger(__name__)
+
+# --- Constants ---
+# PDF text extraction and OCR are CPU-bound, so pages and images are fanned
+# out to a process pool instead of running one after another on one core.
+EXTRACTION_MAX_WORKERS = int(os.getenv("EXTRACTION_MAX_WORKERS", str(os.cpu_count() or 2)))
+PAGE_TIMEOUT_SECONDS = float(os.getenv("PAGE_TIMEOUT_SECONDS", "60"))
+PDF_PAGES_PER_TASK = 4          # Pages extracted per worker task
+MAX_PDF_PAGES = 2000
+MAX_IMAGE_PIXELS = 50_000_000   # Larger images are downscaled before OCR
+EXTRACTION_MAX_ATTEMPTS = 3     # Submissions per task when its worker process dies
+
+# --- Process Pool ---
+_pool_lock = threading.Lock()
+
+class ExtractionError(RuntimeError):
+    """
+    Error raised by a pool worker. Some library exceptions (e.g.
+    pytesseract's) cannot be unpickled, which would break the whole pool,
+    so workers re-raise them as this.
+    """
+
+class OCRUnavailableError(ExtractionError):
+    """The tesseract executable is missing."""
+
+def get_extraction_pool() -> ProcessPoolExecutor:
+    """
+    Return the process-wide extraction pool.
+    Workers are spawned rather than forked, since the ingestion job threads
+    may be holding locks at fork time.
+    """
+    return get_or_create_client("extraction_pool", lambda: ProcessPoolExecutor(
+        max_workers=EXTRACTION_MAX_WORKERS,
+        mp_context=multiprocessing.get_context("spawn")
+    ))
+
+def reset_extraction_pool(pool: ProcessPoolExecutor):
+    """
+    Stop `pool`, killing workers stuck on a task, and drop it from the
+    registry so the next task gets a new pool. Futures still queued on it
+    are cancelled; running ones fail with BrokenProcessPool.
+    """
+    with _pool_lock:
+        if get_extraction_pool() is pool:
+            invalidate_clients("extraction_pool")
+    processes = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+
+class _Task:
+    __slots__ = ("label", "fn", "args", "pool", "future", "attempts")
+
+    def __init__(self, label: str, fn, args: tuple):
+        self.label, self.fn, self.args = label, fn, args
+        self.pool = self.future = None
+        self.attempts = 0
+
+    def submit(self):
+        # A pool broken or shut down by another thread is replaced
+        for _ in range(EXTRACTION_MAX_ATTEMPTS):
+            pool = get_extraction_pool()
+            try:
+                self.future = pool.submit(self.fn, *self.args)
+                self.pool = pool
+                self.attempts += 1
+                return
+            except RuntimeError: # BrokenProcessPool, or submit after shutdown
+                reset_extraction_pool(pool)
+        raise BrokenProcessPool(f"Could not start extraction of {self.label}")
+
+    def lost(self) -> bool:
+        """Whether the task died with its pool rather than finishing or failing by itself."""
+        if self.future.cancelled():
+            return True
+        return self.future.done() and isinstance(self.future.exception(), BrokenProcessPool)
+
+def iter_ordered(tasks, timeout: float, window: int = None) -> Iterator:
+    """
+    Run `(label, fn, args)` tasks on the pool and yield `(label, result)` in
+    submission order while later tasks keep running. At most `window` tasks
+    are in flight.
+    A task exceeding `timeout` is skipped with a warning, and its pool is
+    replaced, since a running task cannot be cancelled. Tasks lost with a
+    broken or replaced pool are resubmitted, up to EXTRACTION_MAX_ATTEMPTS
+    times.
+    """
+    window = window or 2 * EXTRACTION_MAX_WORKERS
+    tasks = iter(tasks)
+    pending = deque()
+
+    def fill():
+        while len(pending) < window:
+            task = next(tasks, None)
+            if task is None:
+                return
+            pending.append(_Task(*task))
+            pending[-1].submit()
+
+    def resubmit_lost(pool):
+        for task in pending:
+            if task.pool is pool and task.lost():
+                task.submit()
+
+    fill()
+    while pending:
+        task = pending[0]
+        try:
+            result = task.future.result(timeout=timeout)
+        except FutureTimeoutError:
+            log.warning(f"[!] Extraction of {task.label} timed out after {timeout:.0f}s. Skipping.")
+            pending.popleft()
+            reset_extraction_pool(task.pool)
+            resubmit_lost(task.pool)
+            fill()
+            continue
+        except (BrokenProcessPool, CancelledError):
+            pool = task.pool
+            reset_extraction_pool(pool)
+            if task.attempts >= EXTRACTION_MAX_ATTEMPTS:
+                log.warning(f"[!] Extraction of {task.label} crashed its worker {task.attempts} times. Skipping.")
+                pending.popleft()
+            else:
+                log.warning(f"[!] Extraction pool broke during {task.label}. Restarting it.")
+            resubmit_lost(pool)
+            fill()
+            continue
+        pending.popleft()
+        fill()
+        yield task.label, result
+
+# --- Worker Functions (run in the pool) ---
+def _extract_pdf_pages(file_path: str, start: int, stop: int) -> list:
+    from pypdf import PdfReader
+
+    reader = PdfReader(file_path)
+    return [(i, reader.pages[i].extract_text() or "") for i in range(start, stop)]
+
+def _ocr_image(file_path: str, timeout: float) -> str:
+    from PIL import Image
+    import pytesseract
+
+    image = Image.open(file_path)
+    if image.width * image.height > MAX_IMAGE_PIXELS:
+        scale = (MAX_IMAGE_PIXELS / (image.width * image.height)) ** 0.5
+        image = image.resize((int(image.width * scale), int(image.height * scale)))
+    # pytesseract kills the tesseract process itself once the timeout passes
+    try:
+        return pytesseract.image_to_string(image, timeout=timeout)
+    except pytesseract.TesseractNotFoundError as e:
+        raise OCRUnavailableError(str(e)) from None
+    except pytesseract.TesseractError as e:
+        raise ExtractionError(f"OCR failed: {e}") from None
+
+# --- Extractors ---
+def extract_pdf(file_path: str) -> Iterator[Document]:
+    """Yield one Document per PDF page, extracting pages in parallel."""
+    from pypdf import PdfReader
+
+    num_pages = len(PdfReader(file_path).pages)
+    if num_pages > MAX_PDF_PAGES:
+        raise ValueError(f"PDF has {num_pages} pages; the limit is {MAX_PDF_PAGES}")
+
+    tasks = (
+        (f"pages {start + 1}-{min(start + PDF_PAGES_PER_TASK, num_pages)}",
+         _extract_pdf_pages, (file_path, start, min(start + PDF_PAGES_PER_TASK, num_pages)))
+        for start in range(0, num_pages, PDF_PAGES_PER_TASK)
+    )
+    for _, pages in iter_ordered(tasks, timeout=PAGE_TIMEOUT_SECONDS * PDF_PAGES_PER_TASK):
+        for page, text in pages:
+            yield Document(page_content=text, metadata={"source": file_path, "page": page})
+
+def extract_image(file_path: str) -> Iterator[Document]:
+    """OCR an image on the extraction pool."""
+    try:
+        tasks = [(file_path, _ocr_image, (file_path, PAGE_TIMEOUT_SECONDS))]
+        for _, text in iter_ordered(tasks, timeout=PAGE_TIMEOUT_SECONDS + 5):
+            yield Document(page_content=text, metadata={"source": file_path})
+    except OCRUnavailableError:
+        log.warning("[!] Tesseract Error: Tesseract OCR is not installed or not in PATH.")
+        raise
+    except Exception as e:
+        log.warning(f"[!] Image loading error: {e}")
@@ -0,0 +1,194 @@
+import os
+import re
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+from .telemetry import get_logger, in_current_trace
+
+log = get_logger(__name__)
+
+# --- Constants ---
+# Large requests are split into shards of at most FANOUT_SHARD_SIZE questions,
+# each generated from its own slice of the context, in parallel.
+FANOUT_ENABLED = os.getenv("FANOUT_ENABLED", "true").lower() in ("1", "true", "yes")
+FANOUT_SHARD_SIZE = int(os.getenv("FANOUT_SHARD_SIZE", "5"))
+FANOUT_MAX_CONCURRENCY = int(os.getenv("FANOUT_MAX_CONCURRENCY", "4"))
+FANOUT_MAX_RETRIES = 2                  # Extra calls for the questions a shard is still missing
+DUPLICATE_QUESTION_THRESHOLD = 0.8      # Word-set Jaccard similarity above which questions are duplicates
+
+# --- Planning ---
+def plan_shards(num_questions: int, shard_size: int = None, max_shards: int = None) -> List[int]:
+    """
+    Split a question count into near-equal shard sizes, e.g. 12 -> [4, 4, 4].
+    With `max_shards`, there are at most that many (larger) shards.
+    """
+    shard_size = shard_size or FANOUT_SHARD_SIZE
+    num_shards = max(1, -(-num_questions // shard_size))
+    if max_shards:
+        num_shards = min(num_shards, max_shards)
+    base, extra = divmod(num_questions, num_shards)
+    return [base + (1 if i < extra else 0) for i in range(num_shards)]
+
+def split_context(context: str, num_slices: int) -> List[str]:
+    """
+    Split context into up to `num_slices` disjoint, contiguous slices of similar
+    length, on paragraph boundaries (or sentence boundaries if there are too few
+    paragraphs). Returns fewer slices when the context has too few units.
+    """
+    units = [p for p in context.split("\n\n") if p.strip()]
+    if len(units) < num_slices:
+        units = [s for s in re.split(r"(?<=[.!?])\s+", context) if s.strip()]
+    if len(units) <= 1 or num_slices <= 1:
+        return [context]
+
+    num_slices = min(num_slices, len(units))
+    target = sum(len(u) for u in units) / num_slices
+    slices, current, size = [], [], 0
+    for i, unit in enumerate(units):
+        current.append(unit)
+        size += len(unit)
+        units_left = len(units) - i - 1
+        slices_left = num_slices - len(slices) - 1
+        if slices_left and (size >= target or units_left == slices_left):
+            slices.append("\n\n".join(current))
+            current, size = [], 0
+    if current:
+        slices.append("\n\n".join(current))
+    return slices
+
+def plan_fanout(context: str, num_questions: int, shard_size: int = None) -> tuple:
+    """
+    Shard sizes and one disjoint context slice per shard. When the context
+    has fewer units than there are shards, there are fewer, larger shards:
+    shards sharing a slice would mostly repeat each other's questions.
+    """
+    shards = plan_shards(num_questions, shard_size)
+    slices = split_context(context, len(shards))
+    if len(slices) < len(shards):
+        shards = plan_shards(num_questions, shard_size, max_shards=len(slices))
+    return shards, slices
+
+# --- Merging ---
+def extract_items(parsed, list_key: str) -> list:
+    """Pull the list of question objects out of a parsed LLM response."""
+    if isinstance(parsed, list):
+        return parsed
+    if isinstance(parsed, dict):
+        if isinstance(parsed.get(list_key), list):
+            return parsed[list_key]
+        if "question" in parsed:
+            return [parsed]
+    return []
+
+def _question_words(item: dict) -> set:
+    return set(re.findall(r"\w+", str(item.get("question", "")).lower()))
+
+def dedupe_questions(items: list, threshold: float = DUPLICATE_QUESTION_THRESHOLD) -> list:
+    """Drop questions whose word sets overlap an earlier question's by `threshold` or more."""
+    kept, kept_words = [], []
+    for item in items:
+        words = _question_words(item)
+        if any(len(words & other) / (len(words | other) or 1) >= threshold for other in kept_words):
+            continue
+        kept.append(item)
+        kept_words.append(words)
+    return kept
+
+def renumber(items: list, id_prefix: str, start: int = 1) -> list:
+    """Assign sequential IDs (`{id_prefix}{start}`, ...) in place."""
+    for i, item in enumerate(items, start):
+        item["id"] = f"{id_prefix}{i}"
+    return items
+
+# --- Top-up ---
+def _merge_new(items: list, new: list, num_questions: int, attempt: int) -> list:
+    """Append the new questions that don't duplicate any before them; existing items are kept as they are."""
+    missing = num_questions - len(items)
+    new_ids = {id(i) for i in new}
+    added = [i for i in dedupe_questions(items + new) if id(i) in new_ids][:missing]
+    if len(added) < missing:
+        log.warning(f"[!] Got {len(added)}/{missing} new valid questions (attempt {attempt + 1}); "
+                    f"{missing - len(added)} still missing.")
+    return items + added
+
+def fill_missing(generate_batch: Callable, context: str, num_questions: int, validator, list_key: str,
+                 items: list = None) -> list:
+    """
+    Generate until there are `num_questions` valid, distinct questions. Each
+    retry asks only for the questions still missing (items dropped by the
+    parser or as duplicates), not the whole batch. `items` are questions
+    already generated, e.g. streamed, and stay first.
+    """
+    items = list(items or [])
+    for attempt in range(FANOUT_MAX_RETRIES + 1):
+        missing = num_questions - len(items)
+        if missing <= 0:
+            break
+        try:
+            new = [i for i in extract_items(generate_batch(context, missing), list_key) if validator(i)]
+        except Exception as e:
+            log.warning(f"[!] Batch of {missing} failed (attempt {attempt + 1}): {e}")
+            continue
+        items = _merge_new(items, new, num_questions, attempt)
+    return items
+
+# --- Fan-out ---
+def generate_sharded(generate_batch: Callable, context: str, num_questions: int, validator,
+                     id_prefix: str, list_key: str, shard_size: int = None,
+                     max_concurrency: int = None) -> list:
+    """
+    Generate `num_questions` as concurrent shards over disjoint context slices.
+    `generate_batch(context, n)` is one LLM call returning parsed JSON. Shards
+    run on a capped thread pool; the results are merged in shard order,
+    near-duplicates dropped and IDs renumbered (`{id_prefix}1`, ...).
+    """
+    shards, slices = plan_fanout(context, num_questions, shard_size)
+    log.info(f"[*] Fanning out {num_questions} questions into {len(shards)} shards over {len(slices)} context slices...")
+
+    with ThreadPoolExecutor(max_workers=max_concurrency or FANOUT_MAX_CONCURRENCY) as pool:
+        futures = [
+            pool.submit(in_current_trace(fill_missing), generate_batch, context_slice, n, validator, list_key)
+            for context_slice, n in zip(slices, shards)
+        ]
+        merged = [item for future in futures for item in future.result()]
+
+    merged = renumber(dedupe_questions(merged)[:num_questions], id_prefix)
+    log.info(f"[+] Fan-out produced {len(merged)}/{num_questions} questions.")
+    return merged
+
+# --- Async Fan-out ---
+async def fill_missing_async(generate_batch: Callable, context: str, num_questions: int, validator,
+                             list_key: str, items: list = None) -> list:
+    """Async variant of `fill_missing`; `generate_batch` is a coroutine function."""
+    items = list(items or [])
+    for attempt in range(FANOUT_MAX_RETRIES + 1):
+        missing = num_questions - len(items)
+        if missing <= 0:
+            break
+        try:
+            new = [i for i in extract_items(await generate_batch(context, missing), list_key) if validator(i)]
+        except Exception as e:
+            log.warning(f"[!] Batch of {missing} failed (attempt {attempt + 1}): {e}")
+            continue
+        items = _merge_new(items, new, num_questions, attempt)
+    return items
+
+async def generate_sharded_async(generate_batch: Callable, context: str, num_questions: int, validator,
+                                 id_prefix: str, list_key: str, shard_size: int = None) -> list:
+    """
+    Async variant of `generate_sharded`: shards are awaited together with
+    asyncio.gather. Concurrency is capped by the caller's provider limits
+    (see modules/async_pipeline.py) rather than a thread pool.
+    """
+    shards, slices = plan_fanout(context, num_questions, shard_size)
+    log.info(f"[*] Fanning out {num_questions} questions into {len(shards)} shards over {len(slices)} context slices...")
+
+    results = await asyncio.gather(*(
+        fill_missing_async(generate_batch, context_slice, n, validator, list_key)
+        for context_slice, n in zip(slices, shards)
+    ))
+    merged = [item for items in results for item in items]
+
+    merged = renumber(dedupe_questions(merged)[:num_questions], id_prefix)
+    log.info(f"[+] Fan-out produced {len(merged)}/{num_questions} questions.")
+    return merged
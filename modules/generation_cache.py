@@ -0,0 +1,183 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Optional
+import numpy as np
+
+from .embedding_cache import MemoryCache
+from .utils import get_or_create_client, count_tokens
+from .telemetry import get_logger, record_cache
+
+log = get_logger(__name__)
+
+# --- Constants ---
+GENERATION_CACHE_ENABLED = os.getenv("GENERATION_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+GENERATION_CACHE_BACKEND = os.getenv("GENERATION_CACHE_BACKEND", "memory")  # "memory" or "sqlite"
+GENERATION_CACHE_PATH = os.getenv("GENERATION_CACHE_PATH", "generation_cache.sqlite3")
+GENERATION_CACHE_SIZE = int(os.getenv("GENERATION_CACHE_SIZE", "1000"))
+GENERATION_CACHE_TTL = float(os.getenv("GENERATION_CACHE_TTL_SECONDS", "3600"))
+# Bits of the random-hyperplane hash of the query embedding; near-identical
+# queries ("photosynthesis", "Photosynthesis basics") land in the same bucket.
+# 0 leaves the query out of the key entirely.
+QUERY_BUCKET_BITS = int(os.getenv("GENERATION_CACHE_QUERY_BITS", "8"))
+QUERY_BUCKET_SEED = 1234
+
+# --- Cache Key ---
+def query_bucket(query_vector, bits: int = QUERY_BUCKET_BITS) -> str:
+    """Locality-sensitive bucket of a query embedding (sign of random projections)."""
+    if bits <= 0 or query_vector is None:
+        return ""
+    query_vector = np.asarray(query_vector, dtype=np.float32)
+    planes = np.random.default_rng(QUERY_BUCKET_SEED).standard_normal((bits, query_vector.shape[0]))
+    signs = (planes @ query_vector) > 0
+    return "".join("1" if s else "0" for s in signs)
+
+def context_fingerprint(docs, context: str) -> str:
+    """
+    Identify the context a generation was built from: the set of retrieved
+    chunk IDs, or a hash of the text when the context came from web search.
+    """
+    joined = "\n\n".join([d.page_content for d in docs])
+    if docs and joined == context:
+        ids = sorted(
+            d.metadata.get("chunk_id") or hashlib.sha256(d.page_content.encode("utf-8")).hexdigest()
+            for d in docs
+        )
+        return "chunks:" + hashlib.sha256("|".join(ids).encode("utf-8")).hexdigest()
+    return "text:" + hashlib.sha256(context.encode("utf-8")).hexdigest()
+
+def generation_cache_key(gen_type: str, num_questions, query: str, embeddings, docs, context: str) -> str:
+    """Cache key from question type, count, query bucket and context fingerprint."""
+    bucket = ""
+    if docs and all(d.metadata.get("retrieval") == "lexical" for d in docs):
+        # Retrieved without embedding the query (lexical shortcut); don't embed it here either
+        bucket = "lexical:" + " ".join(sorted(set(query.lower().split())))
+    elif embeddings is not None and QUERY_BUCKET_BITS > 0:
+        # A cache hit in the embedding cache: the retriever already embedded this query
+        bucket = query_bucket(embeddings.embed_query(query))
+    parts = [gen_type, str(num_questions), bucket, context_fingerprint(docs, context)]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+# --- Backends ---
+class SQLiteBackend:
+    """File-backed backend shared by all workers; evicts least recently used entries."""
+
+    def __init__(self, path: str = GENERATION_CACHE_PATH, max_size: int = GENERATION_CACHE_SIZE,
+                 ttl: float = GENERATION_CACHE_TTL):
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._run(
+            "CREATE TABLE IF NOT EXISTS generations ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, used_at REAL NOT NULL)"
+        )
+
+    def _run(self, sql: str, params: tuple = ()):
+        with self._lock:
+            conn = sqlite3.connect(self.path, timeout=30)
+            try:
+                with conn:
+                    return conn.execute(sql, params).fetchone()
+            finally:
+                conn.close()
+
+    def get(self, key: str):
+        now = time.time()
+        row = self._run("SELECT value FROM generations WHERE key = ? AND expires_at >= ?", (key, now))
+        if row is None:
+            return None
+        self._run("UPDATE generations SET used_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key: str, value):
+        now = time.time()
+        self._run(
+            "INSERT OR REPLACE INTO generations (key, value, expires_at, used_at) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value), now + self.ttl, now)
+        )
+        self._run(
+            "DELETE FROM generations WHERE expires_at < ? OR key NOT IN "
+            "(SELECT key FROM generations ORDER BY used_at DESC LIMIT ?)",
+            (now, self.max_size)
+        )
+
+    def clear(self):
+        self._run("DELETE FROM generations")
+
+    def __len__(self):
+        return self._run("SELECT COUNT(*) FROM generations")[0]
+
+# --- Generation Cache ---
+class GenerationCache:
+    """Result cache for the generators, with hit/miss and saved-token counters."""
+
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryCache(GENERATION_CACHE_SIZE, GENERATION_CACHE_TTL)
+        self.hits = 0
+        self.misses = 0
+        self.saved_tokens = 0
+        self._stats_lock = threading.Lock()
+
+    def get(self, key: str):
+        """Return the cached result for `key`, or None."""
+        entry = self.backend.get(key)
+        record_cache("generation", entry is not None)
+        with self._stats_lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_tokens += entry["tokens"]
+        log.info(f"[+] Generation cache hit (saved ~{entry['tokens']} LLM tokens).")
+        return entry["result"]
+
+    def set(self, key: str, result, context: str = ""):
+        """Store a result along with the LLM tokens it cost (prompt context + output)."""
+        if not result:
+            return
+        tokens = count_tokens(context) + count_tokens(json.dumps(result))
+        self.backend.set(key, {"result": result, "tokens": tokens})
+
+    def invalidate(self):
+        """Drop every cached result (after uploads or a cleared database)."""
+        self.backend.clear()
+        log.info("[*] Generation cache invalidated.")
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "saved_llm_tokens": self.saved_tokens,
+            "entries": len(self.backend),
+        }
+
+def get_generation_cache() -> Optional[GenerationCache]:
+    """Return the process-wide generation cache, or None when it is disabled."""
+    if not GENERATION_CACHE_ENABLED:
+        return None
+
+    def build():
+        if GENERATION_CACHE_BACKEND == "sqlite":
+            return GenerationCache(SQLiteBackend())
+        return GenerationCache()
+
+    return get_or_create_client("generation_cache", build)
+
+def cached_generate(gen_type: str, num_questions, query: str, embeddings, docs, context: str, generate):
+    """Return the cached result for this request, or run `generate()` and cache what it returns."""
+    cache = get_generation_cache()
+    if cache is None or not context:
+        return generate()
+
+    key = generation_cache_key(gen_type, num_questions, query, embeddings, docs, context)
+    result = cache.get(key)
+    if result is None:
+        result = generate()
+        cache.set(key, result, context)
+    return result
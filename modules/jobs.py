@@ -0,0 +1,165 @@
+import os
+import json
+import time
+import uuid
+import queue
+import sqlite3
+import threading
+from functools import partial
+from typing import Optional
+
+from .db_manager import upsert_file
+from .manifest import get_file_record
+from .question_bank import build_question_bank, QUESTION_BANK_ENABLED
+from .telemetry import get_logger
+
+log = get_logger(__name__)
+
+# --- Constants ---
+# Job state lives in SQLite so any gunicorn worker can answer /jobs/<id>,
+# not only the one that accepted the upload.
+JOBS_DB_PATH = os.getenv("INGEST_JOBS_DB_PATH", "ingest_jobs.sqlite3")
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))          # Background ingestion threads per process
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "16"))   # Queued jobs before /upload pushes back
+JOB_HISTORY_SECONDS = 24 * 60 * 60
+
+_queue = queue.Queue(maxsize=INGEST_QUEUE_SIZE)
+_workers_lock = threading.Lock()
+_workers_pid = None
+_db_lock = threading.Lock()
+
+# --- Job Store ---
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(JOBS_DB_PATH)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS jobs ("
+        " id TEXT PRIMARY KEY, status TEXT NOT NULL, stage TEXT NOT NULL,"
+        " progress TEXT, result TEXT, error TEXT,"
+        " created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+    )
+    return conn
+
+def _execute(sql: str, params: tuple = ()):
+    with _db_lock:
+        conn = _connect()
+        try:
+            with conn:
+                return conn.execute(sql, params).fetchone()
+        finally:
+            conn.close()
+
+def update_job(job_id: str, stage: str = None, progress: dict = None, status: str = None,
+               result: dict = None, error: str = None):
+    """Record a job's current stage/progress (and final result or error)."""
+    fields = {"updated_at": time.time()}
+    if stage is not None:
+        fields["stage"] = stage
+    if progress is not None:
+        fields["progress"] = json.dumps(progress)
+    if status is not None:
+        fields["status"] = status
+    if result is not None:
+        fields["result"] = json.dumps(result)
+    if error is not None:
+        fields["error"] = error
+
+    assignments = ", ".join(f"{name} = ?" for name in fields)
+    _execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+def get_job(job_id: str) -> Optional[dict]:
+    """Return a job's state as a JSON-ready dict, or None if it is unknown."""
+    row = _execute(
+        "SELECT id, status, stage, progress, result, error, created_at, updated_at FROM jobs WHERE id = ?",
+        (job_id,)
+    )
+    if row is None:
+        return None
+    return {
+        "id": row[0],
+        "status": row[1],
+        "stage": row[2],
+        "progress": json.loads(row[3]) if row[3] else None,
+        "result": json.loads(row[4]) if row[4] else None,
+        "error": row[5],
+        "created_at": row[6],
+        "updated_at": row[7],
+    }
+
+# --- Worker Pool ---
+def _worker():
+    while True:
+        job_id, fn, args, kwargs = _queue.get()
+        try:
+            update_job(job_id, status="running", stage="starting")
+            result = fn(partial(update_job, job_id), *args, **kwargs)
+            update_job(job_id, status="done", stage="done", result=result)
+        except Exception as e:
+            log.warning(f"[!] Job {job_id} failed: {e}")
+            update_job(job_id, status="failed", stage="failed", error=str(e))
+        finally:
+            _queue.task_done()
+
+def _ensure_workers():
+    # Threads do not survive a fork, so each worker process starts its own pool
+    global _workers_pid
+    if _workers_pid == os.getpid():
+        return
+    with _workers_lock:
+        if _workers_pid == os.getpid():
+            return
+        for i in range(INGEST_WORKERS):
+            threading.Thread(target=_worker, name=f"ingest-worker-{i}", daemon=True).start()
+        _workers_pid = os.getpid()
+
+def submit_job(fn, *args, **kwargs) -> str:
+    """
+    Queue `fn(report, *args, **kwargs)` on the background pool and return its job ID.
+    `report` is `update_job` bound to the job, for stage/progress updates.
+    Raises `queue.Full` when the queue is at capacity, so callers can push back.
+    """
+    _ensure_workers()
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    _execute("DELETE FROM jobs WHERE updated_at < ?", (now - JOB_HISTORY_SECONDS,))
+    _execute(
+        "INSERT INTO jobs (id, status, stage, created_at, updated_at) VALUES (?, 'queued', 'queued', ?, ?)",
+        (job_id, now, now)
+    )
+    try:
+        _queue.put_nowait((job_id, fn, args, kwargs))
+    except queue.Full:
+        _execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        raise
+    return job_id
+
+# --- Jobs ---
+def ingest_file_job(report, file_path: str, source_name: str) -> dict:
+    """Background ingestion of an uploaded file; the file is removed afterwards."""
+    try:
+        summary = upsert_file(
+            file_path,
+            source_name=source_name,
+            progress_callback=lambda stage, progress=None: report(stage=stage, progress=progress)
+        )
+        if summary["status"] == "empty":
+            raise ValueError("File type not supported or file is empty")
+        if QUESTION_BANK_ENABLED and summary["status"] == "ingested":
+            # Pre-generate questions for the new chunks as a job of its own, so the
+            # upload is done once it is searchable rather than after the LLM calls
+            try:
+                summary["question_bank_job_id"] = submit_job(
+                    question_bank_job, sorted(get_file_record(source_name)["chunk_ids"])
+                )
+            except queue.Full:
+                log.warning(f"[!] Job queue is full; question bank build for '{source_name}' not queued.")
+        return summary
+    finally:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+def question_bank_job(report, chunk_ids: list = None) -> dict:
+    """Background build of the question bank for `chunk_ids` (default: every ingested chunk) not in it yet."""
+    report(stage="question_bank")
+    return build_question_bank(
+        chunk_ids, progress_callback=lambda progress: report(stage="question_bank", progress=progress)
+    )
@@ -0,0 +1,296 @@
+import os
+import re
+import json
+import uuid
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterable, List, Tuple
+import numpy as np
+from .telemetry import get_logger
+
+try:
+    import fcntl
+except ImportError: # Windows: writers are only serialized within one process
+    fcntl = None
+
+log = get_logger(__name__)
+
+# --- Constants ---
+BM25_K1 = 1.2
+BM25_B = 0.75
+LEXICAL_MAX_SEGMENTS = int(os.getenv("LEXICAL_MAX_SEGMENTS", "8"))  # Segments are merged beyond this
+MAX_TERM_FREQUENCY = 65535  # Term frequencies are stored as uint16
+# Keeps section numbers ("3.2.1"), acronyms and hyphenated terms ("anti-aircraft") as single tokens
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.\-/][a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were what which who "
+    "with about explain describe give me questions question generate".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms of `text`, without stopwords."""
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+# --- Segments ---
+class _Segment:
+    """
+    Immutable on-disk chunk of the index. Postings of all terms are stored
+    back to back in two memory-mapped arrays (doc numbers uint32, term
+    frequencies uint16); `terms` maps each term to its (start, count) slice.
+    """
+
+    def __init__(self, path: str, name: str):
+        base = os.path.join(path, name)
+        with open(base + ".meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.name = name
+        self.ids = meta["ids"]
+        self.terms = meta["terms"]
+        self.doc_lengths = np.load(base + ".lengths.npy", mmap_mode="r")
+        self.postings_docs = np.load(base + ".docs.npy", mmap_mode="r")
+        self.postings_tfs = np.load(base + ".tfs.npy", mmap_mode="r")
+
+    def postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        start, count = self.terms.get(term, (0, 0))
+        return self.postings_docs[start:start + count], self.postings_tfs[start:start + count]
+
+    @staticmethod
+    def write(path: str, ids: List[str], term_counts: List[Counter]) -> str:
+        """Write a segment for docs `ids` with per-doc term counts; returns its name."""
+        postings = {}
+        for doc, counts in enumerate(term_counts):
+            for term, tf in counts.items():
+                postings.setdefault(term, ([], []))
+                postings[term][0].append(doc)
+                postings[term][1].append(min(tf, MAX_TERM_FREQUENCY))
+        return _Segment.write_postings(path, ids, [sum(c.values()) for c in term_counts], postings)
+
+    @staticmethod
+    def write_postings(path: str, ids: List[str], doc_lengths, postings: dict) -> str:
+        terms, docs, tfs, offset = {}, [], [], 0
+        for term in sorted(postings):
+            term_docs, term_tfs = postings[term]
+            terms[term] = (offset, len(term_docs))
+            docs.append(np.asarray(term_docs, dtype=np.uint32))
+            tfs.append(np.asarray(term_tfs, dtype=np.uint16))
+            offset += len(term_docs)
+
+        name = f"seg-{uuid.uuid4().hex[:12]}"
+        base = os.path.join(path, name)
+        np.save(base + ".docs.npy", np.concatenate(docs) if docs else np.zeros(0, dtype=np.uint32))
+        np.save(base + ".tfs.npy", np.concatenate(tfs) if tfs else np.zeros(0, dtype=np.uint16))
+        np.save(base + ".lengths.npy", np.asarray(doc_lengths, dtype=np.uint32))
+        with open(base + ".meta.json", "w", encoding="utf-8") as f:
+            json.dump({"ids": ids, "terms": terms}, f)
+        return name
+
+    def remove_files(self, path: str):
+        for suffix in (".meta.json", ".lengths.npy", ".docs.npy", ".tfs.npy"):
+            try:
+                os.remove(os.path.join(path, self.name + suffix))
+            except FileNotFoundError:
+                pass
+
+# --- BM25 Index ---
+class BM25Index:
+    """
+    Local inverted index with BM25 scoring, kept next to the vector index.
+
+    Added chunks are buffered and written as an immutable segment on
+    `flush()`; deletes are tombstones kept per segment, so the old copies of
+    a deleted and re-added ID stay deleted. A `segments.json` manifest lists
+    the live segments and their deleted IDs, and is replaced atomically, so other
+    worker processes pick up changes on their next search. Once there are
+    more than LEXICAL_MAX_SEGMENTS segments they are merged into one and
+    tombstoned postings are dropped.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.manifest_path = os.path.join(path, "segments.json")
+        self._lock = threading.RLock()
+        self._pending_ids = []
+        self._pending_counts = []
+        self._manifest_mtime = None
+        self._segments = []
+        self._deleted = {}
+        self._dead = []
+        self._live_ids = set()
+        os.makedirs(path, exist_ok=True)
+        self._reload()
+
+    # --- Manifest ---
+    def _read_manifest(self) -> dict:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"segments": [], "deleted": {}}
+
+    def _write_manifest(self, segment_names: List[str], deleted: dict):
+        """Publish the segment list; `deleted` maps segment names to their tombstoned IDs."""
+        deleted = {name: sorted(deleted[name]) for name in segment_names if deleted.get(name)}
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"segments": segment_names, "deleted": deleted}, f)
+        os.replace(tmp, self.manifest_path)
+
+    def _reload(self, force: bool = False):
+        """Re-open segments if the manifest changed since the last load."""
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if not force and mtime == self._manifest_mtime:
+            return
+
+        manifest = self._read_manifest()
+        loaded = {s.name: s for s in self._segments}
+        self._segments = [loaded.get(name) or _Segment(self.path, name) for name in manifest["segments"]]
+        deleted = manifest["deleted"]
+        if isinstance(deleted, list): # Older manifests: one ID list for all segments
+            deleted = {name: deleted for name in manifest["segments"]}
+        self._deleted = {s.name: set(deleted.get(s.name, ())) for s in self._segments}
+        self._dead = [
+            np.fromiter((i in self._deleted[s.name] for i in s.ids), dtype=bool, count=len(s.ids))
+            for s in self._segments
+        ]
+        self._live_ids = {
+            i for s, dead in zip(self._segments, self._dead) for i, is_dead in zip(s.ids, dead) if not is_dead
+        }
+        total_length = sum(int(s.doc_lengths[~dead].sum()) for s, dead in zip(self._segments, self._dead))
+        self._num_docs = len(self._live_ids)
+        self._avg_length = total_length / self._num_docs if self._num_docs else 0.0
+        self._manifest_mtime = mtime
+
+    @contextmanager
+    def _write_lock(self):
+        """Serialize manifest updates across threads and, where flock exists, processes."""
+        with self._lock:
+            if fcntl is None:
+                self._reload()
+                yield
+                return
+            with open(os.path.join(self.path, "index.lock"), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    self._reload()
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # --- Updates ---
+    def add(self, ids: Iterable[str], texts: Iterable[str]):
+        """Buffer chunks for the next segment; IDs already indexed are skipped."""
+        with self._lock:
+            for chunk_id, text in zip(ids, texts):
+                if chunk_id in self._live_ids:
+                    continue
+                self._pending_ids.append(chunk_id)
+                self._pending_counts.append(Counter(tokenize(text)))
+
+    def flush(self):
+        """Write buffered chunks as a new segment and publish it."""
+        with self._write_lock():
+            if not self._pending_ids:
+                return
+            ids, counts = self._pending_ids, self._pending_counts
+            self._pending_ids, self._pending_counts = [], []
+            name = _Segment.write(self.path, ids, counts)
+            names = [s.name for s in self._segments] + [name]
+            # Only the new segment's copy of a re-added ID is live
+            self._write_manifest(names, self._deleted)
+            self._reload(force=True)
+            if len(self._segments) > LEXICAL_MAX_SEGMENTS:
+                self._merge()
+
+    def delete(self, ids: Iterable[str]):
+        with self._write_lock():
+            ids = set(ids) & self._live_ids
+            if ids:
+                deleted = {s.name: self._deleted[s.name] | ids.intersection(s.ids) for s in self._segments}
+                self._write_manifest([s.name for s in self._segments], deleted)
+                self._reload(force=True)
+
+    def clear(self):
+        with self._write_lock():
+            self._pending_ids, self._pending_counts = [], []
+            old = self._segments
+            self._write_manifest([], {})
+            self._reload(force=True)
+            for segment in old:
+                segment.remove_files(self.path)
+
+    def _merge(self):
+        """Merge all segments into one, dropping tombstoned postings."""
+        ids, lengths, postings = [], [], {}
+        for segment, dead in zip(self._segments, self._dead):
+            remap = np.full(len(segment.ids), -1, dtype=np.int64)
+            live = np.flatnonzero(~dead)
+            remap[live] = np.arange(len(ids), len(ids) + len(live))
+            ids.extend(segment.ids[i] for i in live)
+            lengths.extend(segment.doc_lengths[live].tolist())
+            for term in segment.terms:
+                docs, tfs = segment.postings(term)
+                new_docs = remap[docs]
+                keep = new_docs >= 0
+                if keep.any():
+                    entry = postings.setdefault(term, ([], []))
+                    entry[0].extend(new_docs[keep].tolist())
+                    entry[1].extend(tfs[keep].tolist())
+
+        old = self._segments
+        name = _Segment.write_postings(self.path, ids, lengths, postings)
+        self._write_manifest([name], {})
+        self._reload(force=True)
+        for segment in old:
+            segment.remove_files(self.path)
+        log.info(f"[+] Merged {len(old)} lexical index segments ({len(ids)} chunks).")
+
+    # --- Search ---
+    def __len__(self):
+        with self._lock:
+            self._reload()
+            return self._num_docs
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[str, float, float]]:
+        """
+        BM25 top-k for the query. Returns (chunk_id, score, term_coverage)
+        tuples, where term_coverage is the share of distinct query terms the
+        chunk contains.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            self._reload()
+            if not terms or not self._num_docs:
+                return []
+
+            postings = [[s.postings(t) for t in terms] for s in self._segments]
+            # Only live docs count, like _num_docs; otherwise df can exceed N and the IDF go negative
+            doc_freq = np.array([
+                sum(int(np.count_nonzero(~dead[p[i][0]])) for p, dead in zip(postings, self._dead))
+                for i in range(len(terms))
+            ], dtype=np.float64)
+            idf = np.log(1 + (self._num_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+
+            results = []
+            for segment, dead, segment_postings in zip(self._segments, self._dead, postings):
+                scores = np.zeros(len(segment.ids), dtype=np.float64)
+                matched = np.zeros(len(segment.ids), dtype=np.int32)
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * segment.doc_lengths / (self._avg_length or 1.0))
+                for term_idf, (docs, tfs) in zip(idf, segment_postings):
+                    if not len(docs):
+                        continue
+                    tfs = tfs.astype(np.float64)
+                    # Each doc appears at most once per term, so fancy-index += is safe
+                    scores[docs] += term_idf * tfs * (BM25_K1 + 1) / (tfs + norm[docs])
+                    matched[docs] += 1
+                scores[dead] = 0.0
+                hits = np.flatnonzero(scores > 0)
+                if len(hits) > top_k:
+                    hits = hits[np.argpartition(-scores[hits], top_k - 1)[:top_k]]
+                results.extend((segment.ids[i], float(scores[i]), float(matched[i]) / len(terms)) for i in hits)
+
+        results.sort(key=lambda r: -r[1])
+        return results[:top_k]
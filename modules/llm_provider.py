@@ -1,17 +1,115 @@
-from langchain_groq import ChatGroq
+import os
+
+from .utils import get_or_create_client, get_http_client, get_async_http_client, count_tokens
+from .telemetry import get_logger, record_llm_route
+
+log = get_logger(__name__)
+
+# --- Model Tiers ---
+# Each generation call is routed to a tier: "small" (fast, cheap) when the
+# question type is in LLM_SMALL_TIER_TYPES and both the context and the
+# expected output are short, "large" otherwise. LLM_ROUTING=false sends
+# everything to the large tier.
+LLM_ROUTING = os.getenv("LLM_ROUTING", "true").lower() in ("1", "true", "yes")
+LLM_SMALL_MODEL = os.getenv("LLM_SMALL_MODEL", "llama-3.1-8b-instant")
+LLM_LARGE_MODEL = os.getenv("LLM_LARGE_MODEL", "openai/gpt-oss-120b")
+LLM_SMALL_TIER_TYPES = tuple(t.strip() for t in os.getenv("LLM_SMALL_TIER_TYPES", "qa").split(",") if t.strip())
+LLM_SMALL_MAX_CONTEXT_TOKENS = int(os.getenv("LLM_SMALL_MAX_CONTEXT_TOKENS", "1500"))
+LLM_SMALL_MAX_OUTPUT_TOKENS = int(os.getenv("LLM_SMALL_MAX_OUTPUT_TOKENS", "1000"))
+
+# Tier -> (model, extra max_tokens for reasoning models, which spend completion tokens thinking)
+LLM_TIERS = {
+    "small": (LLM_SMALL_MODEL, 0),
+    "large": (LLM_LARGE_MODEL, int(os.getenv("LLM_LARGE_REASONING_TOKENS", "2048"))),
+}
+
+# --- Output Budget ---
+# max_tokens of a call: OUTPUT_TOKENS_PER_QUESTION per requested item plus
+# OUTPUT_OVERHEAD_TOKENS for the JSON wrapper, plus the tier's reasoning allowance
+OUTPUT_TOKENS_PER_QUESTION = {
+    "mcq": int(os.getenv("LLM_MCQ_TOKENS_PER_QUESTION", "200")),
+    "qa": int(os.getenv("LLM_QA_TOKENS_PER_QUESTION", "120")),
+}
+OUTPUT_OVERHEAD_TOKENS = 100
+
+def expected_output_tokens(gen_type: str, num_questions: int) -> int:
+    return OUTPUT_TOKENS_PER_QUESTION[gen_type] * num_questions + OUTPUT_OVERHEAD_TOKENS
+
+def choose_tier(gen_type: str, context_tokens: int, num_questions: int) -> str:
+    """Model tier for a call with this context size and question count."""
+    if (
+        LLM_ROUTING
+        and gen_type in LLM_SMALL_TIER_TYPES
+        and context_tokens <= LLM_SMALL_MAX_CONTEXT_TOKENS
+        and expected_output_tokens(gen_type, num_questions) <= LLM_SMALL_MAX_OUTPUT_TOKENS
+    ):
+        return "small"
+    return "large"
+
+# --- Routing ---
+class LLMRouter:
+    """
+    Picks the model of each generation call (see `choose_tier`) and caps its
+    max_tokens from the number of questions requested. `get_model(tier)`
+    returns a tier's chat model; tests can pass local fakes, e.g.
+    `LLMRouter({"small": fake_small, "large": fake_large}.__getitem__)`.
+    """
+
+    def __init__(self, get_model, tiers: dict = None):
+        self.get_model = get_model
+        self.tiers = tiers or LLM_TIERS
+
+    def route(self, gen_type: str, context: str, num_questions: int):
+        """Returns (model bound to its max_tokens, tier)."""
+        context_tokens = count_tokens(context)
+        tier = choose_tier(gen_type, context_tokens, num_questions)
+        model_name, reasoning_tokens = self.tiers[tier]
+        max_tokens = expected_output_tokens(gen_type, num_questions) + reasoning_tokens
+        log.info(
+            f"[*] Routing {num_questions} {gen_type} items (~{context_tokens} context tokens) "
+            f"to the {tier} tier ({model_name}, max_tokens={max_tokens})."
+        )
+        record_llm_route(tier, gen_type)
+        return self.get_model(tier).bind(max_tokens=max_tokens), tier
+
+def route_llm(llm, gen_type: str, context: str, num_questions: int):
+    """
+    Model and tier for one generation call. `llm` is what `get_mcq_llm` and
+    `get_qa_llm` return (an LLMRouter); any other model, such as a fake in
+    tests, is used as is under the "default" tier.
+    """
+    if isinstance(llm, LLMRouter):
+        return llm.route(gen_type, context, num_questions)
+    return llm, "default"
+
+# --- Clients ---
+def _build_chat_groq(**kwargs):
+    # Imported on first use, so workers that never call the LLM skip the Groq SDK
+    from langchain_groq import ChatGroq
+    return ChatGroq(**kwargs)
+
+def get_tier_llm(tier: str):
+    """Return the process-wide chat model of a tier."""
+    return get_or_create_client(f"llm_{tier}", lambda: _build_chat_groq(
+        model=LLM_TIERS[tier][0],
+        temperature=0.0,
+        http_client=get_http_client(),
+        http_async_client=get_async_http_client()
+    ))
+
+def get_llm_router() -> LLMRouter:
+    return get_or_create_client("llm_router", lambda: LLMRouter(get_tier_llm))
 
 def get_qa_llm():
     """
-    Initialize and return the LLM for Short Q&A.
-    (Using the model from your short_qa.ipynb)
+    Return the LLM for Short Q&A: the shared model router, which picks the
+    tier of each call (see `route_llm`).
     """
-    llm = ChatGroq(model="openai/gpt-oss-120b", temperature=0.0)
-    return llm
+    return get_llm_router()
 
 def get_mcq_llm():
     """
-    Initialize and return the LLM for MCQs. 
-    (Using the model from your mcq.ipynb)
+    Return the LLM for MCQs: the shared model router, which picks the
+    tier of each call (see `route_llm`).
     """
-    llm = ChatGroq(model="openai/gpt-oss-120b", temperature=0.0)
-    return llm
\ No newline at end of file
+    return get_llm_router()
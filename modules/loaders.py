@@ -0,0 +1,115 @@
+import os
+import zipfile
+import mimetypes
+from typing import Callable, Iterator, Optional
+from langchain.schema import Document
+
+from .telemetry import get_logger
+
+log = get_logger(__name__)
+
+# --- Constants ---
+SNIFF_BYTES = 8192  # Bytes read from the start of a file to detect its format
+
+# --- Loaders ---
+# Each loader imports its backend when it is first called, so a worker that
+# never ingests a format (or only serves /generate) never loads its parser.
+def _load_pdf(file_path: str) -> Iterator[Document]:
+    from .extraction import extract_pdf
+    return extract_pdf(file_path)
+
+def _load_docx(file_path: str) -> Iterator[Document]:
+    from langchain_community.document_loaders import Docx2txtLoader
+    return Docx2txtLoader(file_path).lazy_load()
+
+def _load_pptx(file_path: str) -> Iterator[Document]:
+    from langchain_community.document_loaders import UnstructuredPowerPointLoader
+    return UnstructuredPowerPointLoader(file_path).lazy_load()
+
+def _load_text(file_path: str) -> Iterator[Document]:
+    from langchain_community.document_loaders import TextLoader
+    return TextLoader(file_path, encoding="utf-8").lazy_load()
+
+def _load_image(file_path: str) -> Iterator[Document]:
+    from .extraction import extract_image
+    return extract_image(file_path)
+
+# --- Registry ---
+# format -> loader; MIME types and leading magic bytes map onto formats
+LOADERS = {}
+MIME_FORMATS = {}
+SIGNATURES = []  # (magic bytes, format), matched against the start of the file
+ZIP_FORMATS = ("docx", "pptx")  # Recognized inside zip archives by _sniff_zip
+
+def register_loader(format_name: str, loader: Callable[[str], Iterator[Document]],
+                    mime_types: tuple = (), signatures: tuple = ()):
+    """Register (or replace) the loader of a format, with the MIME types and magic bytes that identify it."""
+    LOADERS[format_name] = loader
+    for mime_type in mime_types:
+        MIME_FORMATS[mime_type] = format_name
+    SIGNATURES.extend((signature, format_name) for signature in signatures)
+
+register_loader("pdf", _load_pdf, ("application/pdf",), (b"%PDF-",))
+register_loader("docx", _load_docx, ("application/vnd.openxmlformats-officedocument.wordprocessingml.document",))
+register_loader("pptx", _load_pptx, ("application/vnd.openxmlformats-officedocument.presentationml.presentation",))
+register_loader("text", _load_text, ("text/plain",))
+register_loader("image", _load_image, ("image/jpeg", "image/png"), (b"\xff\xd8\xff", b"\x89PNG\r\n\x1a\n"))
+
+# --- Format Detection ---
+def _sniff_zip(file_path: str) -> Optional[str]:
+    """Tell OOXML documents apart by their main part; other archives are unsupported."""
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            names = set(archive.namelist())
+    except zipfile.BadZipFile:
+        return None
+    if "word/document.xml" in names:
+        return "docx"
+    if "ppt/presentation.xml" in names:
+        return "pptx"
+    return None
+
+def _looks_like_text(head: bytes) -> bool:
+    if b"\x00" in head:
+        return False
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut off at the end of the sniffed bytes is fine
+        return e.start >= len(head) - 3 and len(head) == SNIFF_BYTES
+    return True
+
+def detect_format(file_path: str) -> Optional[str]:
+    """
+    Format of a file from its content, falling back to its extension:
+    magic bytes first (PDF, images, OOXML zip archives), then the extension's
+    MIME type, then a UTF-8 check for text with an unknown or wrong extension.
+    None if unsupported.
+    """
+    with open(file_path, "rb") as f:
+        head = f.read(SNIFF_BYTES)
+
+    for signature, format_name in SIGNATURES:
+        if head.startswith(signature):
+            return format_name
+    if head.startswith(b"PK\x03\x04"):
+        return _sniff_zip(file_path)
+
+    mime_type, _ = mimetypes.guess_type(file_path)
+    format_name = MIME_FORMATS.get(mime_type)
+    # Formats with a content signature did not match it, so their extension is wrong
+    if format_name in ZIP_FORMATS or format_name in {f for _, f in SIGNATURES}:
+        log.warning(f"[!] {os.path.basename(file_path)} is not a valid {format_name} file.")
+        format_name = None
+    if format_name is None and head and _looks_like_text(head):
+        return "text"
+    return format_name
+
+def iter_loaded(file_path: str) -> Iterator[Document]:
+    """Yield the pages/sections of a file with the loader of its detected format."""
+    format_name = detect_format(file_path)
+    log.info(f"[*] Loading document: {file_path} (format: {format_name})")
+    if format_name is None:
+        log.warning(f"[!] Unsupported file type: {mimetypes.guess_type(file_path)[0]}. Skipping.")
+        return
+    yield from LOADERS[format_name](file_path)
@@ -0,0 +1,437 @@
+import os
+import json
+import uuid
+import threading
+from contextlib import contextmanager
+from typing import Any, Iterable, List, Optional, Tuple
+import numpy as np
+from langchain.schema import Document
+from langchain_core.vectorstores import VectorStore
+from .telemetry import get_logger
+
+try:
+    import fcntl
+except ImportError: # Windows: writers are only serialized within one process
+    fcntl = None
+
+log = get_logger(__name__)
+
+# --- Constants ---
+LOCAL_INDEX_DTYPE = os.getenv("LOCAL_INDEX_DTYPE", "float32")        # "float32" or "int8" (4x smaller on disk)
+LOCAL_INDEX_IVF_MIN_VECTORS = int(os.getenv("LOCAL_INDEX_IVF_MIN_VECTORS", "50000"))  # Below this, exact search only
+LOCAL_INDEX_NPROBE = int(os.getenv("LOCAL_INDEX_NPROBE", "8"))       # IVF lists scanned per query
+SEARCH_BLOCK_ROWS = 65536       # Rows scored per matrix product, bounds temporary memory
+IVF_KMEANS_ITERATIONS = 10
+IVF_REBUILD_TAIL_FRACTION = 0.2 # Rebuild IVF once this share of rows was added after the last build
+COMPACT_DEAD_FRACTION = 0.5     # Rewrite the files once this share of rows is deleted or overwritten
+TEXT_KEY = "text"
+
+# --- Local Vector Index ---
+class LocalVectorIndex:
+    """
+    Embedded, memory-mapped vector index with the subset of the Pinecone
+    `Index` API the app uses (upsert / query / delete / describe_index_stats).
+
+    Storage is append-only: vectors are appended to a raw matrix file that is
+    memory-mapped for search, and ids/metadata go to a JSON-lines log that is
+    replayed on load. Overwrites and deletes are tombstoned in the log and
+    reclaimed by `compact()`. Vectors are stored unit-normalized, so cosine
+    similarity is a dot product; with dtype "int8" each row is quantized with
+    its own scale.
+
+    Search is exact and vectorized in blocks. Once the index holds
+    LOCAL_INDEX_IVF_MIN_VECTORS rows, an IVF (k-means inverted file) is built
+    and queries only scan the `nprobe` closest lists plus rows added since.
+    """
+
+    def __init__(self, path: str, dimension: int, dtype: str = LOCAL_INDEX_DTYPE):
+        if dtype not in ("float32", "int8"):
+            raise ValueError(f"Unsupported local index dtype: {dtype}")
+        self.path = path
+        self.dimension = dimension
+        self.dtype = np.dtype(dtype)
+        self.vectors_path = os.path.join(path, f"vectors.{dtype}")
+        self.scales_path = os.path.join(path, "scales.float32")
+        self.log_path = os.path.join(path, "records.jsonl")
+        self._lock = threading.RLock()
+        os.makedirs(path, exist_ok=True)
+        self._load()
+
+    # --- Storage ---
+    def _reset_state(self):
+        self._rows = 0
+        self._ids = []
+        self._metadata = []
+        self._alive = np.zeros(0, dtype=bool)
+        self._id_to_row = {}
+        self._matrix_cache = None
+        self._scales_cache = None
+        self._ivf = None
+
+    def _load(self):
+        self._reset_state()
+        self._log_inode = None
+        self._log_offset = 0
+        self._sync()
+
+    def _sync(self):
+        """
+        Replay log records written since the last call, including ones from
+        other worker processes. A replaced or truncated log (compaction,
+        delete-all) triggers a full reload.
+        """
+        try:
+            stat = os.stat(self.log_path)
+        except FileNotFoundError:
+            if self._rows:
+                self._reset_state()
+            self._log_inode, self._log_offset = None, 0
+            return
+        if self._log_inode is not None and (stat.st_ino != self._log_inode or stat.st_size < self._log_offset):
+            self._reset_state()
+            self._log_offset = 0
+        self._log_inode = stat.st_ino
+        if stat.st_size == self._log_offset:
+            return
+
+        with open(self.log_path, "rb") as f:
+            f.seek(self._log_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break # Partially written record; picked up on the next sync
+                self._log_offset += len(line)
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record["op"] == "add":
+                    self._apply_add(record["id"], record.get("metadata") or {})
+                else:
+                    self._apply_delete(record["id"])
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        """
+        Hold the thread lock and, where flock exists, a shared (readers) or
+        exclusive (writers, compaction) lock on the index directory, then
+        catch up with the log. Readers never see files mid-compaction.
+        """
+        with self._lock:
+            if fcntl is None:
+                self._sync()
+                yield
+                return
+            with open(os.path.join(self.path, "index.lock"), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                try:
+                    self._sync()
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _log_line(op: str, vector_id: str, metadata: dict = None) -> bytes:
+        record = {"op": op, "id": vector_id}
+        if metadata is not None:
+            record["metadata"] = metadata
+        return (json.dumps(record) + "\n").encode("utf-8")
+
+    def _apply_add(self, vector_id: str, metadata: dict) -> int:
+        row = self._rows
+        if row >= len(self._alive):
+            self._alive = np.concatenate([self._alive, np.zeros(max(1024, len(self._alive)), dtype=bool)])
+        old = self._id_to_row.get(vector_id)
+        if old is not None:
+            self._alive[old] = False
+        self._alive[row] = True
+        self._id_to_row[vector_id] = row
+        self._ids.append(vector_id)
+        self._metadata.append(metadata)
+        self._rows += 1
+        return row
+
+    def _apply_delete(self, vector_id: str):
+        row = self._id_to_row.pop(vector_id, None)
+        if row is not None:
+            self._alive[row] = False
+
+    def _matrix(self) -> np.ndarray:
+        """Memory-mapped (rows, dimension) view of the vector file."""
+        if self._matrix_cache is None or self._matrix_cache.shape[0] != self._rows:
+            if self._rows == 0:
+                self._matrix_cache = np.zeros((0, self.dimension), dtype=self.dtype)
+                self._scales_cache = np.zeros(0, dtype=np.float32)
+            else:
+                self._matrix_cache = np.memmap(
+                    self.vectors_path, dtype=self.dtype, mode="r", shape=(self._rows, self.dimension)
+                )
+                if self.dtype == np.int8:
+                    self._scales_cache = np.memmap(self.scales_path, dtype=np.float32, mode="r", shape=(self._rows,))
+        return self._matrix_cache
+
+    def _append_rows(self, path: str, data: np.ndarray, row_bytes: int):
+        # Write at the logical end so bytes left by an interrupted write are overwritten
+        mode = "r+b" if os.path.exists(path) else "wb"
+        with open(path, mode) as f:
+            f.seek(self._rows * row_bytes)
+            f.write(np.ascontiguousarray(data).tobytes())
+            f.truncate()
+
+    def _encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        unit = vectors / np.where(norms == 0, 1.0, norms)
+        if self.dtype == np.int8:
+            scales = np.abs(unit).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            return np.round(unit / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+        return unit.astype(np.float32), None
+
+    # --- Pinecone-compatible API ---
+    def upsert(self, vectors: Iterable, **kwargs) -> dict:
+        """Insert or overwrite vectors given as dicts ({id, values, metadata}) or tuples."""
+        records = []
+        for v in vectors:
+            if isinstance(v, dict):
+                records.append((str(v["id"]), v["values"], v.get("metadata") or {}))
+            else:
+                records.append((str(v[0]), v[1], v[2] if len(v) > 2 else {}))
+        if not records:
+            return {"upserted_count": 0}
+
+        values = np.asarray([r[1] for r in records], dtype=np.float32)
+        if values.shape[1] != self.dimension:
+            raise ValueError(f"Vector dimension {values.shape[1]} does not match index dimension {self.dimension}")
+        encoded, scales = self._encode(values)
+
+        with self._file_lock(exclusive=True):
+            self._append_rows(self.vectors_path, encoded, self.dimension * self.dtype.itemsize)
+            if scales is not None:
+                self._append_rows(self.scales_path, scales, 4)
+            with open(self.log_path, "ab") as f:
+                for vector_id, _, metadata in records:
+                    f.write(self._log_line("add", vector_id, metadata))
+                    self._apply_add(vector_id, metadata)
+                self._log_offset = f.tell()
+            self._maybe_compact()
+        return {"upserted_count": len(records)}
+
+    def delete(self, ids: List[str] = None, delete_all: bool = False, **kwargs):
+        """Delete vectors by ID, or everything with `delete_all=True`."""
+        with self._file_lock(exclusive=True):
+            if delete_all:
+                self._matrix_cache = self._scales_cache = None
+                for path in (self.log_path, self.vectors_path, self.scales_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+                self._load()
+                return {}
+            with open(self.log_path, "ab") as f:
+                for vector_id in ids or []:
+                    if vector_id in self._id_to_row:
+                        f.write(self._log_line("del", vector_id))
+                        self._apply_delete(vector_id)
+                self._log_offset = f.tell()
+            self._maybe_compact()
+        return {}
+
+    def fetch(self, ids: List[str], **kwargs) -> dict:
+        """Return {"vectors": {id: {id, values, metadata}}} for the IDs that exist."""
+        with self._file_lock(exclusive=False):
+            vectors = {}
+            for vector_id in ids:
+                row = self._id_to_row.get(vector_id)
+                if row is not None:
+                    vectors[vector_id] = {
+                        "id": vector_id,
+                        "values": self._row_values(row).tolist(),
+                        "metadata": dict(self._metadata[row]),
+                    }
+        return {"vectors": vectors}
+
+    def describe_index_stats(self, **kwargs) -> dict:
+        with self._file_lock(exclusive=False):
+            return {"dimension": self.dimension, "total_vector_count": len(self._id_to_row)}
+
+    def query(self, vector, top_k: int = 10, include_values: bool = False,
+              include_metadata: bool = False, nprobe: int = None, **kwargs) -> dict:
+        """Return the `top_k` most cosine-similar vectors as Pinecone-style matches."""
+        with self._file_lock(exclusive=False):
+            query_vec = np.asarray(vector, dtype=np.float32)
+            query_vec = query_vec / (np.linalg.norm(query_vec) or 1.0)
+            rows, scores = self._search(query_vec, top_k, nprobe or LOCAL_INDEX_NPROBE)
+
+            matches = []
+            for row, score in zip(rows, scores):
+                match = {"id": self._ids[row], "score": float(score)}
+                if include_values:
+                    match["values"] = self._row_values(row).tolist()
+                if include_metadata:
+                    match["metadata"] = dict(self._metadata[row])
+                matches.append(match)
+        return {"matches": matches}
+
+    # --- Search ---
+    def _row_values(self, rows) -> np.ndarray:
+        matrix = self._matrix()
+        values = np.asarray(matrix[rows], dtype=np.float32)
+        if self.dtype == np.int8:
+            scales = self._scales_cache[rows]
+            values = values * (scales[..., None] if np.ndim(scales) else scales)
+        return values
+
+    def _score_rows(self, query_vec: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        scores = np.empty(len(rows), dtype=np.float32)
+        for start in range(0, len(rows), SEARCH_BLOCK_ROWS):
+            block = rows[start:start + SEARCH_BLOCK_ROWS]
+            scores[start:start + len(block)] = self._row_values(block) @ query_vec
+        return scores
+
+    def _search(self, query_vec: np.ndarray, top_k: int, nprobe: int):
+        if not self._id_to_row:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        if len(self._id_to_row) >= LOCAL_INDEX_IVF_MIN_VECTORS:
+            candidates = self._ivf_candidates(query_vec, nprobe)
+        else:
+            candidates = np.flatnonzero(self._alive[:self._rows])
+
+        # Every probed IVF list can be empty or fully deleted
+        if not len(candidates) or top_k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        scores = self._score_rows(query_vec, candidates)
+        k = min(top_k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return candidates[top], scores[top]
+
+    # --- IVF Acceleration ---
+    def _build_ivf(self):
+        live = np.flatnonzero(self._alive[:self._rows])
+        nlist = max(1, int(np.sqrt(len(live))))
+        rng = np.random.default_rng(0)
+        sample = rng.choice(live, size=min(len(live), nlist * 40), replace=False)
+        data = self._row_values(np.sort(sample))
+        centroids = data[rng.choice(len(data), size=nlist, replace=False)]
+
+        for _ in range(IVF_KMEANS_ITERATIONS):
+            assign = np.argmax(data @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = data[assign == c]
+                if len(members):
+                    centroid = members.mean(axis=0)
+                    centroids[c] = centroid / (np.linalg.norm(centroid) or 1.0)
+
+        assign = np.empty(len(live), dtype=np.int32)
+        for start in range(0, len(live), SEARCH_BLOCK_ROWS):
+            block = live[start:start + SEARCH_BLOCK_ROWS]
+            assign[start:start + len(block)] = np.argmax(self._row_values(block) @ centroids.T, axis=1)
+
+        order = np.argsort(assign, kind="stable")
+        offsets = np.searchsorted(assign[order], np.arange(nlist + 1))
+        self._ivf = {"centroids": centroids, "rows": live[order], "offsets": offsets, "built_rows": self._rows}
+        log.info(f"[+] Built IVF over {len(live)} vectors with {nlist} lists.")
+
+    def _ivf_candidates(self, query_vec: np.ndarray, nprobe: int) -> np.ndarray:
+        if self._ivf is None or self._rows - self._ivf["built_rows"] > IVF_REBUILD_TAIL_FRACTION * self._ivf["built_rows"]:
+            self._build_ivf()
+        ivf = self._ivf
+        probes = np.argsort(-(ivf["centroids"] @ query_vec))[:nprobe]
+        lists = [ivf["rows"][ivf["offsets"][c]:ivf["offsets"][c + 1]] for c in probes]
+        # Rows added after the build are not in any list yet; scan them exactly
+        tail = np.arange(ivf["built_rows"], self._rows)
+        candidates = np.concatenate(lists + [tail])
+        return candidates[self._alive[candidates]]
+
+    # --- Maintenance ---
+    def _maybe_compact(self):
+        dead = self._rows - len(self._id_to_row)
+        if self._rows > 1000 and dead > COMPACT_DEAD_FRACTION * self._rows:
+            self._compact()
+
+    def compact(self):
+        """Rewrite the files with live rows only, dropping tombstoned vectors."""
+        with self._file_lock(exclusive=True):
+            self._compact()
+
+    def _compact(self):
+        live = np.flatnonzero(self._alive[:self._rows])
+        ids = [self._ids[r] for r in live]
+        metadata = [self._metadata[r] for r in live]
+        matrix = np.array(self._matrix()[live])
+        scales = np.array(self._scales_cache[live]) if self.dtype == np.int8 else None
+        self._matrix_cache = self._scales_cache = None
+
+        tmp_vectors = self.vectors_path + ".tmp"
+        matrix.tofile(tmp_vectors)
+        os.replace(tmp_vectors, self.vectors_path)
+        if scales is not None:
+            scales.tofile(self.scales_path + ".tmp")
+            os.replace(self.scales_path + ".tmp", self.scales_path)
+        with open(self.log_path + ".tmp", "wb") as f:
+            for vector_id, meta in zip(ids, metadata):
+                f.write(self._log_line("add", vector_id, meta))
+        os.replace(self.log_path + ".tmp", self.log_path)
+
+        self._load()
+        log.info(f"[+] Compacted local index to {len(ids)} vectors.")
+
+# --- LangChain Vector Store ---
+class LocalVectorStore(VectorStore):
+    """LangChain vector store over a LocalVectorIndex (offline alternative to PineconeVectorStore)."""
+
+    def __init__(self, index: LocalVectorIndex, embedding):
+        self.index = index
+        self._embedding = embedding
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        return self._upsert(texts, self._embedding.embed_documents(texts), metadatas, ids)
+
+    def _upsert(self, texts: List[str], vectors: List[List[float]], metadatas: Optional[List[dict]] = None,
+                ids: Optional[List[str]] = None) -> List[str]:
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        self.index.upsert(vectors=[
+            {"id": i, "values": v, "metadata": {**m, TEXT_KEY: t}}
+            for i, v, m, t in zip(ids, vectors, metadatas, texts)
+        ])
+        return ids
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        results = self.index.query(self._embedding.embed_query(query), top_k=k, include_metadata=True)
+        docs = []
+        for match in results["matches"]:
+            metadata = match["metadata"]
+            docs.append((Document(page_content=metadata.pop(TEXT_KEY, ""), metadata=metadata), match["score"]))
+        return docs
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        self.index.delete(ids=ids, delete_all=kwargs.get("delete_all", False))
+        return True
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding, metadatas: Optional[List[dict]] = None,
+                   ids: Optional[List[str]] = None, path: str = None, dimension: int = None,
+                   dtype: str = LOCAL_INDEX_DTYPE, **kwargs: Any) -> "LocalVectorStore":
+        """
+        Embed `texts` into the index directory `path` (created if missing) and
+        return the store over it. The dimension defaults to the embeddings'.
+        """
+        if not path:
+            raise ValueError("LocalVectorStore.from_texts needs the index directory as `path`.")
+        texts = list(texts)
+        vectors = embedding.embed_documents(texts) if texts else []
+        if not dimension and not vectors:
+            raise ValueError("LocalVectorStore.from_texts needs `dimension` when there are no texts.")
+        store = cls(LocalVectorIndex(path, dimension or len(vectors[0]), dtype), embedding)
+        if texts:
+            store._upsert(texts, vectors, metadatas, ids)
+        return store
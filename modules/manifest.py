@@ -0,0 +1,97 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import List, Optional
+
+# --- Constants ---
+# Local record of which chunk IDs each uploaded file produced, so re-uploads
+# only embed what changed.
+MANIFEST_PATH = os.getenv("INGEST_MANIFEST_PATH", "ingest_manifest.sqlite3")
+HASH_READ_SIZE = 1024 * 1024
+
+_manifest_lock = threading.Lock()
+
+# --- Content Hashing ---
+def file_sha256(file_path: str) -> str:
+    """Hash a file's bytes without reading it into memory at once."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_READ_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def compute_chunk_id(source_name: str, text: str) -> str:
+    """
+    Deterministic vector ID for a chunk: the same text from the same file
+    always maps to the same ID, so re-upserting it overwrites instead of duplicating.
+    """
+    return hashlib.sha256(f"{source_name}\0{text}".encode("utf-8")).hexdigest()
+
+# --- Manifest Storage ---
+def _connect(manifest_path: str = None) -> sqlite3.Connection:
+    conn = sqlite3.connect(manifest_path or MANIFEST_PATH)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS files ("
+        " name TEXT PRIMARY KEY, file_hash TEXT NOT NULL, updated_at REAL NOT NULL)"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS chunks ("
+        " file_name TEXT NOT NULL, chunk_id TEXT NOT NULL,"
+        " PRIMARY KEY (file_name, chunk_id))"
+    )
+    return conn
+
+def get_file_record(name: str, manifest_path: str = None) -> Optional[dict]:
+    """Return {"file_hash", "chunk_ids"} for a previously ingested file, or None."""
+    with _manifest_lock:
+        conn = _connect(manifest_path)
+        try:
+            row = conn.execute("SELECT file_hash FROM files WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                return None
+            chunk_ids = {r[0] for r in conn.execute(
+                "SELECT chunk_id FROM chunks WHERE file_name = ?", (name,)
+            )}
+            return {"file_hash": row[0], "chunk_ids": chunk_ids}
+        finally:
+            conn.close()
+
+def save_file_record(name: str, file_hash: str, chunk_ids: List[str], manifest_path: str = None):
+    """Replace the manifest entry for a file with its current hash and chunk IDs."""
+    with _manifest_lock:
+        conn = _connect(manifest_path)
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO files (name, file_hash, updated_at) VALUES (?, ?, ?)",
+                    (name, file_hash, time.time())
+                )
+                conn.execute("DELETE FROM chunks WHERE file_name = ?", (name,))
+                conn.executemany(
+                    "INSERT OR IGNORE INTO chunks (file_name, chunk_id) VALUES (?, ?)",
+                    [(name, chunk_id) for chunk_id in chunk_ids]
+                )
+        finally:
+            conn.close()
+
+def list_chunk_ids(manifest_path: str = None) -> List[str]:
+    """Every chunk ID of every ingested file."""
+    with _manifest_lock:
+        conn = _connect(manifest_path)
+        try:
+            return [r[0] for r in conn.execute("SELECT DISTINCT chunk_id FROM chunks ORDER BY chunk_id")]
+        finally:
+            conn.close()
+
+def clear_manifest(manifest_path: str = None):
+    """Forget every ingested file (used when the vector store is cleared)."""
+    with _manifest_lock:
+        conn = _connect(manifest_path)
+        try:
+            with conn:
+                conn.execute("DELETE FROM chunks")
+                conn.execute("DELETE FROM files")
+        finally:
+            conn.close()
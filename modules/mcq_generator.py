@@ -1,51 +1,67 @@
 import json
+import time
 from langchain.chains import LLMChain
 
 # Import from our modules
-from .schemas import mcq_prompt_template, mcq_parser, mcq_schema, safe_json_parse
+from .schemas import mcq_prompt_template, mcq_schema, iter_json_items, salvage_json_items, is_valid_mcq
 # --- MODIFIED ---
 # Import shared utilities
-from .utils import calculate_context_similarity, search_with_tavily
+from .utils import resolve_context, stream_llm_text, record_llm_usage
+from .fanout import generate_sharded, extract_items, fill_missing, renumber, FANOUT_ENABLED, FANOUT_SHARD_SIZE
+from .generation_cache import cached_generate, get_generation_cache, generation_cache_key
+from .context_packer import pack_context
+from .llm_provider import route_llm
+from .telemetry import get_logger, stage
 # --- END MODIFIED ---
 
+log = get_logger(__name__)
+
+def _generate_mcq_batch(llm, context: str, num_questions: int):
+    """Run one MCQ generation call and parse its output."""
+    # Build chain on the model tier picked for this call
+    model, tier = route_llm(llm, "mcq", context, num_questions)
+    llm_chain = LLMChain(llm=model, prompt=mcq_prompt_template)
+
+    log.info(f"[*] Generating {num_questions} MCQs...")
+    inputs = {
+        "context": context,
+        "num_questions": num_questions,
+        "schema": json.dumps(mcq_schema)
+    }
+    started = time.perf_counter()
+    with stage("llm"):
+        raw = llm_chain.run(inputs)
+    record_llm_usage(mcq_prompt_template.format(**inputs), raw, tier, time.perf_counter() - started)
+
+    return parse_mcq_output(raw)
+
+def parse_mcq_output(raw: str) -> list:
+    """Valid MCQs in the LLM's output; malformed ones are dropped (see schemas.salvage_json_items)."""
+    return salvage_json_items(raw, is_valid_mcq)
+
 # --- MODIFIED: Function signature and logic updated ---
 def generate_mcqs_from_retrieved_context(retriever, llm, query: str, embeddings, num_questions=None,
-                                        similarity_threshold: float = 0.5, use_tavily: bool = False):
+                                        similarity_threshold: float = 0.5, use_tavily: bool = False,
+                                        gating_strategy: str = None, fan_out: bool = FANOUT_ENABLED):
     """
     Generate MCQs from retrieved context based on a query.
     Optionally uses Tavily if context similarity is low.
+    `gating_strategy` picks how similarity is scored (see utils.GATING_STRATEGIES).
+    With `fan_out`, large requests are generated as parallel shards (see modules/fanout.py).
     """
-    # Get relevant docs based on the user's query
-    docs = retriever.get_relevant_documents(query)
-    context = "\n\n".join([d.page_content for d in docs])
-    
-    similarity_score = calculate_context_similarity(query, context, embeddings)
-    print(f"\n[*] Context similarity score: {similarity_score:.2%}")
-
-    if not context or similarity_score < similarity_threshold:
-        if not context:
-            print("[!] No context found for the query.")
-        else:
-            print(f"[!] Similarity ({similarity_score:.2%}) is below threshold ({similarity_threshold:.2%})")
-        
-        if use_tavily:
-            print("[*] Tavily search is enabled. Searching web...")
-            tavily_content = search_with_tavily(f"Information regarding: {query}")
-            
-            if tavily_content:
-                print("[+] Using Tavily search results as context")
-                context = tavily_content
-                similarity_score = calculate_context_similarity(query, context, embeddings)
-                print(f"[*] New context similarity score: {similarity_score:.2%}")
-            else:
-                print("[!] No results from Tavily, using original (or empty) context")
-        else:
-            print("[*] Tavily search is disabled. Proceeding with original context.")
-    else:
-        print(f"[+] Context similarity is acceptable ({similarity_score:.2%})")
+    # Get relevant docs based on the user's query (falling back to Tavily if needed)
+    docs, context, similarity_score = resolve_context(
+        retriever, query, embeddings, similarity_threshold, use_tavily, gating_strategy
+    )
 
     if not context:
-        print("[!] No context found. Cannot generate MCQs.")
+        log.warning("[!] No context found. Cannot generate MCQs.")
+        return [], ""
+
+    # Fit the context into the prompt token budget
+    context, _ = pack_context(query, docs, context)
+    if not context:
+        log.warning("[!] No context fits the token budget. Cannot generate MCQs.")
         return [], ""
 
     # Decide number of MCQs if not specified
@@ -53,29 +69,77 @@ def generate_mcqs_from_retrieved_context(retriever, llm, query: str, embeddings,
         approx_chars = len(context)
         num_questions = min(12, max(3, approx_chars // 300))
 
-    # Build chain
-    llm_chain = LLMChain(llm=llm, prompt=mcq_prompt_template)
+    def generate():
+        if fan_out and num_questions > FANOUT_SHARD_SIZE:
+            return generate_sharded(
+                lambda ctx, n: _generate_mcq_batch(llm, ctx, n),
+                context, num_questions, is_valid_mcq, id_prefix="Q", list_key="mcq_list"
+            )
+        # Items the parser had to drop are regenerated on their own
+        return renumber(fill_missing(
+            lambda ctx, n: _generate_mcq_batch(llm, ctx, n),
+            context, num_questions, is_valid_mcq, list_key="mcq_list"
+        ), "Q")
 
-    print(f"\n[*] Generating {num_questions} MCQs...")
-    raw = llm_chain.run({
-        "context": context,
-        "num_questions": num_questions,
-        "schema": json.dumps(mcq_schema)
-    })
-
-    # Parse structured output
-    try:
-        parsed = mcq_parser.parse(raw)
-    except Exception as e:
-        print(f"[!] Structured parser failed: {e}. Trying fallback.")
-        try:
-            parsed_obj = safe_json_parse(raw, "object")
-            if "mcq_list" in parsed_obj:
-                 parsed = parsed_obj["mcq_list"]
-            else:
-                 parsed = safe_json_parse(raw, "array")
-        except Exception:
-             parsed = safe_json_parse(raw, "array")
+    # Repeated requests over the same context are served from the generation cache
+    parsed = cached_generate("mcq", num_questions, query, embeddings, docs, context, generate)
 
     return parsed, context
-# --- END MODIFIED ---
\ No newline at end of file
+# --- END MODIFIED ---
+
+def stream_mcqs_from_retrieved_context(retriever, llm, query: str, embeddings, num_questions=None,
+                                       similarity_threshold: float = 0.5, use_tavily: bool = False,
+                                       gating_strategy: str = None):
+    """
+    Streaming variant of `generate_mcqs_from_retrieved_context`.
+    Yields each MCQ as soon as the LLM has finished writing it and it is valid.
+    """
+    docs, context, similarity_score = resolve_context(
+        retriever, query, embeddings, similarity_threshold, use_tavily, gating_strategy
+    )
+
+    if not context:
+        log.warning("[!] No context found. Cannot generate MCQs.")
+        return
+
+    context, _ = pack_context(query, docs, context)
+    if not context:
+        log.warning("[!] No context fits the token budget. Cannot generate MCQs.")
+        return
+
+    if num_questions is None:
+        num_questions = min(12, max(3, len(context) // 300))
+
+    prompt = mcq_prompt_template.format(
+        context=context,
+        num_questions=num_questions,
+        schema=json.dumps(mcq_schema)
+    )
+
+    cache = get_generation_cache()
+    cache_key = cache and generation_cache_key("mcq", num_questions, query, embeddings, docs, context)
+    cached = cache and cache.get(cache_key)
+    if cached:
+        yield from extract_items(cached, "mcq_list")
+        return
+
+    log.info(f"[*] Streaming {num_questions} MCQs...")
+    items = []
+    model, tier = route_llm(llm, "mcq", context, num_questions)
+    for item in iter_json_items(stream_llm_text(model, prompt, tier), is_valid_mcq):
+        # Same IDs as the non-streamed output, whatever the LLM wrote
+        items.append(renumber([item], "Q", len(items) + 1)[0])
+        yield item
+
+    if len(items) < num_questions:
+        # Regenerate only the items the stream is missing (malformed or invalid)
+        log.warning(f"[!] Stream produced {len(items)}/{num_questions} valid MCQs. Requesting the rest...")
+        streamed = len(items)
+        items = fill_missing(
+            lambda ctx, n: _generate_mcq_batch(llm, ctx, n),
+            context, num_questions, is_valid_mcq, list_key="mcq_list", items=items
+        )
+        yield from renumber(items[streamed:], "Q", streamed + 1)
+
+    if cache:
+        cache.set(cache_key, items, context)
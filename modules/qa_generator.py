@@ -1,60 +1,128 @@
 import os
 import json
+import time
 from langchain.chains import LLMChain
 
 # Import from our modules
-from .schemas import qa_prompt_template, qa_parser, qa_schema, safe_json_parse
+from .schemas import qa_prompt_template, qa_schema, iter_json_items, salvage_json_items, is_valid_qa
 # --- MODIFIED ---
 # Import shared utilities
-from .utils import calculate_context_similarity, search_with_tavily
+from .utils import resolve_context, stream_llm_text, record_llm_usage
+from .fanout import generate_sharded, extract_items, fill_missing, renumber, FANOUT_ENABLED, FANOUT_SHARD_SIZE
+from .generation_cache import cached_generate, get_generation_cache, generation_cache_key
+from .context_packer import pack_context
+from .llm_provider import route_llm
+from .telemetry import get_logger, stage
 # --- END MODIFIED ---
 
+log = get_logger(__name__)
+
+def _generate_qa_batch(llm, context: str, num_questions: int):
+    """Run one Q&A generation call and parse its output."""
+    # Build chain on the model tier picked for this call
+    model, tier = route_llm(llm, "qa", context, num_questions)
+    llm_chain = LLMChain(llm=model, prompt=qa_prompt_template)
+
+    log.info(f"[*] Generating {num_questions} Q&A pairs...")
+    inputs = {
+        "context": context,
+        "num_questions": num_questions,
+        "schema": json.dumps(qa_schema)
+    }
+    started = time.perf_counter()
+    with stage("llm"):
+        raw = llm_chain.run(inputs)
+    record_llm_usage(qa_prompt_template.format(**inputs), raw, tier, time.perf_counter() - started)
+
+    return parse_qa_output(raw)
+
+def parse_qa_output(raw: str) -> list:
+    """Valid Q&A pairs in the LLM's output; malformed ones are dropped (see schemas.salvage_json_items)."""
+    return salvage_json_items(raw, is_valid_qa)
+
 def generate_qa_from_context(retriever, llm, query: str, embeddings, num_questions: int, 
-                             similarity_threshold: float = 0.5, use_tavily: bool = False):
+                             similarity_threshold: float = 0.5, use_tavily: bool = False,
+                             gating_strategy: str = None, fan_out: bool = FANOUT_ENABLED):
     """
     Generate question-answer pairs from retrieved context.
     Checks similarity and optionally uses Tavily search.
+    `gating_strategy` picks how similarity is scored (see utils.GATING_STRATEGIES).
+    With `fan_out`, large requests are generated as parallel shards (see modules/fanout.py).
     """
-    docs = retriever.get_relevant_documents(query)
-    context = "\n\n".join([d.page_content for d in docs])
-    
-    similarity_score = calculate_context_similarity(query, context, embeddings)
-    print(f"\n[*] Context similarity score: {similarity_score:.2%}")
-    
-    if similarity_score < similarity_threshold:
-        print(f"[!] Similarity ({similarity_score:.2%}) is below threshold ({similarity_threshold:.2%})")
-        
-        if use_tavily:
-            print("[*] Tavily search is enabled. Searching web...")
-            tavily_content = search_with_tavily(f"Information regarding: {query}")
-            
-            if tavily_content:
-                print("[+] Using Tavily search results as context")
-                context = tavily_content
-                similarity_score = calculate_context_similarity(query, context, embeddings)
-                print(f"[*] New context similarity score: {similarity_score:.2%}")
-            else:
-                print("[!] No results from Tavily, using original context")
-        else:
-            print("[*] Tavily search is disabled. Proceeding with original context.")
-    else:
-        print(f"[+] Context similarity is acceptable ({similarity_score:.2%})")
-
-    # Build chain
-    llm_chain = LLMChain(llm=llm, prompt=qa_prompt_template)
-
-    print(f"\n[*] Generating {num_questions} Q&A pairs...")
-    raw = llm_chain.run({
-        "context": context,
-        "num_questions": num_questions,
-        "schema": json.dumps(qa_schema)
-    })
+    docs, context, similarity_score = resolve_context(
+        retriever, query, embeddings, similarity_threshold, use_tavily, gating_strategy
+    )
+
+    # Fit the context into the prompt token budget
+    if context:
+        context, _ = pack_context(query, docs, context)
+        if not context:
+            log.warning("[!] No context fits the token budget. Cannot generate Q&A pairs.")
+            return [], "", similarity_score
+
+    def generate():
+        if fan_out and num_questions > FANOUT_SHARD_SIZE:
+            return generate_sharded(
+                lambda ctx, n: _generate_qa_batch(llm, ctx, n),
+                context, num_questions, is_valid_qa, id_prefix="QA", list_key="qa_list"
+            )
+        # Items the parser had to drop are regenerated on their own
+        return renumber(fill_missing(
+            lambda ctx, n: _generate_qa_batch(llm, ctx, n),
+            context, num_questions, is_valid_qa, list_key="qa_list"
+        ), "QA")
+
+    # Repeated requests over the same context are served from the generation cache
+    parsed = cached_generate("qa", num_questions, query, embeddings, docs, context, generate)
+
+    return parsed, context, similarity_score
+
+def stream_qa_from_context(retriever, llm, query: str, embeddings, num_questions: int,
+                           similarity_threshold: float = 0.5, use_tavily: bool = False,
+                           gating_strategy: str = None):
+    """
+    Streaming variant of `generate_qa_from_context`.
+    Yields each Q&A pair as soon as the LLM has finished writing it.
+    """
+    docs, context, similarity_score = resolve_context(
+        retriever, query, embeddings, similarity_threshold, use_tavily, gating_strategy
+    )
+    if context:
+        context, _ = pack_context(query, docs, context)
+        if not context:
+            log.warning("[!] No context fits the token budget. Cannot generate Q&A pairs.")
+            return
+
+    prompt = qa_prompt_template.format(
+        context=context,
+        num_questions=num_questions,
+        schema=json.dumps(qa_schema)
+    )
+
+    cache = get_generation_cache()
+    cache_key = cache and context and generation_cache_key("qa", num_questions, query, embeddings, docs, context)
+    cached = cache_key and cache.get(cache_key)
+    if cached:
+        yield from extract_items(cached, "qa_list")
+        return
+
+    log.info(f"[*] Streaming {num_questions} Q&A pairs...")
+    items = []
+    model, tier = route_llm(llm, "qa", context, num_questions)
+    for item in iter_json_items(stream_llm_text(model, prompt, tier), is_valid_qa):
+        # Same IDs as the non-streamed output, whatever the LLM wrote
+        items.append(renumber([item], "QA", len(items) + 1)[0])
+        yield item
 
-    # Parse JSON output
-    try:
-        parsed = qa_parser.parse(raw)
-    except Exception as e:
-        print(f"[!] Structured parser failed: {e}. Trying fallback.")
-        parsed = safe_json_parse(raw, "array")
+    if len(items) < num_questions:
+        # Regenerate only the items the stream is missing (malformed or invalid)
+        log.warning(f"[!] Stream produced {len(items)}/{num_questions} valid Q&A pairs. Requesting the rest...")
+        streamed = len(items)
+        items = fill_missing(
+            lambda ctx, n: _generate_qa_batch(llm, ctx, n),
+            context, num_questions, is_valid_qa, list_key="qa_list", items=items
+        )
+        yield from renumber(items[streamed:], "QA", streamed + 1)
 
-    return parsed, context, similarity_score
\ No newline at end of file
+    if cache_key:
+        cache.set(cache_key, items, context)
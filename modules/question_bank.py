@@ -0,0 +1,192 @@
+import os
+import json
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Iterable, List, Optional
+import numpy as np
+
+from .db_manager import get_embeddings, get_vector_index, fetch_vectors, EMBEDDING_DIMENSION, PINECONE_TEXT_KEY
+from .local_index import LocalVectorIndex
+from .manifest import list_chunk_ids
+from .llm_provider import get_mcq_llm, get_qa_llm
+from .mcq_generator import _generate_mcq_batch
+from .qa_generator import _generate_qa_batch
+from .schemas import is_valid_mcq, is_valid_qa
+from .fanout import fill_missing, renumber
+from .utils import get_or_create_client, mmr_select
+from .telemetry import get_logger, stage, record_cache
+
+log = get_logger(__name__)
+
+# --- Constants ---
+# The question bank holds questions generated offline, per stored chunk, in a
+# local vector index per type (embedded question text). /generate serves
+# matching banked questions and only generates live on a miss.
+QUESTION_BANK_ENABLED = os.getenv("QUESTION_BANK_ENABLED", "false").lower() in ("1", "true", "yes")
+QUESTION_BANK_DIR = os.getenv("QUESTION_BANK_DIR", "question_bank")
+QUESTION_BANK_PER_CHUNK = int(os.getenv("QUESTION_BANK_PER_CHUNK", "3"))       # Questions of each type per chunk
+QUESTION_BANK_WORKERS = int(os.getenv("QUESTION_BANK_WORKERS", "4"))           # Concurrent LLM calls while building
+QUESTION_BANK_BATCH_SIZE = 32                                                  # Chunks fetched and stored together
+# A query is served from the bank when at least the requested number of banked
+# questions has this cosine similarity to it; otherwise questions are generated live.
+QUESTION_BANK_MIN_SIMILARITY = float(os.getenv("QUESTION_BANK_MIN_SIMILARITY", "0.4"))
+QUESTION_BANK_FETCH_K = int(os.getenv("QUESTION_BANK_FETCH_K", "50"))          # Candidates re-ranked with MMR
+QUESTION_BANK_LAMBDA = float(os.getenv("QUESTION_BANK_LAMBDA", "0.5"))
+
+# Per type: one-call batch generator, LLM, item validator, ID prefix, list key
+BANK_TYPES = {
+    "mcq": (_generate_mcq_batch, get_mcq_llm, is_valid_mcq, "Q", "mcq_list"),
+    "qa": (_generate_qa_batch, get_qa_llm, is_valid_qa, "QA", "qa_list"),
+}
+
+# --- Storage ---
+def get_bank(gen_type: str) -> LocalVectorIndex:
+    """Return the process-wide bank index of one question type."""
+    return get_or_create_client(
+        f"question_bank_{gen_type}",
+        lambda: LocalVectorIndex(os.path.join(QUESTION_BANK_DIR, gen_type), EMBEDDING_DIMENSION)
+    )
+
+def _question_id(chunk_id: str, n: int) -> str:
+    return f"{chunk_id}:{n}"
+
+def question_text(item: dict) -> str:
+    """Text embedded for a banked question: the question and its answer."""
+    if "options" in item:
+        answer = item["options"][item["correct_index"] - 1]
+    else:
+        answer = item.get("answer", "")
+    return f"{item['question']}\n{answer}"
+
+def delete_banked_chunks(chunk_ids: Iterable[str]):
+    """Drop the questions generated from chunks that no longer exist."""
+    if not os.path.isdir(QUESTION_BANK_DIR):
+        return
+    ids = [_question_id(c, n) for c in chunk_ids for n in range(1, QUESTION_BANK_PER_CHUNK + 1)]
+    for gen_type in BANK_TYPES:
+        get_bank(gen_type).delete(ids=ids)
+
+def clear_question_bank():
+    if not os.path.isdir(QUESTION_BANK_DIR):
+        return
+    for gen_type in BANK_TYPES:
+        get_bank(gen_type).delete(delete_all=True)
+    log.info("[*] Question bank cleared.")
+
+def question_bank_stats() -> Optional[dict]:
+    if not QUESTION_BANK_ENABLED:
+        return None
+    return {t: get_bank(t).describe_index_stats()["total_vector_count"] for t in BANK_TYPES}
+
+# --- Building ---
+def _generate_for_chunk(gen_type: str, text: str, per_chunk: int) -> list:
+    generate_batch, get_llm, validator, _, list_key = BANK_TYPES[gen_type]
+    llm = get_llm()
+    return fill_missing(lambda ctx, n: generate_batch(llm, ctx, n), text, per_chunk, validator, list_key)
+
+def build_question_bank(chunk_ids: Iterable[str] = None, gen_types=("mcq", "qa"), per_chunk: int = None,
+                        progress_callback=None) -> dict:
+    """
+    Generate `per_chunk` questions of each type for every stored chunk that
+    is not in the bank yet (all ingested chunks by default), with up to
+    QUESTION_BANK_WORKERS LLM calls in flight, and store them with the
+    embeddings of their text.
+    `progress_callback(progress)` is called after each batch of chunks.
+    Returns a summary of questions stored and of chunks built, skipped (already
+    built for every type) and failed (for any type), with the same counts
+    per type under "types".
+    """
+    per_chunk = per_chunk or QUESTION_BANK_PER_CHUNK
+    chunk_ids = list(chunk_ids) if chunk_ids is not None else list_chunk_ids()
+    report = progress_callback or (lambda progress: None)
+    embeddings = get_embeddings()
+    index = get_vector_index()
+    summary = {"chunks": len(chunk_ids)}
+    per_type = {t: {"built": 0, "skipped": 0, "failed": 0, "questions": 0} for t in gen_types}
+    built_chunks, failed_chunks, skips = set(), set(), Counter()
+    started = time.perf_counter()
+    log.info(f"[*] Building the question bank for {len(chunk_ids)} chunks ({', '.join(gen_types)})...")
+
+    with ThreadPoolExecutor(max_workers=QUESTION_BANK_WORKERS) as pool:
+        for start in range(0, len(chunk_ids), QUESTION_BANK_BATCH_SIZE):
+            batch = chunk_ids[start:start + QUESTION_BANK_BATCH_SIZE]
+            stored = fetch_vectors(index, batch)
+            for gen_type in gen_types:
+                bank = get_bank(gen_type)
+                # A chunk is built once its first question is in the bank
+                built = fetch_vectors(bank, [_question_id(c, 1) for c in batch])
+                todo = [c for c in batch if _question_id(c, 1) not in built and c in stored]
+                skips.update(set(batch) - set(todo))
+                per_type[gen_type]["skipped"] += len(batch) - len(todo)
+                texts = [(stored[c]["metadata"] or {}).get(PINECONE_TEXT_KEY, "") for c in todo]
+                results = pool.map(partial(_generate_for_chunk, gen_type, per_chunk=per_chunk), texts)
+
+                records = []
+                for chunk_id, items in zip(todo, results):
+                    if not items:
+                        failed_chunks.add(chunk_id)
+                        per_type[gen_type]["failed"] += 1
+                        continue
+                    built_chunks.add(chunk_id)
+                    per_type[gen_type]["built"] += 1
+                    source = (stored[chunk_id]["metadata"] or {}).get("source", "")
+                    records.extend((chunk_id, n, source, item) for n, item in enumerate(items, 1))
+                if not records:
+                    continue
+
+                vectors = embeddings.embed_documents([question_text(item) for _, _, _, item in records])
+                bank.upsert(vectors=[
+                    {
+                        "id": _question_id(chunk_id, n),
+                        "values": values,
+                        "metadata": {"chunk_id": chunk_id, "source": source, "item": json.dumps(item)},
+                    }
+                    for (chunk_id, n, source, item), values in zip(records, vectors)
+                ])
+                per_type[gen_type]["questions"] += len(records)
+            report({"chunks_done": min(start + len(batch), len(chunk_ids)), "chunks_total": len(chunk_ids)})
+
+    summary.update({
+        "built": len(built_chunks - failed_chunks),
+        "skipped": sum(1 for count in skips.values() if count == len(gen_types)),
+        "failed": len(failed_chunks),
+        "questions": sum(t["questions"] for t in per_type.values()),
+        "types": per_type,
+    })
+    summary["seconds"] = round(time.perf_counter() - started, 2)
+    log.info(
+        f"[+] Question bank: {summary['questions']} questions from {summary['built']} chunks "
+        f"({summary['skipped']} already built, {summary['failed']} failed) in {summary['seconds']}s."
+    )
+    return summary
+
+# --- Serving ---
+def serve_from_bank(query: str, gen_type: str, num_questions: int, embeddings=None) -> Optional[List[dict]]:
+    """
+    Return `num_questions` diverse banked questions matching the query
+    (MMR over the closest QUESTION_BANK_FETCH_K), or None when fewer than
+    that many reach QUESTION_BANK_MIN_SIMILARITY.
+    """
+    bank = get_bank(gen_type)
+    with stage("question_bank"):
+        query_vector = np.asarray((embeddings or get_embeddings()).embed_query(query), dtype=np.float32)
+        matches = bank.query(
+            vector=query_vector.tolist(),
+            top_k=max(QUESTION_BANK_FETCH_K, num_questions),
+            include_values=True,
+            include_metadata=True
+        )["matches"]
+        matches = [m for m in matches if m["score"] >= QUESTION_BANK_MIN_SIMILARITY]
+        hit = len(matches) >= num_questions
+        record_cache("question_bank", hit)
+        if not hit:
+            log.info(f"[*] Question bank miss ({len(matches)}/{num_questions} matching questions). Generating live.")
+            return None
+        candidates = np.asarray([m["values"] for m in matches], dtype=np.float32)
+        selected = mmr_select(query_vector, candidates, k=num_questions, lambda_mult=QUESTION_BANK_LAMBDA)
+
+    items = [json.loads(matches[i]["metadata"]["item"]) for i in selected]
+    log.info(f"[+] Served {len(items)} questions from the question bank.")
+    return renumber(items, BANK_TYPES[gen_type][3])
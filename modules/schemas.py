@@ -1,5 +1,6 @@
+import re
 import json
-from langchain_core.output_parsers import JsonOutputParser
+from typing import Iterable, Iterator
 from langchain.prompts import PromptTemplate
 
 # --- Schemas ---
@@ -41,18 +42,16 @@ mcq_schema = {
     }
 }
 
-# --- Parsers ---
-
-qa_parser = JsonOutputParser(schema=qa_schema)
-mcq_parser = JsonOutputParser(schema=mcq_schema)
-
 # --- Prompt Templates ---
+# The instructions and schema come first and never change between calls, so
+# providers with prompt (prefix) caching reuse them; the context follows, so
+# fan-out shards over one context share everything up to the final request
+# line, which alone carries the question count.
 
 qa_prompt_template_str = """You are an expert question writer.
-Context: {context}
 
 Instruction:
- - Generate {num_questions} question-answer pairs strictly in JSON that conforms to the provided schema.
+ - Generate question-answer pairs strictly in JSON that conforms to the provided schema.
  - Each answer should be SHORT and CONCISE (1-3 sentences maximum).
  - Questions should be clear, specific, and directly answerable from the context.
  - IDs should be short unique strings (like QA1, QA2, ...).
@@ -61,6 +60,10 @@ JSON SCHEMA:
 {schema}
 
 Output ONLY valid JSON that matches the schema.
+
+Context: {context}
+
+Generate {num_questions} question-answer pairs from the context above.
 """
 
 qa_prompt_template = PromptTemplate(
@@ -69,10 +72,9 @@ qa_prompt_template = PromptTemplate(
 )
 
 mcq_prompt_template_str = """You are an expert defense studies question writer.
-Context: {context}
 
 Instruction:
- - Generate {num_questions} multiple-choice questions (MCQs) strictly in JSON that conforms to the provided schema.
+ - Generate multiple-choice questions (MCQs) strictly in JSON that conforms to the provided schema.
  - Each question must have exactly 4 options.
  - Provide a short explanation for the correct option.
  - Use domain-accurate, textbook-style language (not generic).
@@ -83,6 +85,10 @@ JSON SCHEMA:
 {schema}
 
 Output ONLY valid JSON that matches the schema.
+
+Context: {context}
+
+Generate {num_questions} multiple-choice questions from the context above.
 """
 
 mcq_prompt_template = PromptTemplate(
@@ -90,25 +96,96 @@ mcq_prompt_template = PromptTemplate(
     input_variables=["context", "num_questions", "schema"]
 )
 
-# --- Fallback JSON Parser ---
+# --- Item Validation ---
+
+def is_valid_mcq(item) -> bool:
+    """Check an MCQ object against mcq_schema (4 options, correct_index 1-4)."""
+    return (
+        isinstance(item, dict)
+        and isinstance(item.get("question"), str) and item["question"].strip() != ""
+        and isinstance(item.get("options"), list) and len(item["options"]) == 4
+        and all(isinstance(o, str) for o in item["options"])
+        and isinstance(item.get("correct_index"), int) and not isinstance(item["correct_index"], bool)
+        and 1 <= item["correct_index"] <= 4
+    )
+
+def is_valid_qa(item) -> bool:
+    """Check a Q&A object against qa_schema."""
+    return (
+        isinstance(item, dict)
+        and isinstance(item.get("question"), str) and item["question"].strip() != ""
+        and isinstance(item.get("answer"), str) and item["answer"].strip() != ""
+    )
+
+# --- Incremental JSON Item Parser ---
+
+STRUCTURAL_CHARS = re.compile(r'[{}"\\]') # The scanner jumps between these
+TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+def _loads_lenient(text: str):
+    """Decode one object, tolerating raw control characters in strings and trailing commas."""
+    try:
+        return json.loads(text, strict=False)
+    except ValueError:
+        pass
+    try:
+        return json.loads(TRAILING_COMMA.sub(r"\1", text), strict=False)
+    except ValueError:
+        return None
 
-def safe_json_parse(raw_json_str: str, parser_type: str = "array"):
+def iter_json_items(chunks: Iterable[str], validator) -> Iterator[dict]:
     """
-    Tries to parse JSON, falling back to extracting from common LLM outputs.
+    Yield question objects from a stream of LLM text chunks as soon as each
+    one is complete. Braces are tracked outside of strings; every closed
+    object is decoded, and the innermost ones passing `validator` are yielded.
+    Objects that wrap already-yielded items (e.g. {"mcq_list": [...]}) are
+    skipped, so the full output is never re-parsed. Malformed objects are
+    decoded leniently (see `_loads_lenient`) or dropped without affecting
+    their neighbours.
     """
-    try:
-        if parser_type == "array":
-            # Find the first '[' and last ']'
-            start = raw_json_str.find("[")
-            end = raw_json_str.rfind("]") + 1
-            if start != -1 and end != -1:
-                return json.loads(raw_json_str[start:end])
-        else: # "object"
-            start = raw_json_str.find("{")
-            end = raw_json_str.rfind("}") + 1
-            if start != -1 and end != -1:
-                return json.loads(raw_json_str[start:end])
-        raise ValueError("No valid JSON object/array found")
-    except Exception as e:
-        print(f"[!] Fallback JSON parser failed: {e}")
-        raise
\ No newline at end of file
+    buffer = []
+    pos = 0
+    in_string = False
+    escaped_at = -1 # Offset of the character after a backslash inside a string
+    stack = [] # [start offset, contains a yielded item] per open object
+
+    for chunk in chunks:
+        if not chunk:
+            continue
+        buffer.append(chunk)
+        for match in STRUCTURAL_CHARS.finditer(chunk):
+            at = pos + match.start()
+            if at == escaped_at:
+                continue
+            ch = match.group()
+            if in_string:
+                if ch == "\\":
+                    escaped_at = at + 1
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch == "{":
+                stack.append([at, False])
+            elif ch == "}" and stack:
+                start, has_item = stack.pop()
+                if not has_item:
+                    # Chunks are only joined when an object closes
+                    text = "".join(buffer)
+                    buffer = [text]
+                    obj = _loads_lenient(text[start:at + 1])
+                    if obj is not None and validator(obj):
+                        if stack:
+                            stack[-1][1] = True
+                        yield obj
+                elif stack:
+                    stack[-1][1] = True
+        pos += len(chunk)
+
+def salvage_json_items(raw: str, validator) -> list:
+    """
+    Recover every valid question object from a complete LLM output in a
+    single pass: prose, code fences, a truncated tail or malformed items
+    only lose the affected items, not the whole batch.
+    """
+    return list(iter_json_items([raw], validator))
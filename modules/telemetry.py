@@ -0,0 +1,292 @@
+import os
+import io
+import sys
+import json
+import time
+import uuid
+import random
+import pstats
+import logging
+import cProfile
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# --- Constants ---
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Share of requests whose info-level log lines (and trace summary) are written;
+# warnings are always written. Decided once per request, so a sampled request logs completely.
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+LOG_FORMAT = os.getenv("LOG_FORMAT", "%(trace_id)s %(message)s")
+# With PROFILING_ENABLED, a request sent with an "X-Profile: 1" header runs
+# under cProfile; its stats are written to PROFILE_DIR/<trace id>.prof.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_TOP_FUNCTIONS = 25  # Functions listed in the profile log summary
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 3000, 4000, 6000, 8000, 16000)
+
+# --- Metrics ---
+class _Metric:
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(label, "")) for label in self.labelnames)
+
+    def _labels(self, key: tuple, extra: dict = None) -> str:
+        pairs = list(zip(self.labelnames, key)) + list((extra or {}).items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _number(value) -> str:
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+class Counter(_Metric):
+    """Monotonic counter, one series per label combination."""
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values = {}
+
+    def inc(self, value: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def render(self) -> list:
+        with self._lock:
+            values = dict(self._values)
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{self._labels(key)} {_number(v)}" for key, v in sorted(values.items())]
+        return lines
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram, one series per label combination."""
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._series = {}  # key -> [bucket counts, sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def totals(self) -> dict:
+        """(sum, count) per label combination, keyed by label values."""
+        with self._lock:
+            return {key: (total, count) for key, (_, total, count) in self._series.items()}
+
+    def render(self) -> list:
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{self._labels(key, {'le': _number(bound)})} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {_number(total)}")
+            lines.append(f"{self.name}_count{self._labels(key)} {count}")
+        return lines
+
+REQUEST_SECONDS = Histogram("qgen_request_seconds", "Request latency by route and outcome.", ("route", "status"))
+STAGE_SECONDS = Histogram("qgen_stage_seconds", "Latency of pipeline stages.", ("stage",))
+TOKENS = Counter("qgen_tokens_total", "Tokens sent to or produced by upstream models.", ("kind",))
+CACHE_EVENTS = Counter("qgen_cache_events_total", "Cache lookups by cache and result.", ("cache", "result"))
+FALLBACK_DECISIONS = Counter("qgen_fallback_decisions_total", "Relevance gate outcomes.", ("decision",))
+CONTEXT_TOKENS = Histogram("qgen_context_tokens", "Prompt context size after packing.", buckets=TOKEN_BUCKETS)
+LLM_ROUTES = Counter("qgen_llm_routes_total", "Generation calls by model tier and question type.", ("tier", "type"))
+LLM_SECONDS = Histogram("qgen_llm_seconds", "LLM call latency by model tier.", ("tier",))
+LLM_TOKENS = Counter("qgen_llm_tokens_total", "LLM tokens by model tier.", ("tier", "kind"))
+
+METRICS = [
+    REQUEST_SECONDS, STAGE_SECONDS, TOKENS, CACHE_EVENTS, FALLBACK_DECISIONS, CONTEXT_TOKENS,
+    LLM_ROUTES, LLM_SECONDS, LLM_TOKENS,
+]
+
+def render_metrics() -> str:
+    """All metrics of this worker in the Prometheus text exposition format."""
+    return "\n".join(line for metric in METRICS for line in metric.render()) + "\n"
+
+# --- Request Tracing ---
+class Trace:
+    """Stage timings, counters and decisions of one request."""
+
+    def __init__(self, route: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.route = route
+        self.status = "ok"
+        self.sampled = random.random() < LOG_SAMPLE_RATE
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.counts = {}
+        self.attributes = {}
+        self._lock = threading.Lock()
+
+    def add_stage(self, name: str, seconds: float):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def add(self, key: str, value: float = 1):
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + value
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                "trace_id": self.id,
+                "route": self.route,
+                "status": self.status,
+                "seconds": round(time.perf_counter() - self.started, 4),
+                "stages": {k: round(v, 4) for k, v in self.stages.items()},
+                "counts": dict(self.counts),
+                **self.attributes,
+            }
+
+_current_trace = contextvars.ContextVar("qgen_trace", default=None)
+
+def current_trace():
+    return _current_trace.get()
+
+@contextmanager
+def trace_request(route: str, profile: bool = False):
+    """
+    Trace one request: stages recorded anywhere below (including threads
+    started through `in_current_trace`) attach to it. On exit its latency is
+    observed and a JSON summary is logged. `profile` runs it under cProfile.
+    """
+    trace = Trace(route)
+    token = _current_trace.set(trace)
+    profiler = cProfile.Profile() if profile and PROFILING_ENABLED else None
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield trace
+    except BaseException:
+        trace.status = "error"
+        raise
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            _write_profile(profiler, trace.id)
+        REQUEST_SECONDS.observe(time.perf_counter() - trace.started, route=route, status=trace.status)
+        _trace_log.info(json.dumps(trace.summary()))
+        _current_trace.reset(token)
+
+def in_current_trace(fn):
+    """Wrap `fn` so that, run on a worker thread, it records into the caller's trace."""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
+
+def observe_stage(name: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, stage=name)
+    trace = current_trace()
+    if trace is not None:
+        trace.add_stage(name, seconds)
+
+@contextmanager
+def stage(name: str):
+    """Time a pipeline stage (a histogram series plus the current trace)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - started)
+
+def record_tokens(kind: str, count: int):
+    """Count tokens of `kind`: embedding, llm_prompt, llm_completion."""
+    if not count:
+        return
+    TOKENS.inc(count, kind=kind)
+    trace = current_trace()
+    if trace is not None:
+        trace.add(f"{kind}_tokens", count)
+
+def record_cache(cache: str, hit: bool, count: int = 1):
+    result = "hit" if hit else "miss"
+    CACHE_EVENTS.inc(count, cache=cache, result=result)
+    trace = current_trace()
+    if trace is not None:
+        trace.add(f"{cache}_cache_{result}", count)
+
+def record_fallback(decision: str, similarity: float = None):
+    """Record the relevance gate's decision: "retrieval", "web" or "none"."""
+    FALLBACK_DECISIONS.inc(decision=decision)
+    trace = current_trace()
+    if trace is not None:
+        trace.attributes["context_source"] = decision
+        if similarity is not None:
+            trace.attributes["similarity"] = round(float(similarity), 4)
+
+def record_llm_route(tier: str, gen_type: str):
+    LLM_ROUTES.inc(tier=tier, type=gen_type)
+    trace = current_trace()
+    if trace is not None:
+        trace.attributes["llm_tier"] = tier
+
+def record_llm_call(tier: str, seconds: float, prompt_tokens: int, completion_tokens: int):
+    """Per-tier latency and tokens of one LLM call."""
+    LLM_SECONDS.observe(seconds, tier=tier)
+    LLM_TOKENS.inc(prompt_tokens, tier=tier, kind="prompt")
+    LLM_TOKENS.inc(completion_tokens, tier=tier, kind="completion")
+    _log.info(f"[+] LLM call on the {tier} tier: {seconds:.2f}s, {prompt_tokens} prompt / {completion_tokens} completion tokens.")
+
+def record_context_tokens(count: int):
+    CONTEXT_TOKENS.observe(count)
+    trace = current_trace()
+    if trace is not None:
+        trace.attributes["context_tokens"] = count
+
+# --- Profiling ---
+def _write_profile(profiler: cProfile.Profile, trace_id: str):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"{trace_id}.prof")
+    profiler.dump_stats(path)
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+    _log.warning(f"[+] Profile written to {path} (snakeviz/pstats). Top functions:\n{out.getvalue()}")
+
+# --- Logging ---
+class _TraceFilter(logging.Filter):
+    """Tag records with the request's trace ID and drop unsampled requests' info lines."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        trace = current_trace()
+        record.trace_id = trace.id if trace is not None else "-"
+        return trace is None or trace.sampled or record.levelno >= logging.WARNING
+
+def _configure_logging() -> logging.Logger:
+    root = logging.getLogger("qgen")
+    if not root.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        handler.addFilter(_TraceFilter())
+        root.addHandler(handler)
+        root.setLevel(LOG_LEVEL)
+        root.propagate = False
+    return root
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger for a module (`get_logger(__name__)`), writing through the shared qgen handler."""
+    _configure_logging()
+    return logging.getLogger("qgen." + name.rsplit(".", 1)[-1])
+
+_log = get_logger("telemetry")
+_trace_log = get_logger("trace")
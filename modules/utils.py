@@ -1,6 +1,95 @@
 import os
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+import httpx
 import numpy as np
-from tavily import TavilyClient
+
+from .embedding_cache import MemoryCache
+from .telemetry import (
+    get_logger, stage, observe_stage, record_tokens, record_cache, record_fallback, record_llm_call, in_current_trace
+)
+
+log = get_logger(__name__)
+
+# --- Client Registry ---
+# Network clients are expensive to build (TLS handshakes, connection pools,
+# SDK validation), so each worker process builds them once and every request
+# reuses the same instances. Forked workers (gunicorn --preload) start with an
+# empty registry so no connection pool is ever shared across processes.
+HTTP_POOL_MAX_CONNECTIONS = int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "20"))
+HTTP_POOL_MAX_KEEPALIVE = int(os.getenv("HTTP_POOL_MAX_KEEPALIVE", "10"))
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "60"))
+
+_client_registry = {}
+_registry_lock = threading.RLock()
+
+def get_or_create_client(name: str, factory):
+    """Return the registered client called `name`, building it with `factory` on first use."""
+    client = _client_registry.get(name)
+    if client is None:
+        with _registry_lock:
+            client = _client_registry.get(name)
+            if client is None:
+                client = factory()
+                _client_registry[name] = client
+    return client
+
+def invalidate_clients(*names: str):
+    """Drop the named clients (or all of them) so the next access rebuilds them."""
+    with _registry_lock:
+        if not names:
+            _client_registry.clear()
+        for name in names:
+            _client_registry.pop(name, None)
+
+def _reset_registry_after_fork():
+    global _registry_lock
+    _registry_lock = threading.RLock()
+    _client_registry.clear()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_registry_after_fork)
+
+def get_http_client() -> httpx.Client:
+    """Return the pooled HTTP client shared by the OpenAI and Groq SDKs."""
+    return get_or_create_client("http", lambda: httpx.Client(
+        limits=httpx.Limits(
+            max_connections=HTTP_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_POOL_MAX_KEEPALIVE
+        ),
+        timeout=HTTP_TIMEOUT_SECONDS
+    ))
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Return the pooled async HTTP client used by the async request path (asgi.py)."""
+    return get_or_create_client("http_async", lambda: httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=HTTP_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_POOL_MAX_KEEPALIVE
+        ),
+        timeout=HTTP_TIMEOUT_SECONDS
+    ))
+
+# --- Token Counting ---
+TOKEN_ENCODING_NAME = "cl100k_base" # Tokenizer used by text-embedding-3-small
+
+def _load_token_encoder():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(TOKEN_ENCODING_NAME)
+    except Exception as e:
+        log.warning(f"[!] Tokenizer unavailable ({e}). Falling back to ~4 chars per token.")
+        return False
+
+def count_tokens(text: str) -> int:
+    """Count tokens with the embedding model's tokenizer (approximate if it is unavailable)."""
+    if not text:
+        return 0
+    encoder = get_or_create_client("tokenizer", _load_token_encoder)
+    if encoder:
+        return len(encoder.encode(text, disallowed_special=()))
+    return max(1, len(text) // 4)
 
 def calculate_context_similarity(query: str, context: str, embeddings) -> float:
     """Calculate similarity between query and retrieved context."""
@@ -18,29 +107,431 @@ def calculate_context_similarity(query: str, context: str, embeddings) -> float:
         
         return float(similarity)
     except Exception as e:
-        print(f"[!] Error calculating similarity: {e}")
+        log.warning(f"[!] Error calculating similarity: {e}")
         return 0.0
 
-def search_with_tavily(query: str, max_results: int = 3) -> str:
-    """Search using Tavily API and return aggregated content."""
-    try:
-        tavily_api_key = os.getenv("TAVILY_API_KEY")
-        if not tavily_api_key:
-            raise ValueError("TAVILY_API_KEY not found in environment variables")
-        
-        client = TavilyClient(api_key=tavily_api_key)
-        
-        print(f"[*] Searching with Tavily for: '{query}'...")
-        response = client.search(query=query, max_results=max_results)
+# --- Relevance Gating ---
+# "joined" embeds the concatenated context (one extra embedding call); the
+# others reuse the chunk vectors returned by the retriever.
+GATING_STRATEGY = os.getenv("GATING_STRATEGY", "weighted")
+GATING_STRATEGIES = ("joined", "max", "mean", "weighted")
+
+def score_context_vectors(query_vector, doc_vectors, strategy: str = "weighted", weights=None) -> float:
+    """
+    Score retrieved chunks against the query using their stored vectors.
+    - max / mean: max / mean cosine similarity over the chunks.
+    - weighted: cosine similarity to the length-weighted centroid of the chunk
+      vectors, which approximates embedding the joined context.
+    """
+    if strategy not in GATING_STRATEGIES or strategy == "joined":
+        raise ValueError(f"Unknown vector gating strategy: {strategy}")
+
+    doc_vectors = np.asarray(doc_vectors, dtype=np.float32)
+    if doc_vectors.size == 0:
+        return 0.0
+
+    query_vec = np.asarray(query_vector, dtype=np.float32)
+    query_vec = query_vec / (np.linalg.norm(query_vec) or 1.0)
+    norms = np.linalg.norm(doc_vectors, axis=1, keepdims=True)
+    unit_docs = doc_vectors / np.where(norms == 0, 1.0, norms)
+
+    if strategy == "weighted":
+        weights = np.ones(len(unit_docs), dtype=np.float32) if weights is None else np.asarray(weights, dtype=np.float32)
+        centroid = weights @ unit_docs
+        return float(centroid @ query_vec / (np.linalg.norm(centroid) or 1.0))
+
+    similarities = unit_docs @ query_vec
+    return float(similarities.max() if strategy == "max" else similarities.mean())
+
+# --- MMR Re-ranking ---
+def mmr_select(query_vector, candidates, k: int, lambda_mult: float = 0.5,
+               token_counts=None, token_budget: int = None, relevance=None) -> list:
+    """
+    Maximal marginal relevance over a candidate pool, as batched NumPy ops.
+    Relevance and the candidate Gram matrix are each one matrix product; each
+    pick then only updates the running max similarity to the selected set.
+    With `token_counts` and `token_budget`, candidates that no longer fit the
+    budget are skipped (the first pick is always allowed).
+    `relevance` replaces the cosine similarity to the query (e.g. fused
+    hybrid ranks); `query_vector` may then be None.
+    Returns the selected candidate indices in selection order.
+    """
+    candidates = np.asarray(candidates, dtype=np.float32)
+    if candidates.size == 0 or k <= 0:
+        return []
+
+    norms = np.linalg.norm(candidates, axis=1, keepdims=True)
+    unit = candidates / np.where(norms == 0, 1.0, norms)
+
+    if relevance is None:
+        query_vec = np.asarray(query_vector, dtype=np.float32)
+        relevance = unit @ (query_vec / (np.linalg.norm(query_vec) or 1.0))
+    else:
+        relevance = np.asarray(relevance, dtype=np.float32)
+    gram = unit @ unit.T
+    max_similarity = np.full(len(unit), -np.inf, dtype=np.float32)
+    available = np.ones(len(unit), dtype=bool)
+    tokens = None if token_counts is None or not token_budget else np.asarray(token_counts)
+    used_tokens = 0
+
+    selected = []
+    while len(selected) < min(k, len(unit)):
+        redundancy = max_similarity if selected else 0.0
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        mask = available if tokens is None or not selected else available & (used_tokens + tokens <= token_budget)
+        if not mask.any():
+            break
+        best = int(np.argmax(np.where(mask, scores, -np.inf)))
+        selected.append(best)
+        available[best] = False
+        max_similarity = np.maximum(max_similarity, gram[best])
+        if tokens is not None:
+            used_tokens += tokens[best]
+    return selected
+
+def retrieve_and_score(retriever, query: str, embeddings, strategy: str = None):
+    """
+    Retrieve context for the query and score its relevance.
+    Uses the retriever's vectors when it can return them (see
+    db_manager.VectorMMRRetriever), otherwise embeds the joined context.
+    Returns (docs, context, similarity_score).
+    """
+    strategy = strategy or GATING_STRATEGY
+    if strategy != "joined" and hasattr(retriever, "retrieve"):
+        retrieved = retriever.retrieve(query)
+        docs = retrieved["docs"]
+        context = "\n\n".join([d.page_content for d in docs])
+        if retrieved["query_vector"] is None:
+            # Answered from the lexical index without embedding the query
+            return docs, context, retrieved["similarity"]
+        similarity_score = score_context_vectors(
+            retrieved["query_vector"],
+            retrieved["doc_vectors"],
+            strategy,
+            weights=[len(d.page_content) for d in docs]
+        )
+        return docs, context, similarity_score
+
+    docs = retriever.get_relevant_documents(query)
+    context = "\n\n".join([d.page_content for d in docs])
+    return docs, context, calculate_context_similarity(query, context, embeddings)
+
+def resolve_context(retriever, query: str, embeddings, similarity_threshold: float = 0.5,
+                    use_tavily: bool = False, gating_strategy: str = None):
+    """
+    Retrieve context for the query and fall back to Tavily when it is missing
+    or its similarity is below the threshold (and web search is enabled).
+    In speculative mode (TAVILY_SPECULATIVE) the fallback may already be
+    running alongside retrieval.
+    Returns (docs, context, similarity_score).
+    """
+    speculation = get_speculative_search() if use_tavily and TAVILY_SPECULATIVE != "off" else None
+    topic = query_topic(query)
+    prefetch = None
+    if speculation is not None and speculation.should_prefetch(topic):
+        log.info("[*] Prefetching Tavily results alongside retrieval (speculative).")
+        prefetch = speculation.prefetch(query, embeddings)
+    started = time.perf_counter()
+
+    with stage("retrieval"):
+        docs, context, similarity_score = retrieve_and_score(retriever, query, embeddings, gating_strategy)
+    log.info(f"[*] Context similarity score: {similarity_score:.2%}")
+
+    fell_back = not context or similarity_score < similarity_threshold
+    decision = "none" if fell_back else "retrieval"
+    if speculation is not None:
+        speculation.record(topic, fell_back)
+
+    if fell_back:
+        if not context:
+            log.warning("[!] No context found for the query.")
+        else:
+            log.warning(f"[!] Similarity ({similarity_score:.2%}) is below threshold ({similarity_threshold:.2%})")
         
+        if use_tavily:
+            if prefetch is not None:
+                log.info("[*] Tavily search is enabled. Using the prefetched search...")
+                waited_from = time.perf_counter() - started
+                tavily_content, tavily_score, search_seconds = prefetch.result()
+                # Sequentially, the whole search would have started only now
+                speculation.record_outcome(True, min(search_seconds, waited_from))
+            else:
+                log.info("[*] Tavily search is enabled. Searching web...")
+                tavily_content, tavily_score = web_fallback(query, embeddings)
+            
+            if tavily_content:
+                log.info("[+] Using Tavily search results as context")
+                decision = "web"
+                context = tavily_content
+                similarity_score = tavily_score
+                log.info(f"[*] New context similarity score: {similarity_score:.2%}")
+            else:
+                log.warning("[!] No results from Tavily, using original (or empty) context")
+        else:
+            log.info("[*] Tavily search is disabled. Proceeding with original context.")
+    else:
+        log.info(f"[+] Context similarity is acceptable ({similarity_score:.2%})")
+        if prefetch is not None:
+            # Not needed; its results still warm the web search cache
+            prefetch.cancel()
+            speculation.record_outcome(False)
+
+    record_fallback(decision, similarity_score)
+    return docs, context, similarity_score
+
+def stream_llm_text(llm, prompt: str, tier: str = "default"):
+    """Yield the text of an LLM response chunk by chunk (chat or plain LLMs)."""
+    started = time.perf_counter()
+    parts = []
+    for chunk in llm.stream(prompt):
+        text = getattr(chunk, "content", chunk)
+        parts.append(text)
+        yield text
+    seconds = time.perf_counter() - started
+    observe_stage("llm", seconds)
+    record_llm_usage(prompt, "".join(parts), tier, seconds)
+
+def record_llm_usage(prompt: str, completion: str, tier: str = "default", seconds: float = 0.0):
+    """Count the prompt and completion tokens of one LLM call, in total and per model tier (see telemetry)."""
+    prompt_tokens, completion_tokens = count_tokens(prompt), count_tokens(completion)
+    record_tokens("llm_prompt", prompt_tokens)
+    record_tokens("llm_completion", completion_tokens)
+    record_llm_call(tier, seconds, prompt_tokens, completion_tokens)
+
+# --- Web Search ---
+# Tavily results are cached per normalized query, and concurrent identical
+# lookups share one request. Optional reformulated queries run in parallel and
+# their results are merged. TAVILY_API_BASE_URL points the client at another
+# server (e.g. a local stub in tests).
+TAVILY_API_BASE_URL = os.getenv("TAVILY_API_BASE_URL")
+TAVILY_CACHE_SIZE = int(os.getenv("TAVILY_CACHE_SIZE", "500"))
+TAVILY_CACHE_TTL = float(os.getenv("TAVILY_CACHE_TTL_SECONDS", "3600"))
+TAVILY_QUERY_VARIANTS = int(os.getenv("TAVILY_QUERY_VARIANTS", "1"))  # Reformulated queries per search
+TAVILY_QUERY_TEMPLATES = (
+    "Information regarding: {query}",
+    "{query} explained",
+    "{query} key facts and definitions",
+)
+
+def normalize_query(query: str) -> str:
+    """Cache key form of a query: lowercased, single-spaced, without edge punctuation."""
+    return " ".join(query.lower().split()).strip(" .?!,;:")
+
+def reformulate_query(query: str, variants: int) -> list:
+    """Up to `variants` phrasings of the query, the original "Information regarding" form first."""
+    return [t.format(query=query) for t in TAVILY_QUERY_TEMPLATES[:max(1, variants)]]
+
+class WebSearch:
+    """Cached, request-coalescing front for a Tavily client (one per worker, see get_web_search)."""
+
+    def __init__(self, client, cache_size: int = TAVILY_CACHE_SIZE, ttl: float = TAVILY_CACHE_TTL):
+        self.client = client
+        self.cache = MemoryCache(cache_size, ttl)
+        self.searches = 0
+        self.cache_hits = 0
+        self.coalesced = 0
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def search(self, query: str, max_results: int = 3) -> list:
+        """Result dicts for one query, from the cache, an identical in-flight request, or Tavily."""
+        key = f"{max_results}:{normalize_query(query)}"
+        results = self.cache.get(key)
+        if results is not None:
+            with self._lock:
+                self.cache_hits += 1
+            record_cache("web_search", True)
+            return results
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self.coalesced += 1
+        record_cache("web_search", not leader)
+        if not leader:
+            return future.result()
+
+        try:
+            log.info(f"[*] Searching with Tavily for: '{query}'...")
+            with stage("tavily"):
+                results = self.client.search(query=query, max_results=max_results).get("results", [])
+            with self._lock:
+                self.searches += 1
+            self.cache.set(key, results)
+            future.set_result(results)
+            return results
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def multi_search(self, queries: list, max_results: int = 3) -> list:
+        """
+        Run the queries in parallel and merge their results: interleaved by
+        rank, without repeated URLs or identical content.
+        """
+        if len(queries) == 1:
+            ranked = [self.search(queries[0], max_results)]
+        else:
+            with ThreadPoolExecutor(max_workers=len(queries)) as pool:
+                ranked = list(pool.map(in_current_trace(lambda q: self.search(q, max_results)), queries))
+
+        merged, seen = [], set()
+        for rank in range(max((len(r) for r in ranked), default=0)):
+            for results in ranked:
+                if rank >= len(results):
+                    continue
+                result = results[rank]
+                keys = {result.get("url", "").rstrip("/").lower(), " ".join(result.get("content", "").split())}
+                if keys & seen:
+                    continue
+                seen |= keys - {""}
+                merged.append(result)
+        return merged
+
+    def stats(self) -> dict:
+        lookups = self.searches + self.cache_hits + self.coalesced
+        return {
+            "searches": self.searches,
+            "cache_hits": self.cache_hits,
+            "coalesced": self.coalesced,
+            "hit_rate": (self.cache_hits + self.coalesced) / lookups if lookups else 0.0,
+            "entries": len(self.cache),
+        }
+
+def _build_web_search() -> WebSearch:
+    tavily_api_key = os.getenv("TAVILY_API_KEY")
+    if not tavily_api_key:
+        raise ValueError("TAVILY_API_KEY not found in environment variables")
+    client_kwargs = {"api_base_url": TAVILY_API_BASE_URL} if TAVILY_API_BASE_URL else {}
+    from tavily import TavilyClient
+    # The client keeps one requests session, so its connections are reused
+    return WebSearch(TavilyClient(api_key=tavily_api_key, **client_kwargs))
+
+def get_web_search() -> WebSearch:
+    """Return the process-wide cached Tavily search."""
+    return get_or_create_client("web_search", _build_web_search)
+
+def search_with_tavily(query: str, max_results: int = 3, variants: int = None) -> str:
+    """
+    Search using Tavily API for the topic `query` and return aggregated content.
+    With `variants` > 1, that many reformulations of the query are searched
+    in parallel and the deduplicated results are merged.
+    """
+    try:
+        variants = TAVILY_QUERY_VARIANTS if variants is None else variants
+        queries = reformulate_query(query, variants) if variants > 1 else [f"Information regarding: {query}"]
+        results = get_web_search().multi_search(queries, max_results)
+
         content_parts = []
-        for idx, result in enumerate(response.get('results', []), 1):
+        for idx, result in enumerate(results, 1):
             content_parts.append(f"Source {idx}: {result.get('title', '')}\n{result.get('content', '')}\nURL: {result.get('url', '')}\n")
         
         aggregated_content = "\n\n".join(content_parts)
-        print(f"[+] Retrieved {len(response.get('results', []))} results from Tavily")
+        log.info(f"[+] Retrieved {len(results)} results from Tavily")
         return aggregated_content
     
     except Exception as e:
-        print(f"[!] Error searching with Tavily: {e}")
-        return ""
\ No newline at end of file
+        log.warning(f"[!] Error searching with Tavily: {e}")
+        return ""
+
+def web_fallback(query: str, embeddings):
+    """Search the web for the query and score the result. Returns (content, similarity_score)."""
+    with stage("web_fallback"):
+        content = search_with_tavily(query)
+        if not content:
+            return "", 0.0
+        return content, calculate_context_similarity(query, content, embeddings)
+
+# --- Speculative Web Search ---
+# With TAVILY_SPECULATIVE=auto, the web fallback (search + scoring) starts
+# alongside vector retrieval for topics that often end up falling back to it,
+# and is used or discarded once the relevance gate has decided. "always"
+# prefetches on every request with web search enabled; "off" never does.
+TAVILY_SPECULATIVE = os.getenv("TAVILY_SPECULATIVE", "off").lower()
+SPECULATIVE_MIN_FALLBACK_RATE = float(os.getenv("SPECULATIVE_MIN_FALLBACK_RATE", "0.5"))
+SPECULATIVE_MIN_OBSERVATIONS = 2    # Topics seen less often use the overall fallback rate
+SPECULATIVE_HISTORY_SIZE = 10000    # Topics remembered per worker
+SPECULATIVE_WORKERS = 4
+
+def query_topic(query: str) -> str:
+    """History key of a query: its normalized words, order-independent."""
+    return " ".join(sorted(set(normalize_query(query).split())))
+
+class SpeculativeSearch:
+    """Per-topic fallback history and prefetch pool, with latency-saved and wasted-search counters."""
+
+    def __init__(self):
+        self.pool = ThreadPoolExecutor(max_workers=SPECULATIVE_WORKERS, thread_name_prefix="tavily-prefetch")
+        self.history = {} # topic -> [requests, fallbacks]
+        self.requests = 0
+        self.fallbacks = 0
+        self.prefetched = 0
+        self.used = 0
+        self.wasted = 0
+        self.latency_saved = 0.0
+        self._lock = threading.Lock()
+
+    def fallback_rate(self, topic: str) -> float:
+        with self._lock:
+            requests, fallbacks = self.history.get(topic, (0, 0))
+            if requests < SPECULATIVE_MIN_OBSERVATIONS:
+                requests, fallbacks = self.requests, self.fallbacks
+        return fallbacks / requests if requests else 0.0
+
+    def should_prefetch(self, topic: str) -> bool:
+        if TAVILY_SPECULATIVE == "always":
+            return True
+        return TAVILY_SPECULATIVE == "auto" and self.fallback_rate(topic) >= SPECULATIVE_MIN_FALLBACK_RATE
+
+    def prefetch(self, query: str, embeddings):
+        """Start `web_fallback` in the background. Returns a future of (content, score, seconds)."""
+        with self._lock:
+            self.prefetched += 1
+        started = time.perf_counter()
+
+        def run():
+            content, score = web_fallback(query, embeddings)
+            return content, score, time.perf_counter() - started
+        return self.pool.submit(in_current_trace(run))
+
+    def record(self, topic: str, fell_back: bool):
+        with self._lock:
+            entry = self.history.pop(topic, [0, 0])
+            entry[0] += 1
+            entry[1] += int(fell_back)
+            self.history[topic] = entry # Most recently seen topics are kept
+            if len(self.history) > SPECULATIVE_HISTORY_SIZE:
+                del self.history[next(iter(self.history))]
+            self.requests += 1
+            self.fallbacks += int(fell_back)
+
+    def record_outcome(self, used: bool, latency_saved: float = 0.0):
+        with self._lock:
+            if used:
+                self.used += 1
+                self.latency_saved += latency_saved
+            else:
+                self.wasted += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "mode": TAVILY_SPECULATIVE,
+                "requests": self.requests,
+                "fallback_rate": self.fallbacks / self.requests if self.requests else 0.0,
+                "prefetched": self.prefetched,
+                "used": self.used,
+                "wasted": self.wasted,
+                "latency_saved_seconds": round(self.latency_saved, 3),
+            }
+
+def get_speculative_search() -> SpeculativeSearch:
+    """Return the process-wide speculative search state."""
+    return get_or_create_client("speculative_search", SpeculativeSearch)
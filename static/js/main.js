@@ -155,7 +155,9 @@ document.addEventListener('DOMContentLoaded', () => {
     });
     
     function updateFileStatus(files) {
-        if (files.length > 0) {
+        if (files.length > 1) {
+            fileStatusMessage.textContent = `${files.length} files selected`;
+        } else if (files.length > 0) {
             fileStatusMessage.textContent = `${files[0].name} selected`;
         } else {
             fileStatusMessage.textContent = '';
@@ -163,6 +165,39 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
 
+    // --- Ingestion Job Polling ---
+    const JOB_POLL_INTERVAL_MS = 1000;
+
+    const describeJob = (job) => {
+        const done = job.progress && job.progress.docs_upserted;
+        switch (job.stage) {
+            case 'queued': return 'Waiting in queue...';
+            case 'parsing': return 'Reading file...';
+            case 'embedding': return done ? `Embedding... ${done} chunks stored` : 'Embedding...';
+            case 'deleting': return 'Removing outdated chunks...';
+            default: return 'Processing file...';
+        }
+    };
+
+    const waitForJob = async (jobId, label) => {
+        while (true) {
+            await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+            const response = await fetch(`/jobs/${jobId}`);
+            const job = await response.json();
+
+            if (!response.ok) {
+                throw new Error(job.error || 'Lost track of the upload job.');
+            }
+            if (job.status === 'done') {
+                return job;
+            }
+            if (job.status === 'failed') {
+                throw new Error(job.error || 'File processing failed.');
+            }
+            fileStatusMessage.textContent = label ? `${label}: ${describeJob(job)}` : describeJob(job);
+        }
+    };
+
     // --- Event Handlers ---
 
     /**
@@ -193,7 +228,19 @@ document.addEventListener('DOMContentLoaded', () => {
                 throw new Error(result.error || 'File upload failed.');
             }
 
-            showToast(result.message, 'success');
+            // The server only queues the files; wait for every ingestion job to finish
+            const names = Array.from(fileInput.files).map(f => f.name);
+            const multiple = result.job_ids.length > 1;
+            const jobs = await Promise.all(
+                result.job_ids.map((jobId, i) => waitForJob(jobId, multiple ? names[i] : null))
+            );
+
+            jobs.forEach((job, i) => {
+                const message = job.result && job.result.status === 'unchanged'
+                    ? `Already up to date: ${names[i]}`
+                    : `File processed: ${names[i]}`;
+                showToast(message, 'success');
+            });
             fileInput.value = '';
             fileStatusMessage.textContent = 'Upload successful!';
             setTimeout(() => { fileStatusMessage.textContent = ''; }, 2000);
@@ -276,7 +323,8 @@ document.addEventListener('DOMContentLoaded', () => {
         errorMessage.classList.add('hidden'); // Hide old errors
 
         try {
-            const response = await fetch('/generate', {
+            // Questions arrive as newline-delimited JSON while the model writes them
+            const response = await fetch('/generate/stream', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({
@@ -287,14 +335,28 @@ document.addEventListener('DOMContentLoaded', () => {
                 }),
             });
 
-            const result = await response.json();
-
             if (!response.ok) {
+                const result = await response.json();
                 throw new Error(result.error || 'Failed to generate questions.');
             }
 
-            lastGeneratedData = result.data;
-            renderResults(result.data, type); // This will replace the skeletons
+            const items = [];
+            await readEventStream(response, (event) => {
+                if (event.type === 'item') {
+                    items.push(event.data);
+                    renderStreamedItem(event.data, items.length - 1, type); // Replaces one skeleton
+                } else if (event.type === 'error') {
+                    throw new Error(event.error || 'Failed to generate questions.');
+                }
+            });
+
+            // Drop skeletons for questions the model did not produce
+            resultsContainer.querySelectorAll('.skeleton-pulse').forEach(el => el.remove());
+            if (items.length === 0) {
+                throw new Error('The model returned no results or an unexpected data format. Try again.');
+            }
+
+            lastGeneratedData = items;
             downloadBtn.classList.remove('hidden');
 
         } catch (err) {
@@ -326,7 +388,90 @@ document.addEventListener('DOMContentLoaded', () => {
         URL.revokeObjectURL(url);
     });
 
+    // --- Streaming Helpers ---
+
+    const readEventStream = async (response, onEvent) => {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffered = '';
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffered += decoder.decode(value, { stream: true });
+
+            let newline;
+            while ((newline = buffered.indexOf('\n')) >= 0) {
+                const line = buffered.slice(0, newline).trim();
+                buffered = buffered.slice(newline + 1);
+                if (line) onEvent(JSON.parse(line));
+            }
+        }
+        if (buffered.trim()) onEvent(JSON.parse(buffered));
+    };
+
+    const renderStreamedItem = (item, index, type) => {
+        const card = createCard(item, index, type);
+        if (!card) return;
+
+        const skeleton = resultsContainer.querySelector('.skeleton-pulse');
+        if (skeleton) {
+            resultsContainer.insertBefore(card, skeleton);
+            skeleton.remove();
+        } else {
+            resultsContainer.appendChild(card);
+        }
+    };
+
     // --- Rendering Functions (With robust parsing) ---
+
+    const createCard = (item, index, type) => {
+        if (type === 'mcq') {
+            if (!item || typeof item.question !== 'string' || !Array.isArray(item.options)) {
+                console.warn('Skipping malformed MCQ item:', item);
+                return null;
+            }
+            
+            const card = mcqTemplate.content.cloneNode(true);
+            card.querySelector('.question-text').textContent = `${index + 1}. ${item.question}`;
+            
+            const optionsList = card.querySelector('.options-list');
+            const correctIndex = parseInt(item.correct_index, 10);
+            
+            item.options.forEach((option, i) => {
+                const li = document.createElement('li');
+                const isCorrect = (i + 1) === correctIndex;
+                
+                li.className = `flex items-center p-3 rounded-lg ${isCorrect ? 'bg-primary-50 border border-primary-200' : 'bg-gray-50'}`;
+                
+                const icon = document.createElement('span');
+                icon.className = `mr-3 font-semibold ${isCorrect ? 'text-primary-600' : 'text-gray-500'}`;
+                icon.textContent = `${String.fromCharCode(65 + i)}.`;
+                
+                const text = document.createElement('span');
+                text.className = ` ${isCorrect ? 'font-semibold text-primary-800' : 'text-gray-800'}`;
+                text.textContent = String(option); 
+                
+                li.appendChild(icon);
+                li.appendChild(text);
+                optionsList.appendChild(li);
+            });
+
+            card.querySelector('.explanation-text').textContent = item.explanation || 'No explanation provided.';
+            return card;
+        }
+
+        // 'qa'
+        if (!item || typeof item.question !== 'string' || typeof item.answer !== 'string') {
+            console.warn('Skipping malformed Q&A item:', item);
+            return null;
+        }
+
+        const card = qaTemplate.content.cloneNode(true);
+        card.querySelector('.question-text').textContent = `${index + 1}. ${item.question}`;
+        card.querySelector('.answer-text').textContent = item.answer;
+        return card;
+    };
     
     const renderResults = (data, type) => {
         resultsContainer.innerHTML = ''; // Clear skeletons
@@ -377,54 +522,10 @@ document.addEventListener('DOMContentLoaded', () => {
             return;
         }
 
-        if (type === 'mcq') {
-            dataArray.forEach((item, index) => {
-                if (!item || typeof item.question !== 'string' || !Array.isArray(item.options)) {
-                    console.warn('Skipping malformed MCQ item:', item);
-                    return; 
-                }
-                
-                const card = mcqTemplate.content.cloneNode(true);
-                card.querySelector('.question-text').textContent = `${index + 1}. ${item.question}`;
-                
-                const optionsList = card.querySelector('.options-list');
-                const correctIndex = parseInt(item.correct_index, 10);
-                
-                item.options.forEach((option, i) => {
-                    const li = document.createElement('li');
-                    const isCorrect = (i + 1) === correctIndex;
-                    
-                    li.className = `flex items-center p-3 rounded-lg ${isCorrect ? 'bg-primary-50 border border-primary-200' : 'bg-gray-50'}`;
-                    
-                    const icon = document.createElement('span');
-                    icon.className = `mr-3 font-semibold ${isCorrect ? 'text-primary-600' : 'text-gray-500'}`;
-                    icon.textContent = `${String.fromCharCode(65 + i)}.`;
-                    
-                    const text = document.createElement('span');
-                    text.className = ` ${isCorrect ? 'font-semibold text-primary-800' : 'text-gray-800'}`;
-                    text.textContent = String(option); 
-                    
-                    li.appendChild(icon);
-                    li.appendChild(text);
-                    optionsList.appendChild(li);
-                });
-
-                card.querySelector('.explanation-text').textContent = item.explanation || 'No explanation provided.';
-                resultsContainer.appendChild(card);
-            });
-        } else { // 'qa'
-             dataArray.forEach((item, index) => {
-                if (!item || typeof item.question !== 'string' || typeof item.answer !== 'string') {
-                    console.warn('Skipping malformed Q&A item:', item);
-                    return;
-                }
-
-                const card = qaTemplate.content.cloneNode(true);
-                card.querySelector('.question-text').textContent = `${index + 1}. ${item.question}`;
-                card.querySelector('.answer-text').textContent = item.answer;
-                resultsContainer.appendChild(card);
-            });
-        }
+        dataArray.forEach((item, index) => {
+            const card = createCard(item, index, type);
+            if (card) resultsContainer.appendChild(card);
+        });
     };
 
 });
\ No newline at end of file
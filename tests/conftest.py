@@ -0,0 +1,86 @@
+import os
+import sys
+import hashlib
+import threading
+import numpy as np
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+# Settings are read when the modules are imported: embedded index, no provider keys needed
+os.environ.setdefault("VECTOR_BACKEND", "local")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+EMBEDDING_DIMENSION = 1536
+
+class CountingEmbeddings:
+    """Deterministic embeddings that record every text they are asked to embed."""
+
+    def __init__(self, dimension: int = EMBEDDING_DIMENSION):
+        self.dimension = dimension
+        self.embedded = []
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def vector(self, text: str) -> list:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        values = np.random.default_rng(seed).standard_normal(self.dimension)
+        return (values / np.linalg.norm(values)).tolist()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.calls += 1
+            self.embedded.extend(texts)
+        return [self.vector(t) for t in texts]
+
+    def embed_query(self, text):
+        with self._lock:
+            self.calls += 1
+        return self.vector(text)
+
+def _write_pdf(path, pages):
+    """Minimal text PDF with one line of Helvetica text per page, which pypdf extracts."""
+    objects = {
+        1: "<< /Type /Catalog /Pages 2 0 R >>",
+        2: f"<< /Type /Pages /Kids [{' '.join(f'{4 + 2 * i} 0 R' for i in range(len(pages)))}] /Count {len(pages)} >>",
+        3: "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    for i, text in enumerate(pages):
+        stream = f"BT /F1 12 Tf 50 800 Td ({text}) Tj ET"
+        objects[4 + 2 * i] = (
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>"
+        )
+        objects[5 + 2 * i] = f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream"
+
+    out, offsets = bytearray(b"%PDF-1.4\n"), {}
+    for number in sorted(objects):
+        offsets[number] = len(out)
+        out += f"{number} 0 obj\n{objects[number]}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offsets[n]:010d} 00000 n \n" for n in sorted(objects)).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(out)
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """Run each test in its own directory, with no clients left over from other tests."""
+    from modules.utils import invalidate_clients
+
+    monkeypatch.chdir(tmp_path)
+    invalidate_clients()
+    yield tmp_path
+    invalidate_clients()
+
+@pytest.fixture
+def embeddings():
+    return CountingEmbeddings()
+
+@pytest.fixture
+def write_pdf():
+    """`write_pdf(path, pages)` writes a text PDF with one line per page."""
+    return _write_pdf
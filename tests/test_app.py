@@ -0,0 +1,17 @@
+import pytest
+
+@pytest.fixture
+def client():
+    from app import app
+    return app.test_client()
+
+@pytest.mark.parametrize("body", [
+    {"query": "radar", "mmrK": [3]},
+    {"query": "radar", "mmrLambda": {"value": 0.5}},
+    {"query": "radar", "numQuestions": None},
+])
+def test_wrongly_typed_options_are_rejected_with_400(client, body):
+    for path in ("/generate", "/generate/stream"):
+        response = client.post(path, json=body)
+        assert response.status_code == 400
+        assert response.get_json()["error"]
@@ -0,0 +1,29 @@
+from modules.context_packer import pack_context, truncate_passage
+from modules.utils import count_tokens, get_or_create_client
+
+class CharacterEncoder:
+    """Tokenizer stand-in with one token per character, denser than the 4-characters-per-token estimate."""
+
+    def encode(self, text, disallowed_special=()):
+        return list(text)
+
+def test_over_long_sentence_is_cut_to_the_budget():
+    get_or_create_client("tokenizer", CharacterEncoder)
+    passage = "x" * 1000
+    assert truncate_passage(passage, 100) == "x" * 100
+
+def test_top_passage_is_kept_when_it_alone_exceeds_the_budget():
+    get_or_create_client("tokenizer", CharacterEncoder)
+    passage = " ".join(f"{i:04d}" for i in range(500))
+    packed, report = pack_context("numbers", None, passage, token_budget=300, compression=False)
+    assert packed == passage[:300]
+    assert count_tokens(packed) <= 300
+    assert report["passages_out"] == 1
+
+def test_top_passage_without_sentence_breaks_is_truncated_when_compression_is_on():
+    get_or_create_client("tokenizer", CharacterEncoder)
+    passage = " ".join(f"{i:04d}" for i in range(500))
+    packed, report = pack_context("numbers", None, passage, token_budget=300, compression=True)
+    assert packed == passage[:300]
+    assert report["over_budget_dropped"] == 0
+    assert report["tokens_out"] == 300
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+from langchain.schema import Document
+
+from modules.utils import calculate_context_similarity, retrieve_and_score, score_context_vectors
+
+DIMENSION = 256
+VOCABULARY = [f"w{i}" for i in range(400)]
+
+class BagOfWordsEmbeddings:
+    """Fixed word vectors summed per text: embedding joined text is then exactly linear in its parts."""
+
+    def __init__(self, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.words = {w: rng.standard_normal(DIMENSION) for w in VOCABULARY}
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        vector = sum(self.words[w] for w in text.split())
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts):
+        return [self.embed_query(t) for t in texts]
+
+def make_case(rng, related: bool):
+    """A query and 3-6 retrieved chunks of varying length, sharing topic words with the query if `related`."""
+    topic = list(rng.choice(VOCABULARY, 30, replace=False))
+    query = " ".join(rng.choice(topic, 6))
+    chunks = []
+    for _ in range(rng.integers(3, 7)):
+        n = int(rng.integers(20, 120))
+        on_topic = int(n * rng.uniform(0.2, 0.6)) if related else 0
+        words = list(rng.choice(topic, on_topic)) + list(rng.choice(VOCABULARY, n - on_topic))
+        chunks.append(" ".join(words))
+    return query, chunks
+
+def scores(embeddings, query, chunks):
+    """(re-embedded joined context, weighted chunk vectors)"""
+    joined = calculate_context_similarity(query, "\n\n".join(chunks), embeddings)
+    weighted = score_context_vectors(
+        embeddings.embed_query(query), embeddings.embed_documents(chunks), "weighted",
+        weights=[len(c) for c in chunks]
+    )
+    return joined, weighted
+
+def test_weighted_score_agrees_with_joined_embedding():
+    embeddings = BagOfWordsEmbeddings()
+    rng = np.random.default_rng(1)
+    pairs = np.array([scores(embeddings, *make_case(rng, related=i % 2 == 0)) for i in range(200)])
+    joined, weighted = pairs[:, 0], pairs[:, 1]
+
+    assert np.abs(joined - weighted).mean() < 0.01
+    assert np.abs(joined - weighted).max() < 0.06
+    assert np.corrcoef(joined, weighted)[0, 1] > 0.99
+    # The relevance gate makes the same call on (nearly) every case
+    threshold = np.median(joined)
+    assert np.mean((joined >= threshold) == (weighted >= threshold)) >= 0.95
+
+def test_single_chunk_scores_equal_joined_embedding():
+    embeddings = BagOfWordsEmbeddings()
+    rng = np.random.default_rng(2)
+    query, chunks = make_case(rng, related=True)
+    joined = calculate_context_similarity(query, chunks[0], embeddings)
+    for strategy in ("max", "mean", "weighted"):
+        vector_score = score_context_vectors(embeddings.embed_query(query), embeddings.embed_documents(chunks[:1]), strategy)
+        assert vector_score == pytest.approx(joined, abs=1e-5)
+
+class FakeRetriever:
+    def __init__(self, embeddings, query, chunks):
+        self.docs = [Document(page_content=c) for c in chunks]
+        self.vectors = embeddings.embed_documents(chunks)
+        self.query_vector = embeddings.embed_query(query)
+
+    def retrieve(self, query):
+        return {"docs": self.docs, "doc_vectors": self.vectors, "query_vector": self.query_vector}
+
+    def get_relevant_documents(self, query):
+        return self.docs
+
+def test_joined_strategy_keeps_the_re_embedding_score():
+    embeddings = BagOfWordsEmbeddings()
+    query, chunks = make_case(np.random.default_rng(3), related=True)
+    retriever = FakeRetriever(embeddings, query, chunks)
+
+    calls = embeddings.calls
+    _, context, joined = retrieve_and_score(retriever, query, embeddings, "joined")
+    assert joined == pytest.approx(calculate_context_similarity(query, context, embeddings))
+    assert embeddings.calls - calls == 4 # Two scorings, each embedding the query and the context
+
+    calls = embeddings.calls
+    _, _, weighted = retrieve_and_score(retriever, query, embeddings, "weighted")
+    assert embeddings.calls == calls # Reuses the retrieved vectors
+    assert weighted == pytest.approx(joined, abs=0.05)
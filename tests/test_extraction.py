@@ -0,0 +1,53 @@
+import os
+import time
+import pytest
+
+from modules import extraction
+from modules.extraction import OCRUnavailableError, extract_image, extract_pdf, iter_ordered
+
+# Run in the spawned pool workers, so they must be importable module-level functions
+def square(x):
+    return x * x
+
+def hang(seconds):
+    time.sleep(seconds)
+    return "late"
+
+def crash():
+    os._exit(1)
+
+@pytest.fixture(autouse=True)
+def small_pool(monkeypatch):
+    monkeypatch.setattr(extraction, "EXTRACTION_MAX_WORKERS", 2)
+    yield
+    from modules.utils import get_or_create_client
+    pool = get_or_create_client("extraction_pool", lambda: None)
+    if pool is not None:
+        extraction.reset_extraction_pool(pool)
+
+def test_missing_tesseract_keeps_the_pool_usable(workdir, monkeypatch, write_pdf):
+    monkeypatch.setenv("PATH", "") # Workers spawned from now on cannot find tesseract
+    from PIL import Image
+    image = workdir / "scan.png"
+    Image.new("L", (40, 20), 255).save(image)
+
+    with pytest.raises(OCRUnavailableError):
+        list(extract_image(str(image)))
+
+    pdf = workdir / "doc.pdf"
+    write_pdf(pdf, ["first page text", "second page text"])
+    pages = [doc.page_content.strip() for doc in extract_pdf(str(pdf))]
+    assert pages == ["first page text", "second page text"]
+
+def test_timed_out_task_frees_its_worker():
+    tasks = [("slow", hang, (30,))] + [(f"task {i}", square, (i,)) for i in range(4)]
+    started = time.monotonic()
+    results = list(iter_ordered(tasks, timeout=3))
+    assert results == [(f"task {i}", i * i) for i in range(4)]
+    assert time.monotonic() - started < 20
+
+def test_crashed_worker_is_replaced_and_other_tasks_rerun():
+    tasks = [("crash", crash, ())] + [(f"task {i}", square, (i,)) for i in range(4)]
+    results = list(iter_ordered(tasks, timeout=30))
+    assert results == [(f"task {i}", i * i) for i in range(4)]
+    assert list(iter_ordered([("after", square, (5,))], timeout=30)) == [("after", 25)]
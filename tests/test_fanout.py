@@ -0,0 +1,28 @@
+from modules.fanout import generate_sharded, plan_fanout
+
+PARAGRAPHS = [f"Paragraph {i} describes the maintenance of system {i} in detail." for i in range(3)]
+
+def test_short_context_gets_fewer_larger_shards():
+    shards, slices = plan_fanout("\n\n".join(PARAGRAPHS), 20, shard_size=5)
+    assert shards == [7, 7, 6]
+    assert slices == PARAGRAPHS
+
+def test_long_context_keeps_shard_size():
+    paragraphs = [f"Paragraph {i} is here." for i in range(10)]
+    shards, slices = plan_fanout("\n\n".join(paragraphs), 20, shard_size=5)
+    assert shards == [5, 5, 5, 5]
+    assert len(slices) == 4
+
+def test_each_shard_gets_its_own_slice():
+    seen = []
+
+    def generate_batch(context, n):
+        seen.append(context)
+        # Questions share no words, so none are dropped as near-duplicates
+        return {"questions": [{"question": f"paragraph{context.split()[1]} item{i}?"} for i in range(n)]}
+
+    questions = generate_sharded(generate_batch, "\n\n".join(PARAGRAPHS), 20, lambda item: "question" in item,
+                                 "q", "questions", shard_size=5)
+    assert sorted(seen) == PARAGRAPHS
+    assert len(questions) == 20
+    assert questions[-1]["id"] == "q20"
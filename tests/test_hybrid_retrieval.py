@@ -0,0 +1,35 @@
+from pinecone.db_data.dataclasses import FetchResponse, Vector
+
+from modules import db_manager
+from modules.db_manager import VectorMMRRetriever, fetch_vectors
+from modules.lexical_index import BM25Index
+from modules.local_index import LocalVectorStore
+
+TEXTS = ["Radar doctrine for the air defence crew.", "Turret maintenance schedule for the gunners."]
+
+def test_fetch_vectors_reads_pinecone_and_local_responses(workdir, embeddings):
+    class PineconeIndex:
+        def fetch(self, ids):
+            vectors = {i: Vector(id=i, values=[1.0, 0.0], metadata={"text": i}) for i in ids}
+            return FetchResponse(namespace="", vectors=vectors, usage={"read_units": 1})
+
+    vectors = fetch_vectors(PineconeIndex(), ["a"])
+    assert vectors["a"]["values"] == [1.0, 0.0]
+    assert vectors["a"]["metadata"] == {"text": "a"}
+
+    store = LocalVectorStore.from_texts(TEXTS, embeddings, ids=["a", "b"], path=str(workdir / "index"))
+    assert set(fetch_vectors(store.index, ["a", "missing"])) == {"a"}
+
+def test_strong_lexical_match_missing_from_the_vector_index_falls_back_to_vector_search(workdir, embeddings, monkeypatch):
+    monkeypatch.setattr(db_manager, "LEXICAL_SHORTCUT", True)
+    store = LocalVectorStore.from_texts(TEXTS, embeddings, ids=["a", "b"], path=str(workdir / "index"))
+    lexical = BM25Index(str(workdir / "lexical"))
+    # Indexed lexically, but since deleted from the vector index
+    lexical.add(["stale"], ["Radar doctrine for the air defence crew, first edition."])
+    lexical.flush()
+
+    retriever = VectorMMRRetriever(vectordb=store, lexical=lexical, k=1)
+    assert retriever._is_strong_lexical_match("radar doctrine air defence", lexical.search("radar doctrine air defence"))
+    result = retriever.retrieve("radar doctrine air defence")
+    assert result["query_vector"] is not None
+    assert len(result["docs"]) == 1
@@ -0,0 +1,69 @@
+from modules.chunking import get_text_splitter
+from modules.db_manager import upsert_file, EMBEDDING_DIMENSION
+from modules.local_index import LocalVectorIndex
+from modules.manifest import compute_chunk_id, get_file_record
+
+PARAGRAPHS = [
+    f"Paragraph {i} explains how the {topic} is maintained, inspected and repaired by the crew on duty."
+    for i, topic in enumerate(["radar", "antenna", "turret", "engine", "generator"])
+]
+
+def write(path, paragraphs):
+    path.write_text("\n\n".join(paragraphs), encoding="utf-8")
+
+def upload(path, embeddings, index, workdir):
+    # One chunk per paragraph
+    return upsert_file(
+        str(path), embeddings=embeddings, index=index, manifest_path=str(workdir / "manifest.sqlite3"),
+        splitter=get_text_splitter("character", 120, 0)
+    )
+
+def test_unchanged_file_is_not_embedded_again(workdir, embeddings):
+    index = LocalVectorIndex(str(workdir / "index"), EMBEDDING_DIMENSION)
+    doc = workdir / "notes.txt"
+    write(doc, PARAGRAPHS)
+
+    first = upload(doc, embeddings, index, workdir)
+    assert first["status"] == "ingested"
+    assert first["added"] == len(PARAGRAPHS)
+    assert sorted(embeddings.embedded) == sorted(PARAGRAPHS)
+
+    calls = embeddings.calls
+    second = upload(doc, embeddings, index, workdir)
+    assert second == {"status": "unchanged", "added": 0, "kept": len(PARAGRAPHS), "deleted": 0}
+    assert embeddings.calls == calls
+
+def test_edited_file_embeds_only_new_chunks_and_deletes_stale_ones(workdir, embeddings):
+    index = LocalVectorIndex(str(workdir / "index"), EMBEDDING_DIMENSION)
+    doc = workdir / "notes.txt"
+    write(doc, PARAGRAPHS)
+    upload(doc, embeddings, index, workdir)
+
+    edited = PARAGRAPHS[:2] + ["Paragraph 2 now covers the periscope and its optics instead."] + PARAGRAPHS[3:]
+    edited.append("Paragraph 5 is new and describes the hydraulic system of the hatch.")
+    embeddings.embedded.clear()
+    write(doc, edited)
+
+    summary = upload(doc, embeddings, index, workdir)
+    assert summary == {"status": "ingested", "added": 2, "kept": 4, "deleted": 1}
+    assert sorted(embeddings.embedded) == sorted([edited[2], edited[5]])
+
+    stale_id = compute_chunk_id("notes.txt", PARAGRAPHS[2])
+    current_ids = {compute_chunk_id("notes.txt", p) for p in edited}
+    assert stale_id not in index.fetch(ids=[stale_id])["vectors"]
+    assert set(index.fetch(ids=list(current_ids))["vectors"]) == current_ids
+    assert get_file_record("notes.txt", str(workdir / "manifest.sqlite3"))["chunk_ids"] == current_ids
+
+def test_file_edited_to_no_chunks_has_its_old_chunks_deleted(workdir, embeddings):
+    index = LocalVectorIndex(str(workdir / "index"), EMBEDDING_DIMENSION)
+    doc = workdir / "notes.txt"
+    write(doc, PARAGRAPHS)
+    upload(doc, embeddings, index, workdir)
+
+    write(doc, [])
+    summary = upload(doc, embeddings, index, workdir)
+    assert summary == {"status": "empty", "added": 0, "kept": 0, "deleted": len(PARAGRAPHS)}
+
+    old_ids = [compute_chunk_id("notes.txt", p) for p in PARAGRAPHS]
+    assert index.fetch(ids=old_ids)["vectors"] == {}
+    assert get_file_record("notes.txt", str(workdir / "manifest.sqlite3"))["chunk_ids"] == set()
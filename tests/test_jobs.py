@@ -0,0 +1,25 @@
+import pytest
+
+from modules import jobs
+
+def test_ingest_job_queues_the_question_bank_build_separately(workdir, monkeypatch):
+    upload = workdir / "notes.txt"
+    upload.write_text("Radar doctrine.", encoding="utf-8")
+    submitted = []
+    monkeypatch.setattr(jobs, "QUESTION_BANK_ENABLED", True)
+    monkeypatch.setattr(jobs, "upsert_file", lambda *args, **kwargs: {"status": "ingested", "added": 2})
+    monkeypatch.setattr(jobs, "get_file_record", lambda source: {"chunk_ids": {"c2", "c1"}})
+    monkeypatch.setattr(jobs, "build_question_bank", lambda *args, **kwargs: pytest.fail("built inline"))
+    monkeypatch.setattr(jobs, "submit_job", lambda fn, *args: submitted.append((fn, args)) or "bank-job")
+
+    summary = jobs.ingest_file_job(lambda **fields: None, str(upload), "notes.txt")
+    assert summary == {"status": "ingested", "added": 2, "question_bank_job_id": "bank-job"}
+    assert submitted == [(jobs.question_bank_job, (["c1", "c2"],))]
+    assert not upload.exists()
+
+def test_question_bank_job_builds_the_given_chunks(monkeypatch):
+    calls = []
+    monkeypatch.setattr(jobs, "build_question_bank", lambda chunk_ids, **kwargs: calls.append(chunk_ids) or {})
+    jobs.question_bank_job(lambda **fields: None, ["c1"])
+    jobs.question_bank_job(lambda **fields: None)
+    assert calls == [["c1"], None]
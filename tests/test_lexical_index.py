@@ -0,0 +1,45 @@
+from modules.lexical_index import BM25Index
+
+def test_readded_chunk_is_returned_once(workdir):
+    index = BM25Index(str(workdir / "lexical"))
+    index.add(["a", "b"], ["Radar doctrine for the air defence crew.", "Turret maintenance schedule."])
+    index.flush()
+    index.delete(["a"])
+    index.add(["a"], ["Radar doctrine, revised for the air defence crew."])
+    index.flush()
+
+    assert [chunk_id for chunk_id, _, _ in index.search("radar doctrine")] == ["a"]
+    assert len(index) == 2
+
+    # Other processes see the same state through the manifest
+    reopened = BM25Index(str(workdir / "lexical"))
+    assert [chunk_id for chunk_id, _, _ in reopened.search("radar doctrine")] == ["a"]
+
+def test_readded_chunk_survives_a_merge(workdir, monkeypatch):
+    from modules import lexical_index
+
+    monkeypatch.setattr(lexical_index, "LEXICAL_MAX_SEGMENTS", 1)
+    index = BM25Index(str(workdir / "lexical"))
+    index.add(["a"], ["Radar doctrine for the air defence crew."])
+    index.flush()
+    index.delete(["a"])
+    index.add(["a"], ["Radar doctrine, revised."])
+    index.flush()
+
+    assert len(index._segments) == 1
+    assert [chunk_id for chunk_id, _, _ in index.search("radar doctrine")] == ["a"]
+
+def test_deleted_chunks_do_not_count_towards_document_frequency(workdir):
+    index = BM25Index(str(workdir / "lexical"))
+    ids = [f"old{i}" for i in range(5)]
+    index.add(ids, ["Radar doctrine, edition one."] * 5)
+    index.add(["turret"], ["Turret maintenance schedule."])
+    index.flush()
+    index.delete(ids)
+    index.add(["new"], ["Radar doctrine, current edition."])
+    index.flush()
+
+    # With the five deleted docs counted, df(radar) = 6 > N = 2 and the match scored below zero
+    results = index.search("radar doctrine")
+    assert [chunk_id for chunk_id, _, _ in results] == ["new"]
+    assert results[0][1] > 0
@@ -0,0 +1,33 @@
+import numpy as np
+
+from modules import local_index
+from modules.local_index import LocalVectorIndex, LocalVectorStore
+
+TEXTS = ["The radar is calibrated every morning.", "The turret is greased weekly.", "The engine is inspected daily."]
+
+def test_from_texts_builds_a_searchable_store(workdir, embeddings):
+    store = LocalVectorStore.from_texts(TEXTS, embeddings, metadatas=[{"n": i} for i in range(3)],
+                                       path=str(workdir / "index"))
+    assert store.index.describe_index_stats()["total_vector_count"] == 3
+
+    doc, score = store.similarity_search_with_score(TEXTS[1], k=1)[0]
+    assert doc.page_content == TEXTS[1]
+    assert doc.metadata == {"n": 1}
+    assert score > 0.99
+
+    # The texts are on disk: a new handle on the same directory finds them
+    reopened = LocalVectorIndex(str(workdir / "index"), embeddings.dimension)
+    assert reopened.describe_index_stats()["total_vector_count"] == 3
+
+def test_ivf_query_with_no_live_candidates_returns_no_matches(workdir, monkeypatch):
+    monkeypatch.setattr(local_index, "LOCAL_INDEX_IVF_MIN_VECTORS", 1)
+    index = LocalVectorIndex(str(workdir / "index"), 2)
+    # Two tight clusters, so the IVF build puts each in its own list
+    angles = [0.0, 0.01, 0.02, 0.03, 1.5, 1.51, 1.52, 1.53]
+    index.upsert(vectors=[{"id": f"v{i}", "values": [np.cos(a), np.sin(a)]} for i, a in enumerate(angles)])
+    assert len(index.query([1.0, 0.0], top_k=2, nprobe=1)["matches"]) == 2
+
+    # The probed list now only holds deleted rows
+    index.delete(ids=["v0", "v1", "v2", "v3"])
+    assert index.query([1.0, 0.0], top_k=2, nprobe=1) == {"matches": []}
+    assert [m["id"] for m in index.query([1.0, 0.0], top_k=2, nprobe=2)["matches"]] == ["v4", "v5"]
@@ -0,0 +1,31 @@
+from modules import question_bank
+from modules.db_manager import get_vector_index, PINECONE_TEXT_KEY
+
+CHUNKS = {f"c{i}": f"Chunk {i} covers the maintenance of system {i}." for i in range(4)}
+
+def test_build_summary_counts_each_chunk_once(embeddings, monkeypatch):
+    get_vector_index().upsert(vectors=[
+        {"id": chunk_id, "values": embeddings.vector(text), "metadata": {PINECONE_TEXT_KEY: text, "source": "notes.txt"}}
+        for chunk_id, text in CHUNKS.items()
+    ])
+    monkeypatch.setattr(question_bank, "get_embeddings", lambda: embeddings)
+
+    def generate(gen_type, text, per_chunk):
+        # Chunk 3 only fails for Q&A
+        if gen_type == "qa" and "Chunk 3" in text:
+            return []
+        return [{"question": f"{gen_type} {n} about {text}"} for n in range(per_chunk)]
+
+    monkeypatch.setattr(question_bank, "_generate_for_chunk", generate)
+    first = question_bank.build_question_bank(list(CHUNKS), per_chunk=2)
+    assert {k: first[k] for k in ("chunks", "built", "skipped", "failed", "questions")} == {
+        "chunks": 4, "built": 3, "skipped": 0, "failed": 1, "questions": 14
+    }
+    assert first["types"]["qa"] == {"built": 3, "skipped": 0, "failed": 1, "questions": 6}
+
+    # Everything but chunk 3's Q&A is built now: only that chunk is not skipped
+    second = question_bank.build_question_bank(list(CHUNKS), per_chunk=2)
+    assert {k: second[k] for k in ("chunks", "built", "skipped", "failed")} == {
+        "chunks": 4, "built": 0, "skipped": 3, "failed": 1
+    }
+    assert second["types"]["mcq"]["skipped"] == 4
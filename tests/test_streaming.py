@@ -0,0 +1,47 @@
+import json
+
+from modules import mcq_generator, qa_generator
+
+CONTEXT = "The radar is calibrated every morning by the crew on duty."
+
+def mcq(question_id, question):
+    return {"id": question_id, "question": question, "options": ["a", "b", "c", "d"], "correct_index": 1}
+
+def stub_pipeline(monkeypatch, module, streamed, topped_up, batch_name):
+    cache = {}
+
+    class Cache:
+        def get(self, key):
+            return cache.get(key)
+
+        def set(self, key, items, context):
+            cache[key] = [dict(i) for i in items]
+
+    monkeypatch.setattr(module, "resolve_context", lambda *args, **kwargs: ([], CONTEXT, 1.0))
+    monkeypatch.setattr(module, "route_llm", lambda llm, *args: (llm, "small"))
+    monkeypatch.setattr(module, "get_generation_cache", lambda: Cache())
+    monkeypatch.setattr(module, "generation_cache_key", lambda *args: "key")
+    # The LLM's own IDs repeat and skip; one streamed item is invalid and topped up afterwards
+    text = json.dumps(streamed)
+    monkeypatch.setattr(module, "stream_llm_text", lambda *args: (text[i:i + 7] for i in range(0, len(text), 7)))
+    monkeypatch.setattr(module, batch_name, lambda llm, context, n: topped_up[:n])
+    return cache
+
+def test_streamed_mcqs_are_numbered_as_they_are_yielded(monkeypatch):
+    streamed = [mcq("7", "Who calibrates the radar?"), mcq("7", "When is it calibrated?"),
+                {"id": "x", "question": "Broken?"}]
+    cache = stub_pipeline(monkeypatch, mcq_generator, streamed, [mcq("1", "What is calibrated?")],
+                          "_generate_mcq_batch")
+
+    items = list(mcq_generator.stream_mcqs_from_retrieved_context(None, None, "radar", None, num_questions=3))
+    assert [i["id"] for i in items] == ["Q1", "Q2", "Q3"]
+    assert [i["id"] for i in cache["key"]] == ["Q1", "Q2", "Q3"]
+
+def test_streamed_qa_pairs_are_numbered_as_they_are_yielded(monkeypatch):
+    streamed = [{"id": "QA4", "question": "Who calibrates the radar?", "answer": "The crew."},
+                {"id": "QA4", "question": "When is it calibrated?", "answer": "Every morning."}]
+    cache = stub_pipeline(monkeypatch, qa_generator, streamed, [], "_generate_qa_batch")
+
+    items = list(qa_generator.stream_qa_from_context(None, None, "radar", None, num_questions=2))
+    assert [i["id"] for i in items] == ["QA1", "QA2"]
+    assert [i["id"] for i in cache["key"]] == ["QA1", "QA2"]